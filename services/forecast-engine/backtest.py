@@ -0,0 +1,197 @@
+"""
+Rolling-origin backtesting for the revenue forecast ensemble
+Evaluates each model over expanding training windows (MAPE, sMAPE, MASE)
+and derives ensemble weights from the out-of-sample error
+"""
+
+import hashlib
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+BACKTEST_ORIGINS = int(os.getenv("FORECAST_BACKTEST_ORIGINS", "5"))
+BACKTEST_HORIZON = int(os.getenv("FORECAST_BACKTEST_HORIZON", "14"))
+BACKTEST_MIN_TRAIN = int(os.getenv("FORECAST_BACKTEST_MIN_TRAIN", "28"))
+BACKTEST_WORKERS = int(os.getenv("FORECAST_BACKTEST_WORKERS", str(min(8, os.cpu_count() or 1))))
+BACKTEST_CACHE_TTL = int(os.getenv("FORECAST_BACKTEST_CACHE_TTL", "21600"))  # 6 hours
+BACKTEST_CACHE_SIZE = int(os.getenv("FORECAST_BACKTEST_CACHE_SIZE", "1024"))
+SEASONAL_PERIOD = 7  # Weekly seasonality, same as the models
+
+class BacktestModel(NamedTuple):
+    """How to evaluate one model across origins.
+
+    fit:      estimate parameters on a training DailySeries, return a fitted object
+    refilter: re-run an existing fit over a longer series without re-estimating parameters
+    predict:  (fitted, training DailySeries, horizon) -> np.ndarray of forecasts
+    """
+    fit: Callable[[Any], Any]
+    refilter: Callable[[Any, Any], Any]
+    predict: Callable[[Any, Any, int], np.ndarray]
+
+class BacktestResult(NamedTuple):
+    weights: Dict[str, float]
+    metrics: Dict[str, Dict[str, float]]
+    ensemble_metrics: Dict[str, float]
+    origins: List[str]
+    horizon: int
+    duration: float
+
+# Shared pool: origins of every model are evaluated concurrently
+_executor = ThreadPoolExecutor(max_workers=max(1, BACKTEST_WORKERS), thread_name_prefix="backtest")
+
+# Per-tenant cache: tenant_id -> (cached_at, (data fingerprint, horizon, model_names), result)
+_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def mape(actual: np.ndarray, forecast: np.ndarray) -> float:
+    """Mean absolute percentage error over non-zero actuals (revenue has zero days)"""
+    mask = actual != 0
+    if not mask.any():
+        return float("nan")
+    return float(np.mean(np.abs((actual[mask] - forecast[mask]) / actual[mask])))
+
+def smape(actual: np.ndarray, forecast: np.ndarray) -> float:
+    """Symmetric MAPE in [0, 2]; a day where both values are zero counts as a perfect forecast"""
+    denominator = np.abs(actual) + np.abs(forecast)
+    ratio = np.divide(2 * np.abs(actual - forecast), denominator, out=np.zeros_like(denominator), where=denominator != 0)
+    return float(np.mean(ratio))
+
+def mase(actual: np.ndarray, forecast: np.ndarray, train: np.ndarray, period: int = SEASONAL_PERIOD) -> float:
+    """Mean absolute scaled error against the in-sample seasonal naive forecast"""
+    if len(train) <= period:
+        period = 1
+    scale = np.mean(np.abs(train[period:] - train[:-period]))
+    if not scale:
+        scale = np.mean(np.abs(train)) or 1.0
+    return float(np.mean(np.abs(actual - forecast)) / scale)
+
+def rolling_origins(n_obs: int, horizon: int, n_origins: int = BACKTEST_ORIGINS,
+                    min_train: int = BACKTEST_MIN_TRAIN) -> List[int]:
+    """Training-window lengths for expanding-window origins with non-overlapping test windows"""
+    origins = [n_obs - horizon * (i + 1) for i in range(n_origins)]
+    return sorted(origin for origin in origins if origin >= min_train)
+
+def _run_model(name: str, spec: BacktestModel, history, origins: List[int], horizon: int) -> Optional[np.ndarray]:
+    """Fit once at the earliest origin, then refilter and forecast every origin in parallel"""
+    try:
+        fitted = spec.fit(history.head(origins[0]))
+    except Exception as e:
+        logging.warning(f"Backtest fit failed for {name}: {e}")
+        return None
+
+    def evaluate(origin: int) -> np.ndarray:
+        train = history.head(origin)
+        state = fitted if origin == origins[0] else spec.refilter(fitted, train)
+        return np.asarray(spec.predict(state, train, horizon), dtype=float)
+
+    try:
+        return np.vstack(list(_executor.map(evaluate, origins)))
+    except Exception as e:
+        logging.warning(f"Backtest evaluation failed for {name}: {e}")
+        return None
+
+def run_backtest(history, models: Dict[str, BacktestModel], horizon: int = BACKTEST_HORIZON) -> Optional[BacktestResult]:
+    """Evaluate every model over rolling origins and weight them by inverse MASE.
+
+    Returns None when the series is too short to hold out at least one origin.
+    """
+    start_time = time.time()
+    horizon = max(1, min(horizon, BACKTEST_HORIZON))
+    origins = rolling_origins(len(history), horizon)
+    if not origins:
+        return None
+
+    values = np.asarray(history.values, dtype=float)
+    actuals = np.vstack([values[origin:origin + horizon] for origin in origins])
+
+    # Models run concurrently; each one fans its origins out over the shared pool
+    with ThreadPoolExecutor(max_workers=max(1, len(models))) as model_pool:
+        futures = {
+            name: model_pool.submit(_run_model, name, spec, history, origins, horizon)
+            for name, spec in models.items()
+        }
+        predictions = {name: future.result() for name, future in futures.items()}
+    predictions = {name: p for name, p in predictions.items() if p is not None}
+    if not predictions:
+        return None
+
+    metrics = {}
+    for name, predicted in predictions.items():
+        metrics[name] = {
+            "mape": float(np.nanmean([mape(a, f) for a, f in zip(actuals, predicted)])),
+            "smape": float(np.mean([smape(a, f) for a, f in zip(actuals, predicted)])),
+            "mase": float(np.mean([mase(a, f, values[:o]) for a, f, o in zip(actuals, predicted, origins)])),
+        }
+
+    # Inverse-error weights; a model with a much larger MASE contributes proportionally less
+    inverse = {name: 1.0 / max(m["mase"], 1e-6) for name, m in metrics.items() if np.isfinite(m["mase"])}
+    total = sum(inverse.values())
+    if not total:
+        return None
+    weights = {name: value / total for name, value in inverse.items()}
+
+    ensemble = sum(predictions[name] * weight for name, weight in weights.items())
+    ensemble_metrics = {
+        "mape": float(np.nanmean([mape(a, f) for a, f in zip(actuals, ensemble)])),
+        "smape": float(np.mean([smape(a, f) for a, f in zip(actuals, ensemble)])),
+        "mase": float(np.mean([mase(a, f, values[:o]) for a, f, o in zip(actuals, ensemble, origins)])),
+    }
+
+    return BacktestResult(
+        weights=weights,
+        metrics=metrics,
+        ensemble_metrics=ensemble_metrics,
+        origins=[str(history.start + origin) for origin in origins],
+        horizon=horizon,
+        duration=time.time() - start_time,
+    )
+
+def _fingerprint(history) -> str:
+    """Content hash of the start date and every value, so revised history is a miss"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(history.start).encode())
+    digest.update(np.ascontiguousarray(history.values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def cached_backtest(tenant_id: str, history, models: Dict[str, BacktestModel],
+                    horizon: int = BACKTEST_HORIZON) -> Optional[BacktestResult]:
+    """Per-tenant cached backtest.
+
+    An entry stays valid for BACKTEST_CACHE_TTL seconds as long as the tenant's
+    history, the backtest horizon and the model set are unchanged.
+    """
+    key = (_fingerprint(history), max(1, min(horizon, BACKTEST_HORIZON)), tuple(sorted(models)))
+    now = time.time()
+
+    with _cache_lock:
+        entry = _cache.get(tenant_id)
+        if entry is not None:
+            cached_at, cached_key, result = entry
+            if now - cached_at < BACKTEST_CACHE_TTL and cached_key == key:
+                _cache.move_to_end(tenant_id)
+                return result
+
+    result = run_backtest(history, models, horizon)
+    if result is None:
+        return None
+
+    with _cache_lock:
+        _cache[tenant_id] = (now, key, result)
+        _cache.move_to_end(tenant_id)
+        while len(_cache) > BACKTEST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+def invalidate(tenant_id: Optional[str] = None) -> None:
+    """Drop the cached backtest for one tenant, or for all tenants"""
+    with _cache_lock:
+        if tenant_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(tenant_id, None)
@@ -0,0 +1,88 @@
+"""
+Forecast engine startup and per-request latency
+Measures cold `import main` time in fresh interpreters and generate_forecast
+latency per model set on synthetic daily series.
+
+Usage (from services/forecast-engine):
+    python benchmarks/startup.py [--runs 5] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+def measure_import(runs: int) -> dict:
+    """Wall time of `import main` in a fresh interpreter, and which heavy modules it pulled in"""
+    code = (
+        "import sys, time, json; t = time.perf_counter(); import main; "
+        "print(json.dumps({'seconds': time.perf_counter() - t, "
+        "'heavy_modules': sorted(m for m in ('pandas', 'statsmodels', 'sklearn') if m in sys.modules)}))"
+    )
+    samples = []
+    heavy_modules = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=ENGINE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        samples.append(result["seconds"])
+        heavy_modules = result["heavy_modules"]
+    return {"median_seconds": statistics.median(samples), "samples": samples, "heavy_modules": heavy_modules}
+
+def synthetic_history(n_days: int, seed: int = 0):
+    from ingest import from_columns
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+    values = 1000 + 2 * t + 150 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 60, n_days)
+    return from_columns(np.maximum(values, 0), start_date="2024-01-01")
+
+def measure_latency(runs: int, lengths=(45, 90, 365), horizon: int = 30) -> list:
+    import main
+    model_sets = ["fast", "full"] if "model_set" in main.ForecastRequest.model_fields else ["full"]
+    results = []
+    for n_days in lengths:
+        history = synthetic_history(n_days)
+        for model_set in model_sets:
+            options = {"model_set": model_set} if len(model_sets) > 1 else {}
+            request = main.ForecastRequest(tenant_id="bench", horizon_days=horizon, backtest=False, **options)
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                main.generate_forecast(request, history)
+                samples.append(time.perf_counter() - start)
+            results.append({
+                "n_days": n_days,
+                "model_set": model_set,
+                "median_seconds": statistics.median(samples),
+                "samples": samples,
+            })
+    return results
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "import": measure_import(args.runs),
+        "latency": measure_latency(args.runs),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    run()
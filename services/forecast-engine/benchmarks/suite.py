@@ -0,0 +1,267 @@
+"""
+Forecast engine benchmark and accuracy regression suite
+Generates synthetic daily series (length, trend, seasonality, zero-inflation,
+noise), then measures per-model fit time, end-to-end generate_forecast latency,
+peak memory and holdout accuracy. Results are JSON so runs can be compared
+across commits.
+
+Usage (from services/forecast-engine):
+    python benchmarks/suite.py run --output head.json [--quick] [--model-set fast|full|auto]
+    python benchmarks/suite.py compare base.json head.json [--latency-tolerance 0.25] [--accuracy-tolerance 0.02]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+os.environ.setdefault("FORECAST_STORE_PATH", ":memory:")
+os.environ.setdefault("FORECAST_SCHEDULER_ENABLED", "false")
+
+HOLDOUT_DAYS = 28
+
+# Synthetic series grid; --quick keeps the first value of every dimension except length
+LENGTHS = (60, 180, 365, 730)
+TRENDS = (0.0, 1.5)             # Revenue units per day
+SEASONALITIES = (0.0, 0.3)      # Weekly amplitude as a fraction of the level
+ZERO_SHARES = (0.0, 0.4)        # Probability a day has no revenue
+NOISES = (0.05, 0.25)           # Noise std as a fraction of the level
+
+def synthetic_series(n_days: int, trend: float, seasonality: float, zero_share: float, noise: float,
+                     seed: int, level: float = 1000.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+    values = level + trend * t + seasonality * level * np.sin(2 * np.pi * t / 7)
+    values = values + rng.normal(0, noise * level, n_days)
+    values[rng.random(n_days) < zero_share] = 0.0
+    return np.maximum(values, 0.0)
+
+def cases(quick: bool) -> list:
+    grids = (TRENDS, SEASONALITIES, ZERO_SHARES, NOISES)
+    if quick:
+        grids = tuple(grid[:1] for grid in grids)
+    combos = itertools.product(LENGTHS, *grids)
+    return [
+        {"n_days": n, "trend": tr, "seasonality": se, "zero_share": zs, "noise": no, "seed": i}
+        for i, (n, tr, se, zs, no) in enumerate(combos)
+    ]
+
+def case_id(case: dict) -> str:
+    return "n{n_days}-tr{trend}-se{seasonality}-zs{zero_share}-no{noise}".format(**case)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def accuracy(actual: np.ndarray, forecast: np.ndarray, train: np.ndarray) -> dict:
+    from backtest import mape, mase, smape
+    forecast = np.asarray(forecast, dtype=float)
+    return {
+        "mape": mape(actual, forecast),
+        "smape": smape(actual, forecast),
+        "mase": mase(actual, forecast, train),
+    }
+
+def model_runs(train, horizon: int, model_set: str) -> dict:
+    """Fit time and forecast of every individual model the engine could use"""
+    import fastpath
+    runs = {}
+    for name, model in (
+        ("seasonal_naive", fastpath.seasonal_naive_forecast),
+        ("holt_winters_fast", fastpath.holt_winters_forecast),
+        ("drift", fastpath.drift_forecast),
+    ):
+        (forecast, _), seconds = timed(model, train.values, horizon)
+        runs[name] = (forecast, seconds)
+
+    if model_set != "fast":
+        import main
+        if main.MODELS_AVAILABLE:
+            import models
+            series = train.to_pandas()
+            for name, model in (
+                ("sarima", models.sarima_forecast),
+                ("exponential_smoothing", models.exponential_smoothing_forecast),
+                ("linear_regression", models.linear_regression_forecast),
+            ):
+                (forecast, _), seconds = timed(model, series, horizon)
+                runs[name] = (forecast, seconds)
+    return runs
+
+def run_case(case: dict, model_set: str, repeats: int) -> dict:
+    import main
+    from ingest import DailySeries
+
+    values = synthetic_series(case["n_days"] + HOLDOUT_DAYS, case["trend"], case["seasonality"],
+                              case["zero_share"], case["noise"], case["seed"])
+    history = DailySeries(start=np.datetime64("2023-01-01"), values=values[:-HOLDOUT_DAYS])
+    actual = values[-HOLDOUT_DAYS:]
+
+    models = {}
+    for name, (forecast, seconds) in model_runs(history, HOLDOUT_DAYS, model_set).items():
+        models[name] = {
+            "fit_seconds": seconds,
+            "accuracy": accuracy(actual, forecast, history.values) if forecast is not None else None,
+        }
+
+    # End to end, as the API runs it; a fresh tenant id per run keeps the backtest cache cold
+    def request_for(run: str):
+        return main.ForecastRequest(
+            tenant_id=f"bench-{case_id(case)}-{run}",
+            horizon_days=HOLDOUT_DAYS,
+            model_set=model_set,
+        )
+
+    latencies = []
+    response = None
+    for repeat in range(repeats):
+        response, seconds = timed(main.generate_forecast, request_for(str(repeat)), history)
+        latencies.append(seconds)
+
+    # Memory in a separate run, since tracing slows everything down
+    tracemalloc.start()
+    main.generate_forecast(request_for("memory"), history)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    intervals = response.confidence_intervals or {}
+    coverage = None
+    if "lower_95" in intervals:
+        inside = (actual >= np.array(intervals["lower_95"])) & (actual <= np.array(intervals["upper_95"]))
+        coverage = float(inside.mean())
+
+    return {
+        "id": case_id(case),
+        **case,
+        "model_set": response.model_set,
+        "models_used": response.models_used,
+        "latency_seconds": {"median": statistics.median(latencies), "min": min(latencies), "samples": latencies},
+        "peak_traced_bytes": peak,
+        "ensemble": {**accuracy(actual, response.forecast, history.values), "coverage_95": coverage},
+        "models": models,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ENGINE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def summarize(results: list) -> dict:
+    def median_of(path):
+        values = [path(r) for r in results]
+        values = [v for v in values if v is not None and np.isfinite(v)]
+        return statistics.median(values) if values else None
+
+    return {
+        "cases": len(results),
+        "latency_median_seconds": median_of(lambda r: r["latency_seconds"]["median"]),
+        "latency_total_seconds": sum(r["latency_seconds"]["median"] for r in results),
+        "ensemble_smape_median": median_of(lambda r: r["ensemble"]["smape"]),
+        "ensemble_mase_median": median_of(lambda r: r["ensemble"]["mase"]),
+        "coverage_95_median": median_of(lambda r: r["ensemble"]["coverage_95"]),
+        "peak_traced_bytes_max": max(r["peak_traced_bytes"] for r in results),
+    }
+
+def run(args) -> int:
+    started = time.time()
+    results = []
+    for case in cases(args.quick):
+        result = run_case(case, args.model_set, args.repeats)
+        results.append(result)
+        print(f"{result['id']:<45} {result['model_set']:<5} "
+              f"{result['latency_seconds']['median'] * 1000:8.1f} ms  "
+              f"sMAPE {result['ensemble']['smape']:.3f}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "model_set": args.model_set,
+            "holdout_days": HOLDOUT_DAYS,
+            "repeats": args.repeats,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "duration_seconds": time.time() - started,
+        },
+        "summary": summarize(results),
+        "cases": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+def compare(args) -> int:
+    """Exit non-zero if head is slower or less accurate than base beyond the tolerances"""
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    base_cases = {c["id"]: c for c in base["cases"]}
+    regressions = []
+    for case in head["cases"]:
+        before = base_cases.get(case["id"])
+        if before is None:
+            continue
+        old_latency = before["latency_seconds"]["median"]
+        new_latency = case["latency_seconds"]["median"]
+        if old_latency and new_latency > old_latency * (1 + args.latency_tolerance):
+            regressions.append(f"{case['id']}: latency {old_latency * 1000:.1f} -> {new_latency * 1000:.1f} ms")
+        old_smape = before["ensemble"]["smape"]
+        new_smape = case["ensemble"]["smape"]
+        if new_smape > old_smape + args.accuracy_tolerance:
+            regressions.append(f"{case['id']}: sMAPE {old_smape:.3f} -> {new_smape:.3f}")
+
+    print(f"base {base['meta']['revision']}  head {head['meta']['revision']}")
+    for key in ("latency_median_seconds", "latency_total_seconds", "ensemble_smape_median",
+                "ensemble_mase_median", "coverage_95_median", "peak_traced_bytes_max"):
+        print(f"  {key:<26} {base['summary'].get(key)!s:>22} -> {head['summary'].get(key)!s}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the suite and write JSON results")
+    run_parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    run_parser.add_argument("--quick", action="store_true", help="One series shape per length")
+    run_parser.add_argument("--model-set", default="auto", choices=("auto", "fast", "full"))
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                                help="Allowed relative latency increase per case")
+    compare_parser.add_argument("--accuracy-tolerance", type=float, default=0.02,
+                                help="Allowed absolute sMAPE increase per case")
+    compare_parser.set_defaults(handler=compare)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    sys.exit(arguments.handler(arguments))
@@ -0,0 +1,181 @@
+"""
+Fast-path forecasting models in pure NumPy
+Seasonal naive, additive Holt-Winters and drift for short or simple series,
+with no pandas/statsmodels/scikit-learn import or fitting overhead
+"""
+
+import logging
+from typing import NamedTuple
+import numpy as np
+
+from backtest import BacktestModel, smape
+
+SEASONAL_PERIOD = 7  # Weekly seasonality
+
+# Holt-Winters smoothing grid; the recursion is vectorized across all combinations
+HW_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+HW_BETAS = np.array([0.0, 0.01, 0.05, 0.1, 0.2])
+HW_GAMMAS = np.array([0.0, 0.05, 0.1, 0.2, 0.4])
+
+MODEL_LABELS = {
+    'seasonal_naive': 'SeasonalNaive',
+    'holt_winters': 'HoltWintersAdditive',
+    'drift': 'Drift',
+}
+
+class HoltWintersFit(NamedTuple):
+    alpha: float
+    beta: float
+    gamma: float
+    level: float
+    trend: float
+    season: np.ndarray  # Seasonal states; season[i] applies to steps t with t % period == i
+    n_obs: int
+    residuals: np.ndarray  # One-step-ahead in-sample errors
+    period: int
+
+def fit_confidence(actual: np.ndarray, fitted: np.ndarray) -> float:
+    """Confidence from in-sample one-step sMAPE, kept in the same range as the statsmodels models"""
+    return max(0.5, min(0.95, 1 - smape(actual, fitted)))
+
+def seasonal_naive_forecast(values: np.ndarray, horizon: int, period: int = SEASONAL_PERIOD) -> tuple:
+    """Repeat the last full season"""
+    if len(values) < period:
+        return None, 0.0
+    last_season = values[-period:]
+    forecast = np.resize(last_season, horizon)
+    confidence = fit_confidence(values[period:], values[:-period])
+    return forecast, confidence
+
+def drift_forecast(values: np.ndarray, horizon: int) -> tuple:
+    """Last value plus the average historical change per day"""
+    if len(values) < 2:
+        return None, 0.0
+    slope = (values[-1] - values[0]) / (len(values) - 1)
+    forecast = np.maximum(values[-1] + slope * np.arange(1, horizon + 1), 0)
+    confidence = fit_confidence(values[1:], values[:-1] + slope)
+    return forecast, confidence
+
+def _holt_winters_filter(values: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+                         period: int) -> tuple:
+    """Additive Holt-Winters recursion run for G parameter sets at once.
+
+    Initial states come from the first two seasons, so two series with the same
+    start produce the same initial states. Returns (level, trend, season, errors)
+    with shapes (G,), (G,), (G, period), (n, G).
+    """
+    n = len(values)
+    first, second = values[:period], values[period:2 * period]
+    n_params = len(alpha)
+    level = np.full(n_params, first.mean())
+    trend = np.full(n_params, (second.mean() - first.mean()) / period)
+    season = np.tile(first - first.mean(), (n_params, 1))
+    errors = np.empty((n, n_params))
+
+    for t in range(n):
+        y = values[t]
+        position = t % period
+        s = season[:, position]
+        errors[t] = y - (level + trend + s)
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, position] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+    return level, trend, season, errors
+
+def fit_holt_winters(values: np.ndarray, period: int = SEASONAL_PERIOD) -> HoltWintersFit:
+    """Grid-search smoothing parameters by in-sample one-step squared error"""
+    if len(values) < 2 * period:
+        raise ValueError(f"Holt-Winters needs at least {2 * period} observations")
+    alpha, beta, gamma = (grid.ravel() for grid in np.meshgrid(HW_ALPHAS, HW_BETAS, HW_GAMMAS, indexing='ij'))
+    level, trend, season, errors = _holt_winters_filter(values, alpha, beta, gamma, period)
+    # Skip the first season, where errors mostly reflect the initialization
+    best = int(np.argmin(np.square(errors[period:]).sum(axis=0)))
+    return HoltWintersFit(
+        alpha=float(alpha[best]),
+        beta=float(beta[best]),
+        gamma=float(gamma[best]),
+        level=float(level[best]),
+        trend=float(trend[best]),
+        season=season[best].copy(),
+        n_obs=len(values),
+        residuals=errors[:, best].copy(),
+        period=period,
+    )
+
+def refilter_holt_winters(fit: HoltWintersFit, values: np.ndarray) -> HoltWintersFit:
+    """Re-run the recursion over a longer series with the same start, keeping the parameters"""
+    params = [np.array([p]) for p in (fit.alpha, fit.beta, fit.gamma)]
+    level, trend, season, errors = _holt_winters_filter(values, *params, fit.period)
+    return fit._replace(
+        level=float(level[0]),
+        trend=float(trend[0]),
+        season=season[0],
+        n_obs=len(values),
+        residuals=errors[:, 0],
+    )
+
+def predict_holt_winters(fit: HoltWintersFit, horizon: int) -> np.ndarray:
+    steps = np.arange(1, horizon + 1)
+    seasonal = fit.season[(fit.n_obs + steps - 1) % fit.period]
+    return fit.level + fit.trend * steps + seasonal
+
+def holt_winters_forecast(values: np.ndarray, horizon: int) -> tuple:
+    """Additive Holt-Winters forecast"""
+    try:
+        fit = fit_holt_winters(values)
+        forecast = predict_holt_winters(fit, horizon)
+        confidence = fit_confidence(values[fit.period:], values[fit.period:] - fit.residuals[fit.period:])
+        return forecast, confidence
+    except Exception as e:
+        logging.error(f"Fast Holt-Winters forecast error: {e}")
+        return None, 0.0
+
+def moving_average_forecast(values: np.ndarray, horizon: int) -> tuple:
+    """Simple moving average fallback"""
+    window = min(30, len(values) // 2)
+    if window < 7:
+        window = 7
+    window = min(window, len(values))
+
+    last_ma = values[-window:].mean()
+    trend = (values[-1] - values[-window]) / window if len(values) >= window else 0
+
+    forecast = last_ma + trend * np.arange(1, horizon + 1)
+    confidence = 0.75
+    return forecast, confidence
+
+def run_models(values: np.ndarray, horizon: int) -> tuple:
+    """Run every fast-path model; returns (forecasts, confidences, models_used)"""
+    forecasts = {}
+    confidences = {}
+    models_used = []
+    for name, model in (
+        ('seasonal_naive', seasonal_naive_forecast),
+        ('holt_winters', holt_winters_forecast),
+        ('drift', drift_forecast),
+    ):
+        forecast, confidence = model(values, horizon)
+        if forecast is not None:
+            forecasts[name] = forecast
+            confidences[name] = confidence
+            models_used.append(MODEL_LABELS[name])
+    return forecasts, confidences, models_used
+
+BACKTEST_MODELS = {
+    'seasonal_naive': BacktestModel(
+        fit=lambda history: None,
+        refilter=lambda fitted, history: None,
+        predict=lambda fitted, history, horizon: seasonal_naive_forecast(history.values, horizon)[0],
+    ),
+    'holt_winters': BacktestModel(
+        fit=lambda history: fit_holt_winters(history.values),
+        refilter=lambda fitted, history: refilter_holt_winters(fitted, history.values),
+        predict=lambda fitted, history, horizon: predict_holt_winters(fitted, horizon),
+    ),
+    'drift': BacktestModel(
+        fit=lambda history: None,
+        refilter=lambda fitted, history: None,
+        predict=lambda fitted, history, horizon: drift_forecast(history.values, horizon)[0],
+    ),
+}
@@ -0,0 +1,128 @@
+"""
+Hierarchical forecast reconciliation
+Builds the summing matrix for a tree of series (e.g. tenant -> branch -> product)
+and reconciles base forecasts bottom-up or with MinT, all as matrix operations.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from ingest import DailySeries
+
+RECONCILIATION_METHODS = ("bottom_up", "mint_shrink", "mint_wls", "ols")
+
+class Hierarchy(NamedTuple):
+    ids: List[str]              # Every node, parents before children
+    parents: Dict[str, Optional[str]]
+    leaves: List[str]           # Bottom-level nodes, in S column order
+    summing: np.ndarray         # S: (n_nodes, n_leaves), 1 where a leaf rolls up into a node
+    levels: Dict[str, int]      # 0 for the root(s)
+
+def build_hierarchy(parents: Dict[str, Optional[str]]) -> Hierarchy:
+    """Validate a parent map (id -> parent id, None for roots) and build its summing matrix"""
+    for node, parent in parents.items():
+        if parent is not None and parent not in parents:
+            raise ValueError(f"Node {node!r} has unknown parent {parent!r}")
+
+    children: Dict[str, List[str]] = {node: [] for node in parents}
+    for node, parent in parents.items():
+        if parent is not None:
+            children[parent].append(node)
+
+    # Breadth-first from the roots gives parents-before-children order and levels; cycles never get reached
+    ids: List[str] = []
+    levels: Dict[str, int] = {}
+    frontier = [node for node, parent in parents.items() if parent is None]
+    if not frontier:
+        raise ValueError("Hierarchy has no root (a node without parent)")
+    level = 0
+    while frontier:
+        for node in frontier:
+            levels[node] = level
+        ids.extend(frontier)
+        frontier = [child for node in frontier for child in children[node]]
+        level += 1
+    if len(ids) != len(parents):
+        raise ValueError("Hierarchy contains a cycle")
+
+    leaves = [node for node in ids if not children[node]]
+    row = {node: i for i, node in enumerate(ids)}
+    summing = np.zeros((len(ids), len(leaves)))
+    for j, leaf in enumerate(leaves):
+        node = leaf
+        while node is not None:
+            summing[row[node], j] = 1.0
+            node = parents[node]
+    return Hierarchy(ids=ids, parents=parents, leaves=leaves, summing=summing, levels=levels)
+
+def aggregate_histories(hierarchy: Hierarchy, leaf_histories: Dict[str, DailySeries]) -> Dict[str, DailySeries]:
+    """Align leaf histories on one daily calendar (zero-filled) and sum them up every level with S"""
+    starts = np.array([leaf_histories[leaf].start for leaf in hierarchy.leaves], dtype='datetime64[D]')
+    ends = np.array([leaf_histories[leaf].start + len(leaf_histories[leaf]) for leaf in hierarchy.leaves],
+                    dtype='datetime64[D]')
+    start = starts.min()
+    n_days = int((ends.max() - start).astype(np.int64))
+
+    bottom = np.zeros((n_days, len(hierarchy.leaves)))
+    for j, leaf in enumerate(hierarchy.leaves):
+        offset = int((starts[j] - start).astype(np.int64))
+        values = leaf_histories[leaf].values
+        bottom[offset:offset + len(values), j] = values
+
+    everything = bottom @ hierarchy.summing.T  # (days, nodes)
+    return {node: DailySeries(start=start, values=everything[:, i].copy()) for i, node in enumerate(hierarchy.ids)}
+
+def shrunk_covariance(residuals: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Schafer-Strimmer shrinkage of the residual covariance towards its diagonal.
+
+    residuals: (T, n) one-step in-sample errors. Returns (W, lambda).
+    """
+    n_obs = residuals.shape[0]
+    covariance = residuals.T @ residuals / n_obs
+    variance = np.diag(covariance).copy()
+    variance[variance <= 0] = np.finfo(float).eps
+    scale = np.sqrt(variance)
+    correlation = covariance / np.outer(scale, scale)
+
+    standardized = residuals / scale
+    squared = standardized ** 2
+    v = (squared.T @ squared - (standardized.T @ standardized) ** 2 / n_obs) / (n_obs * (n_obs - 1))
+    np.fill_diagonal(v, 0.0)
+    d = correlation ** 2
+    np.fill_diagonal(d, 0.0)
+    lam = float(np.clip(v.sum() / d.sum(), 0.0, 1.0)) if d.sum() > 0 else 1.0
+
+    target = np.diag(variance)
+    return lam * target + (1 - lam) * covariance, lam
+
+def leaf_rows(hierarchy: Hierarchy) -> List[int]:
+    """Row of each leaf in S, in column order"""
+    row = {node: i for i, node in enumerate(hierarchy.ids)}
+    return [row[leaf] for leaf in hierarchy.leaves]
+
+def reconcile(base: np.ndarray, hierarchy: Hierarchy, method: str,
+              residuals: Optional[np.ndarray] = None) -> np.ndarray:
+    """Reconcile base forecasts (n_nodes, horizon) into coherent forecasts of the same shape.
+
+    bottom_up uses only the leaf rows. MinT variants compute
+    G = (S' W^-1 S)^-1 S' W^-1 and return S G base; ols uses W = I. Reconciled
+    leaves are clipped at zero before summing up, so results stay coherent and non-negative.
+    """
+    summing = hierarchy.summing
+    if method == "bottom_up":
+        bottom = base[leaf_rows(hierarchy)]
+    else:
+        if method == "ols":
+            w = np.eye(len(hierarchy.ids))
+        elif residuals is None:
+            raise ValueError(f"{method} reconciliation needs in-sample residuals")
+        elif method == "mint_wls":
+            w = np.diag(np.maximum(np.mean(residuals ** 2, axis=0), np.finfo(float).eps))
+        elif method == "mint_shrink":
+            w, _ = shrunk_covariance(residuals)
+        else:
+            raise ValueError(f"Unknown reconciliation {method!r}. Use one of {', '.join(RECONCILIATION_METHODS)}")
+        w_inv_s = np.linalg.solve(w, summing)                  # W^-1 S
+        g = np.linalg.solve(summing.T @ w_inv_s, w_inv_s.T)    # (S' W^-1 S)^-1 S' W^-1
+        bottom = g @ base
+    return summing @ np.maximum(bottom, 0)
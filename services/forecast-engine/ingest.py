@@ -0,0 +1,125 @@
+"""
+Forecast history ingestion
+Turns row, columnar, Arrow IPC and packed binary payloads into a dense daily
+NumPy series without building a row-per-day DataFrame
+"""
+
+from typing import List, NamedTuple, Optional
+import importlib.util
+import numpy as np
+
+# Arrow IPC input is optional; pyarrow is imported on first use
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+ARROW_CONTENT_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+PACKED_CONTENT_TYPE = "application/x-payaid-forecast"
+
+# Packed binary layout (little-endian):
+#   uint32 n | int32[n] day numbers (days since 1970-01-01) | float64[n] values
+# With pre_aggregated=true the day array may be a single start day:
+#   uint32 n | int32 start day | float64[n] values
+PACKED_HEADER = np.dtype("<u4")
+PACKED_DAYS = np.dtype("<i4")
+PACKED_VALUES = np.dtype("<f8")
+
+class DailySeries(NamedTuple):
+    """Dense daily series: values[i] is the total for start + i days"""
+    start: np.datetime64
+    values: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def head(self, n: int) -> "DailySeries":
+        return DailySeries(start=self.start, values=self.values[:n])
+
+    def to_pandas(self, name: str = "revenue"):
+        """pd.Series with a daily DatetimeIndex, for the statsmodels/scikit-learn models"""
+        import pandas as pd
+        index = pd.date_range(start=pd.Timestamp(self.start), periods=len(self.values), freq='D')
+        return pd.Series(self.values, index=index, name=name)
+
+def parse_dates(dates) -> np.ndarray:
+    """Parse ISO date strings (or datetime64 arrays) to datetime64[D] in one vectorized call"""
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[D]')
+    try:
+        return np.asarray(dates, dtype='datetime64[D]')
+    except ValueError:
+        # Timezone suffixes and other non-ISO formats
+        import pandas as pd
+        return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+
+def aggregate_daily(days: np.ndarray, values: np.ndarray, pre_aggregated: bool = False) -> DailySeries:
+    """Sum values per calendar day and fill missing days with 0.
+
+    Equivalent to sort + resample('D').sum().fillna(0), done with one bincount.
+    Pre-aggregated input that is already consecutive and ordered is used as is.
+    """
+    if len(days) != len(values):
+        raise ValueError(f"dates and values differ in length ({len(days)} vs {len(values)})")
+    if len(days) == 0:
+        raise ValueError("Empty historical data")
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    ordinals = days.astype(np.int64)
+
+    if pre_aggregated and (len(ordinals) == 1 or np.all(np.diff(ordinals) == 1)):
+        return DailySeries(start=days[0], values=values)
+
+    first = ordinals.min()
+    dense = np.bincount(ordinals - first, weights=values, minlength=int(ordinals.max() - first) + 1)
+    return DailySeries(start=np.datetime64(int(first), 'D'), values=dense)
+
+def from_records(historical_data: List[dict], value_key: str = "revenue") -> DailySeries:
+    """Row payload: [{"date": "2024-01-01", "revenue": 1000.0}, ...]"""
+    dates = parse_dates([row["date"] for row in historical_data])
+    values = np.fromiter((row.get(value_key) or 0.0 for row in historical_data), dtype=np.float64, count=len(historical_data))
+    return aggregate_daily(dates, values)
+
+def from_columns(values, dates=None, start_date: Optional[str] = None, pre_aggregated: bool = False) -> DailySeries:
+    """Columnar payload: parallel date/value arrays, or a start date plus dense daily values"""
+    values = np.asarray(values, dtype=np.float64)
+    if dates is None:
+        if start_date is None:
+            raise ValueError("Columnar input needs either dates or start_date")
+        return DailySeries(start=np.datetime64(start_date, 'D'), values=np.nan_to_num(values))
+    return aggregate_daily(parse_dates(dates), values, pre_aggregated)
+
+def from_arrow(payload: bytes, pre_aggregated: bool = False, date_column: str = "date",
+               value_column: str = "revenue") -> DailySeries:
+    """Arrow IPC stream or file with a date (date32/timestamp/string) and a numeric value column"""
+    if not ARROW_AVAILABLE:
+        raise RuntimeError("Arrow input not available. Install: pip install pyarrow")
+    import pyarrow as pa
+    buffer = pa.py_buffer(payload)
+    try:
+        table = pa.ipc.open_stream(buffer).read_all()
+    except pa.ArrowInvalid:
+        table = pa.ipc.open_file(buffer).read_all()
+
+    date_col = table.column(date_column).combine_chunks()
+    if pa.types.is_date(date_col.type) or pa.types.is_timestamp(date_col.type):
+        dates = date_col.to_numpy(zero_copy_only=False).astype('datetime64[D]')
+    else:
+        dates = parse_dates(date_col.to_numpy(zero_copy_only=False))
+    values = table.column(value_column).combine_chunks().cast(pa.float64()).fill_null(0).to_numpy()
+    return aggregate_daily(dates, values, pre_aggregated)
+
+def from_packed(payload: bytes, pre_aggregated: bool = False) -> DailySeries:
+    """Packed little-endian binary (see PACKED_* layout above), read with zero-copy frombuffer"""
+    if len(payload) < PACKED_HEADER.itemsize:
+        raise ValueError("Packed payload too short")
+    n = int(np.frombuffer(payload, dtype=PACKED_HEADER, count=1)[0])
+    offset = PACKED_HEADER.itemsize
+    remaining = len(payload) - offset
+
+    if pre_aggregated and remaining == PACKED_DAYS.itemsize + n * PACKED_VALUES.itemsize:
+        start = np.frombuffer(payload, dtype=PACKED_DAYS, count=1, offset=offset)[0]
+        values = np.frombuffer(payload, dtype=PACKED_VALUES, count=n, offset=offset + PACKED_DAYS.itemsize)
+        return DailySeries(start=np.datetime64(int(start), 'D'), values=values.astype(np.float64))
+
+    if remaining != n * (PACKED_DAYS.itemsize + PACKED_VALUES.itemsize):
+        raise ValueError(f"Packed payload size does not match header count {n}")
+    days = np.frombuffer(payload, dtype=PACKED_DAYS, count=n, offset=offset).astype('datetime64[D]')
+    values = np.frombuffer(payload, dtype=PACKED_VALUES, count=n, offset=offset + n * PACKED_DAYS.itemsize)
+    return aggregate_daily(days, values, pre_aggregated)
@@ -0,0 +1,77 @@
+"""
+Simulation-based prediction intervals
+Bootstrapped one-step residuals are propagated through a local linear trend
+state-space recursion, generated as one (paths x horizon) array. Paths are
+drawn from the ensemble's member forecasts, so model disagreement widens the
+intervals as well.
+"""
+
+import os
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+INTERVAL_PATHS = int(os.getenv("FORECAST_INTERVAL_PATHS", "1000"))
+INTERVAL_MAX_PATHS = int(os.getenv("FORECAST_INTERVAL_MAX_PATHS", "5000"))
+DEFAULT_QUANTILES = (0.025, 0.1, 0.9, 0.975)  # 95% and 80% bands
+
+def simulate_errors(residuals: np.ndarray, horizon: int, n_paths: int, alpha: float, beta: float,
+                    rng: np.random.Generator) -> np.ndarray:
+    """Forecast error paths of a Holt linear trend model driven by bootstrapped innovations.
+
+    Error at step t is eps_t + alpha * sum_{j<t} eps_j + beta * sum_{j<t} (t - j) * eps_j,
+    computed with two cumulative sums instead of a loop over steps.
+    """
+    eps = rng.choice(residuals, size=(n_paths, horizon))
+    level_sum = np.cumsum(eps, axis=1)
+    trend_sum = np.cumsum(level_sum, axis=1)
+    return eps + alpha * (level_sum - eps) + beta * (trend_sum - level_sum)
+
+def simulation_intervals(
+    forecasts: Dict[str, np.ndarray],
+    weights: Optional[Dict[str, float]],
+    residuals: np.ndarray,
+    alpha: float,
+    beta: float,
+    quantiles: Optional[Sequence[float]] = None,
+    n_paths: int = INTERVAL_PATHS,
+    seed: int = 0,
+) -> dict:
+    """Quantile bands from simulated paths; lower_80/upper_80/lower_95/upper_95 are always included"""
+    requested = sorted(set(quantiles or ()))
+    if any(not 0 < q < 1 for q in requested):
+        raise ValueError("Quantiles must be strictly between 0 and 1")
+    n_paths = max(1, min(int(n_paths), INTERVAL_MAX_PATHS))
+    residuals = residuals[np.isfinite(residuals)]
+    if len(residuals) == 0:
+        raise ValueError("No residuals to bootstrap")
+
+    rng = np.random.default_rng(seed)
+    names = list(forecasts)
+    members = np.vstack([forecasts[name] for name in names])
+    horizon = members.shape[1]
+
+    # Each path follows one member model, drawn with the ensemble weights
+    if weights and len(names) > 1:
+        p = np.array([weights.get(name, 0.0) for name in names])
+        member = rng.choice(len(names), size=n_paths, p=p / p.sum())
+    else:
+        member = np.zeros(n_paths, dtype=int)
+
+    paths = members[member] + simulate_errors(residuals, horizon, n_paths, alpha, beta, rng)
+    np.maximum(paths, 0, out=paths)  # Revenue is non-negative
+
+    levels = sorted(set(DEFAULT_QUANTILES) | set(requested))
+    bands = np.quantile(paths, levels, axis=0)
+    by_level = dict(zip(levels, bands))
+
+    result = {
+        "lower_80": by_level[0.1].tolist(),
+        "upper_80": by_level[0.9].tolist(),
+        "lower_95": by_level[0.025].tolist(),
+        "upper_95": by_level[0.975].tolist(),
+        "method": "simulation",
+        "paths": n_paths,
+    }
+    if requested:
+        result["quantiles"] = {str(q): by_level[q].tolist() for q in requested}
+    return result
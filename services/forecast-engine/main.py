@@ -1,29 +1,54 @@
 """
 Revenue Forecasting Service
 FastAPI service for advanced time-series forecasting models
-Supports SARIMA, Exponential Smoothing, and Linear Regression
+Supports SARIMA, Exponential Smoothing, and Linear Regression, plus a
+pure-NumPy fast path (seasonal naive, Holt-Winters additive, drift)
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import importlib.util
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
 import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-# Time-series models
-try:
-    from statsmodels.tsa.statespace.sarimax import SARIMAX
-    from statsmodels.tsa.holtwinters import ExponentialSmoothing
-    from sklearn.linear_model import LinearRegression
-    from sklearn.preprocessing import PolynomialFeatures
-    MODELS_AVAILABLE = True
-except ImportError:
-    MODELS_AVAILABLE = False
+import fastpath
+from backtest import cached_backtest
+from intervals import INTERVAL_PATHS, simulation_intervals
+from store import ForecastStore, RefreshScheduler, Registration, StoredForecast, fingerprint
+from hierarchy import RECONCILIATION_METHODS, aggregate_histories, build_hierarchy, reconcile
+from ingest import (
+    ARROW_CONTENT_TYPES, PACKED_CONTENT_TYPE, DailySeries,
+    from_arrow, from_columns, from_packed, from_records,
+)
+
+# Time-series models (statsmodels, scikit-learn and pandas are imported by models.py
+# on the first request that needs them, not at startup)
+MODELS_AVAILABLE = all(importlib.util.find_spec(name) for name in ("statsmodels", "sklearn", "pandas"))
+if not MODELS_AVAILABLE:
     logging.warning("Advanced forecasting models not available. Install: pip install statsmodels scikit-learn pandas numpy")
 
+# model_set="auto" uses the NumPy fast path for short or mostly-zero series
+FAST_PATH_MAX_DAYS = int(os.getenv("FORECAST_FAST_PATH_MAX_DAYS", "90"))
+FAST_PATH_MIN_ZERO_SHARE = float(os.getenv("FORECAST_FAST_PATH_MIN_ZERO_SHARE", "0.5"))
+
+# Precomputed forecast store
+FORECAST_STORE_PATH = os.getenv("FORECAST_STORE_PATH", "forecast_store.db")
+FORECAST_MAX_STALENESS_SECONDS = int(os.getenv("FORECAST_MAX_STALENESS_SECONDS", "3600"))
+FORECAST_STORE_TTL_SECONDS = float(os.getenv("FORECAST_STORE_TTL_SECONDS", "86400"))  # Ad-hoc forecasts; 0 keeps them
+FORECAST_REFRESH_TICK_SECONDS = float(os.getenv("FORECAST_REFRESH_TICK_SECONDS", "30"))
+FORECAST_SCHEDULER_ENABLED = os.getenv("FORECAST_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Hierarchical requests fit their series on this pool
+HIERARCHY_WORKERS = int(os.getenv("FORECAST_HIERARCHY_WORKERS", str(min(8, os.cpu_count() or 1))))
+hierarchy_executor = ThreadPoolExecutor(max_workers=max(1, HIERARCHY_WORKERS), thread_name_prefix="hierarchy")
+
 app = FastAPI(title="Revenue Forecasting Service", version="1.0.0")
 
 # CORS middleware
@@ -36,12 +61,27 @@ app.add_middleware(
 )
 
 # Request/Response models
-class ForecastRequest(BaseModel):
+class HistoryInput(BaseModel):
+    historical_data: List[dict] = []  # [{"date": "2024-01-01", "revenue": 1000.0}, ...]
+    # Columnar alternative to historical_data: parallel arrays, or start_date + dense daily values
+    dates: Optional[List[str]] = None
+    values: Optional[List[float]] = None
+    start_date: Optional[str] = None
+    pre_aggregated: bool = False  # One value per consecutive day; skips daily aggregation
+
+class ForecastRequest(HistoryInput):
     tenant_id: str
-    historical_data: List[dict]  # [{"date": "2024-01-01", "revenue": 1000.0}, ...]
     horizon_days: int = 90
     historical_days: int = 180
     include_confidence_intervals: bool = True
+    backtest: bool = True  # Weight the ensemble by rolling-origin backtest error
+    model_set: str = "auto"  # "fast" (NumPy), "full" (statsmodels/scikit-learn) or "auto"
+    max_staleness_seconds: Optional[int] = None  # Serve a stored forecast up to this old; 0 = always recompute
+    interval_quantiles: Optional[List[float]] = None  # Extra quantiles, e.g. [0.05, 0.5, 0.95]
+    interval_paths: int = INTERVAL_PATHS  # Simulated paths; more is smoother but slower
+
+class RegisterTenantRequest(ForecastRequest):
+    refresh_interval_seconds: int = 3600
 
 class ForecastResponse(BaseModel):
     forecast: List[float]
@@ -50,146 +90,64 @@ class ForecastResponse(BaseModel):
     confidence_intervals: Optional[dict] = None
     models_used: List[str]
     summary: dict
+    model_weights: Optional[dict] = None
+    backtest: Optional[dict] = None
+    model_set: Optional[str] = None
+    generated_at: Optional[str] = None
+    age_seconds: Optional[float] = None
+    served_from_store: bool = False
 
-def prepare_data(historical_data: List[dict]) -> pd.DataFrame:
-    """Convert historical data to pandas DataFrame"""
-    df = pd.DataFrame(historical_data)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
-    df = df.set_index('date')
-    df = df.resample('D').sum().fillna(0)  # Daily aggregation
-    return df
-
-def sarima_forecast(data: pd.Series, horizon: int) -> tuple:
-    """SARIMA (Seasonal AutoRegressive Integrated Moving Average) forecast"""
-    try:
-        # Auto-select best SARIMA parameters (simplified - in production, use auto_arima)
-        # Using (1,1,1)(1,1,1,7) - weekly seasonality
-        model = SARIMAX(
-            data,
-            order=(1, 1, 1),
-            seasonal_order=(1, 1, 1, 7),
-            enforce_stationarity=False,
-            enforce_invertibility=False
-        )
-        fitted_model = model.fit(disp=False)
-        forecast = fitted_model.forecast(steps=horizon)
-        confidence = min(0.95, max(0.7, 1 - (fitted_model.aic / 10000)))  # Rough confidence estimate
-        return forecast.values, confidence
-    except Exception as e:
-        logging.error(f"SARIMA forecast error: {e}")
-        return None, 0.0
+class HierarchyNode(HistoryInput):
+    id: str
+    parent: Optional[str] = None  # None for the root (e.g. the tenant total)
+    # History is required for leaves only; parents are the sum of their children
 
-def exponential_smoothing_forecast(data: pd.Series, horizon: int) -> tuple:
-    """Exponential Smoothing (Holt-Winters) forecast"""
-    try:
-        # Try additive seasonality first
-        try:
-            model = ExponentialSmoothing(
-                data,
-                seasonal_periods=7,  # Weekly seasonality
-                trend='add',
-                seasonal='add'
-            )
-            fitted_model = model.fit(optimized=True)
-        except:
-            # Fallback to multiplicative or no seasonality
-            try:
-                model = ExponentialSmoothing(
-                    data,
-                    seasonal_periods=7,
-                    trend='add',
-                    seasonal='mul'
-                )
-                fitted_model = model.fit(optimized=True)
-            except:
-                # No seasonality
-                model = ExponentialSmoothing(data, trend='add')
-                fitted_model = model.fit(optimized=True)
-        
-        forecast = fitted_model.forecast(steps=horizon)
-        confidence = 0.85  # Exponential smoothing typically has good confidence
-        return forecast.values, confidence
-    except Exception as e:
-        logging.error(f"Exponential Smoothing forecast error: {e}")
-        return None, 0.0
+class HierarchyForecastRequest(BaseModel):
+    tenant_id: str
+    nodes: List[HierarchyNode]
+    horizon_days: int = 90
+    reconciliation: str = "mint_shrink"  # bottom_up, mint_shrink, mint_wls or ols
+    model_set: str = "auto"
+    backtest: bool = True
 
-def linear_regression_forecast(data: pd.Series, horizon: int) -> tuple:
-    """Linear Regression with seasonality forecast"""
-    try:
-        # Create features: day of week, day of month, trend
-        df = pd.DataFrame({'revenue': data.values})
-        df['day_of_week'] = data.index.dayofweek
-        df['day_of_month'] = data.index.day
-        df['trend'] = range(len(data))
-        
-        # One-hot encode day of week
-        df = pd.get_dummies(df, columns=['day_of_week'], prefix='dow')
-        
-        X = df.drop('revenue', axis=1).values
-        y = df['revenue'].values
-        
-        # Train model
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Generate future dates
-        last_date = data.index[-1]
-        future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=horizon, freq='D')
-        
-        # Create features for future dates
-        future_df = pd.DataFrame({
-            'day_of_month': future_dates.day,
-            'trend': range(len(data), len(data) + horizon)
-        })
-        future_df = pd.get_dummies(future_df, columns=[], prefix='dow')
-        
-        # Ensure all day_of_week columns exist
-        for i in range(7):
-            col = f'dow_{i}'
-            if col not in future_df.columns:
-                future_df[col] = 0
-        
-        # Set correct day of week
-        for idx, date in enumerate(future_dates):
-            dow = date.dayofweek
-            future_df.loc[idx, f'dow_{dow}'] = 1
-        
-        # Reorder columns to match training data
-        future_df = future_df.reindex(columns=df.drop('revenue', axis=1).columns, fill_value=0)
-        
-        X_future = future_df.values
-        forecast = model.predict(X_future)
-        forecast = np.maximum(forecast, 0)  # Ensure non-negative
-        
-        # Calculate confidence based on R²
-        r2 = model.score(X, y)
-        confidence = max(0.7, min(0.9, r2))
-        
-        return forecast, confidence
-    except Exception as e:
-        logging.error(f"Linear Regression forecast error: {e}")
-        return None, 0.0
-
-def simple_moving_average_forecast(data: pd.Series, horizon: int) -> tuple:
-    """Simple moving average fallback"""
-    window = min(30, len(data) // 2)
-    if window < 7:
-        window = 7
-    
-    ma = data.rolling(window=window).mean()
-    last_ma = ma.iloc[-1]
-    trend = (data.iloc[-1] - data.iloc[-window]) / window if len(data) >= window else 0
-    
-    forecast = []
-    for i in range(horizon):
-        forecast.append(last_ma + (trend * (i + 1)))
-    
-    confidence = 0.75
-    return np.array(forecast), confidence
+class HierarchyNodeForecast(BaseModel):
+    id: str
+    parent: Optional[str] = None
+    level: int
+    forecast: List[float]
+    base_forecast: Optional[List[float]] = None
+    models_used: List[str]
+    total: float
+
+class HierarchyForecastResponse(BaseModel):
+    dates: List[str]
+    reconciliation: str
+    nodes: List[HierarchyNodeForecast]
+    duration: float
+
+# Request fields that carry history or serving policy rather than forecast settings
+NON_OPTION_FIELDS = {
+    "tenant_id", "historical_data", "dates", "values", "start_date", "pre_aggregated",
+    "historical_days", "max_staleness_seconds", "refresh_interval_seconds",
+}
+# Response fields describing how a forecast was served, not stored with it
+SERVING_FIELDS = {"generated_at", "age_seconds", "served_from_store"}
+
+def prepare_data(request: HistoryInput) -> DailySeries:
+    """Build a dense daily series from the row or columnar history in the request"""
+    if request.values is not None:
+        return from_columns(
+            request.values,
+            dates=request.dates,
+            start_date=request.start_date,
+            pre_aggregated=request.pre_aggregated,
+        )
+    if request.historical_data:
+        return from_records(request.historical_data)
+    raise ValueError("No historical data: send historical_data, or values with dates/start_date")
 
 def calculate_confidence_intervals(forecast: np.ndarray, historical_std: float) -> dict:
-    """Calculate 80% and 95% confidence intervals"""
+    """Constant-width 80% and 95% intervals, used when the simulation cannot run"""
     z80 = 1.28  # 80% confidence
     z95 = 1.96  # 95% confidence
     
@@ -200,68 +158,84 @@ def calculate_confidence_intervals(forecast: np.ndarray, historical_std: float)
         "upper_95": (forecast + z95 * historical_std).tolist(),
     }
 
-@app.post("/api/forecast/revenue", response_model=ForecastResponse)
-async def forecast_revenue(request: ForecastRequest):
-    """Generate revenue forecast using ensemble of models"""
-    
-    if not MODELS_AVAILABLE:
-        raise HTTPException(
-            status_code=500,
-            detail="Advanced forecasting models not available. Install dependencies: pip install statsmodels scikit-learn pandas numpy"
-        )
+def choose_model_set(requested: str, values: np.ndarray) -> str:
+    """Resolve model_set="auto": short or mostly-zero series gain nothing from the heavy models"""
+    if requested in ("fast", "full"):
+        return requested
+    if requested != "auto":
+        raise HTTPException(status_code=400, detail=f"Unknown model_set {requested!r}. Use auto, fast or full")
+    if not MODELS_AVAILABLE or len(values) <= FAST_PATH_MAX_DAYS:
+        return "fast"
+    if np.mean(values == 0) >= FAST_PATH_MIN_ZERO_SHARE:
+        return "fast"
+    return "full"
+
+def generate_forecast(request: ForecastRequest, history: DailySeries) -> ForecastResponse:
+    """Run the model ensemble on a prepared daily series"""
     
     try:
-        # Prepare data
-        df = prepare_data(request.historical_data)
-        
-        if len(df) < 30:
+        if len(history) < 30:
             raise HTTPException(
                 status_code=400,
-                detail=f"Insufficient historical data. Need at least 30 days, got {len(df)}"
+                detail=f"Insufficient historical data. Need at least 30 days, got {len(history)}"
             )
         
-        revenue_series = df['revenue']
+        if request.interval_quantiles and any(not 0 < q < 1 for q in request.interval_quantiles):
+            raise HTTPException(status_code=400, detail="interval_quantiles must be strictly between 0 and 1")
+        
+        values = history.values
+        model_set = choose_model_set(request.model_set, values)
+        if model_set == "full" and not MODELS_AVAILABLE:
+            raise HTTPException(
+                status_code=500,
+                detail="Advanced forecasting models not available. Install dependencies: pip install statsmodels scikit-learn pandas numpy"
+            )
         
         # Calculate historical standard deviation for confidence intervals
-        historical_std = revenue_series.std()
+        historical_std = np.std(values, ddof=1)
         if historical_std == 0:
-            historical_std = revenue_series.mean() * 0.1  # Fallback
+            historical_std = values.mean() * 0.1  # Fallback
         
         # Run multiple models
-        forecasts = {}
-        confidences = {}
-        models_used = []
-        
-        # 1. SARIMA
-        sarima_forecast, sarima_conf = sarima_forecast(revenue_series, request.horizon_days)
-        if sarima_forecast is not None:
-            forecasts['sarima'] = sarima_forecast
-            confidences['sarima'] = sarima_conf
-            models_used.append('SARIMA')
-        
-        # 2. Exponential Smoothing
-        es_forecast, es_conf = exponential_smoothing_forecast(revenue_series, request.horizon_days)
-        if es_forecast is not None:
-            forecasts['exponential_smoothing'] = es_forecast
-            confidences['exponential_smoothing'] = es_conf
-            models_used.append('ExponentialSmoothing')
-        
-        # 3. Linear Regression
-        lr_forecast, lr_conf = linear_regression_forecast(revenue_series, request.horizon_days)
-        if lr_forecast is not None:
-            forecasts['linear_regression'] = lr_forecast
-            confidences['linear_regression'] = lr_conf
-            models_used.append('LinearRegression')
+        if model_set == "full":
+            import models  # Heavy imports happen here, once
+            forecasts, confidences, models_used = models.run_models(history.to_pandas(), request.horizon_days)
+            backtest_models = models.BACKTEST_MODELS
+        else:
+            forecasts, confidences, models_used = fastpath.run_models(values, request.horizon_days)
+            backtest_models = fastpath.BACKTEST_MODELS
         
         # Fallback to simple moving average if no models worked
         if not forecasts:
-            sma_forecast, sma_conf = simple_moving_average_forecast(revenue_series, request.horizon_days)
+            sma_forecast, sma_conf = fastpath.moving_average_forecast(values, request.horizon_days)
             forecasts['simple_moving_average'] = sma_forecast
             confidences['simple_moving_average'] = sma_conf
             models_used.append('SimpleMovingAverage')
         
-        # Ensemble: Weighted average based on confidence
-        if len(forecasts) > 1:
+        # Learn ensemble weights from out-of-sample error (cached per tenant)
+        backtest_result = None
+        if request.backtest and len(forecasts) > 1:
+            backtest_result = cached_backtest(
+                request.tenant_id,
+                history,
+                {name: spec for name, spec in backtest_models.items() if name in forecasts},
+                horizon=request.horizon_days,
+            )
+        
+        weights = None
+        if backtest_result is not None:
+            weights = {k: v for k, v in backtest_result.weights.items() if k in forecasts}
+            total_weight = sum(weights.values())
+            weights = {k: v / total_weight for k, v in weights.items()}
+            
+            ensemble_forecast = np.zeros(request.horizon_days)
+            for model_name, weight in weights.items():
+                ensemble_forecast += forecasts[model_name] * weight
+            
+            # Confidence from the ensemble's held-out sMAPE
+            overall_confidence = max(0.0, min(0.99, 1 - backtest_result.ensemble_metrics['smape']))
+        elif len(forecasts) > 1:
+            # Ensemble: Weighted average based on confidence
             total_confidence = sum(confidences.values())
             weights = {k: v / total_confidence for k, v in confidences.items()}
             
@@ -281,19 +255,32 @@ async def forecast_revenue(request: ForecastRequest):
         ensemble_forecast = np.maximum(ensemble_forecast, 0)
         
         # Generate dates
-        last_date = revenue_series.index[-1]
-        dates = [(last_date + timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(request.horizon_days)]
+        last_date = history.start + (len(history) - 1)
+        dates = np.datetime_as_string(last_date + np.arange(1, request.horizon_days + 1), unit='D').tolist()
         
         # Calculate summary
         total_forecast = float(np.sum(ensemble_forecast))
         daily_average = float(np.mean(ensemble_forecast))
-        recent_avg = float(revenue_series.tail(7).mean())
+        recent_avg = float(values[-7:].mean())
         projection_vs_current = ((daily_average - recent_avg) / recent_avg * 100) if recent_avg > 0 else 0
         
-        # Confidence intervals
+        # Confidence intervals: bootstrap Holt-Winters innovations over the ensemble members
         confidence_intervals = None
         if request.include_confidence_intervals:
-            confidence_intervals = calculate_confidence_intervals(ensemble_forecast, historical_std)
+            try:
+                error_model = fastpath.fit_holt_winters(values)
+                confidence_intervals = simulation_intervals(
+                    forecasts,
+                    weights,
+                    residuals=error_model.residuals[error_model.period:],
+                    alpha=error_model.alpha,
+                    beta=error_model.beta,
+                    quantiles=request.interval_quantiles,
+                    n_paths=request.interval_paths,
+                )
+            except Exception as e:
+                logging.warning(f"Simulated intervals unavailable, using constant width: {e}")
+                confidence_intervals = calculate_confidence_intervals(ensemble_forecast, historical_std)
         
         return ForecastResponse(
             forecast=ensemble_forecast.tolist(),
@@ -305,7 +292,16 @@ async def forecast_revenue(request: ForecastRequest):
                 "total_90day": total_forecast,
                 "daily_average": daily_average,
                 "projection_vs_current": projection_vs_current,
-            }
+            },
+            model_weights=weights,
+            backtest={
+                "origins": backtest_result.origins,
+                "horizon": backtest_result.horizon,
+                "metrics": backtest_result.metrics,
+                "ensemble": backtest_result.ensemble_metrics,
+                "duration": backtest_result.duration,
+            } if backtest_result is not None else None,
+            model_set=model_set,
         )
     
     except HTTPException:
@@ -314,12 +310,261 @@ async def forecast_revenue(request: ForecastRequest):
         logging.error(f"Forecast error: {e}")
         raise HTTPException(status_code=500, detail=f"Forecast generation failed: {str(e)}")
 
+def forecast_options(request: ForecastRequest) -> dict:
+    return request.model_dump(exclude=NON_OPTION_FIELDS)
+
+def stored_response(stored: StoredForecast) -> ForecastResponse:
+    return ForecastResponse(
+        **stored.response,
+        generated_at=datetime.fromtimestamp(stored.generated_at, timezone.utc).isoformat(),
+        age_seconds=stored.age,
+        served_from_store=True,
+    )
+
+def compute_and_store(tenant_id: str, request: ForecastRequest, history: DailySeries,
+                      data_fingerprint: str) -> ForecastResponse:
+    response = generate_forecast(request, history)
+    generated_at = forecast_store.put_forecast(
+        tenant_id, forecast_options(request), data_fingerprint, response.model_dump(exclude=SERVING_FIELDS)
+    )
+    response.generated_at = datetime.fromtimestamp(generated_at, timezone.utc).isoformat()
+    response.age_seconds = 0.0
+    return response
+
+def refresh_tenant(registration: Registration) -> ForecastResponse:
+    """Recompute and store a registered tenant's forecast from its stored history"""
+    request = ForecastRequest(tenant_id=registration.tenant_id, **registration.options)
+    return compute_and_store(registration.tenant_id, request, registration.history, registration.fingerprint)
+
+def serve_forecast(request: ForecastRequest, history: DailySeries) -> ForecastResponse:
+    """Serve a stored forecast for identical history within the staleness tolerance, else compute one"""
+    options = forecast_options(request)
+    data_fingerprint = fingerprint(history)
+    max_staleness = request.max_staleness_seconds
+    if max_staleness is None:
+        max_staleness = FORECAST_MAX_STALENESS_SECONDS
+
+    if max_staleness > 0:
+        stored = forecast_store.get_forecast(request.tenant_id, options)
+        if stored is not None and stored.fingerprint == data_fingerprint and stored.age <= max_staleness:
+            return stored_response(stored)
+
+    response = compute_and_store(request.tenant_id, request, history, data_fingerprint)
+
+    # Data changed for a registered tenant: keep its scheduled forecast in step
+    registration = forecast_store.registration(request.tenant_id)
+    if registration is not None and registration.fingerprint != data_fingerprint:
+        if registration.options == options:
+            forecast_store.update_history(request.tenant_id, history, time.time() + registration.refresh_interval)
+        else:
+            forecast_store.update_history(request.tenant_id, history, time.time())
+            refresh_scheduler.wake()
+    return response
+
+forecast_store = ForecastStore(FORECAST_STORE_PATH, ttl_seconds=FORECAST_STORE_TTL_SECONDS)
+refresh_scheduler = RefreshScheduler(forecast_store, refresh_tenant, tick_seconds=FORECAST_REFRESH_TICK_SECONDS)
+
+@app.on_event("startup")
+async def start_refresh_scheduler():
+    if FORECAST_SCHEDULER_ENABLED:
+        refresh_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_refresh_scheduler():
+    refresh_scheduler.stop()
+
+@app.post("/api/forecast/revenue", response_model=ForecastResponse)
+async def forecast_revenue(request: ForecastRequest):
+    """Generate revenue forecast using ensemble of models"""
+    try:
+        history = prepare_data(request)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid historical data: {e}")
+    return serve_forecast(request, history)
+
+def fit_hierarchy_node(request: HierarchyForecastRequest, node_id: str, history: DailySeries) -> tuple:
+    """Base forecast plus one-step residuals (for MinT) of one hierarchy node"""
+    node_request = ForecastRequest(
+        tenant_id=f"{request.tenant_id}/{node_id}",
+        horizon_days=request.horizon_days,
+        include_confidence_intervals=False,
+        backtest=request.backtest,
+        model_set=request.model_set,
+    )
+    response = generate_forecast(node_request, history)
+    residuals = None
+    if request.reconciliation.startswith("mint"):
+        error_model = fastpath.fit_holt_winters(history.values)
+        residuals = error_model.residuals[error_model.period:]
+    return response, residuals
+
+@app.post("/api/forecast/hierarchy", response_model=HierarchyForecastResponse)
+async def forecast_hierarchy(request: HierarchyForecastRequest):
+    """Forecast every level of a product/branch/tenant hierarchy in one pass and reconcile them"""
+    start_time = time.time()
+    if request.reconciliation not in RECONCILIATION_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown reconciliation {request.reconciliation!r}. Use one of {', '.join(RECONCILIATION_METHODS)}",
+        )
+    try:
+        parents = {node.id: node.parent for node in request.nodes}
+        if len(parents) != len(request.nodes):
+            raise ValueError("Node ids must be unique")
+        hierarchy = build_hierarchy(parents)
+        nodes_by_id = {node.id: node for node in request.nodes}
+        histories = aggregate_histories(
+            hierarchy, {leaf: prepare_data(nodes_by_id[leaf]) for leaf in hierarchy.leaves}
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid hierarchy: {e}")
+
+    # Bottom-up only needs the leaves; MinT needs a base forecast at every level
+    fitted_ids = hierarchy.leaves if request.reconciliation == "bottom_up" else hierarchy.ids
+    futures = {
+        node_id: hierarchy_executor.submit(fit_hierarchy_node, request, node_id, histories[node_id])
+        for node_id in fitted_ids
+    }
+    results = {node_id: future.result() for node_id, future in futures.items()}
+
+    try:
+        base = np.zeros((len(hierarchy.ids), request.horizon_days))
+        for i, node_id in enumerate(hierarchy.ids):
+            if node_id in results:
+                base[i] = results[node_id][0].forecast
+        residuals = None
+        if request.reconciliation.startswith("mint"):
+            residuals = np.column_stack([results[node_id][1] for node_id in hierarchy.ids])
+        reconciled = reconcile(base, hierarchy, request.reconciliation, residuals)
+    except (np.linalg.LinAlgError, ValueError) as e:
+        logging.error(f"Hierarchy reconciliation error: {e}")
+        raise HTTPException(status_code=500, detail=f"Reconciliation failed: {str(e)}")
+
+    dates = next(iter(results.values()))[0].dates
+    return HierarchyForecastResponse(
+        dates=dates,
+        reconciliation=request.reconciliation,
+        nodes=[
+            HierarchyNodeForecast(
+                id=node_id,
+                parent=hierarchy.parents[node_id],
+                level=hierarchy.levels[node_id],
+                forecast=reconciled[i].tolist(),
+                base_forecast=results[node_id][0].forecast if node_id in results else None,
+                models_used=results[node_id][0].models_used if node_id in results else [],
+                total=float(reconciled[i].sum()),
+            )
+            for i, node_id in enumerate(hierarchy.ids)
+        ],
+        duration=time.time() - start_time,
+    )
+
+@app.post("/api/forecast/revenue/binary", response_model=ForecastResponse)
+async def forecast_revenue_binary(
+    http_request: Request,
+    tenant_id: str,
+    horizon_days: int = 90,
+    include_confidence_intervals: bool = True,
+    backtest: bool = True,
+    pre_aggregated: bool = False,
+    model_set: str = "auto",
+    max_staleness_seconds: Optional[int] = None,
+):
+    """Revenue forecast from an Arrow IPC or packed binary body; options go in the query string"""
+    content_type = http_request.headers.get("content-type", "").split(";")[0].strip().lower()
+    payload = await http_request.body()
+    try:
+        if content_type in ARROW_CONTENT_TYPES:
+            history = from_arrow(payload, pre_aggregated=pre_aggregated)
+        elif content_type in (PACKED_CONTENT_TYPE, "application/octet-stream"):
+            history = from_packed(payload, pre_aggregated=pre_aggregated)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported content type {content_type!r}. Use {ARROW_CONTENT_TYPES[0]} or {PACKED_CONTENT_TYPE}",
+            )
+    except HTTPException:
+        raise
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid historical data: {e}")
+
+    request = ForecastRequest(
+        tenant_id=tenant_id,
+        horizon_days=horizon_days,
+        include_confidence_intervals=include_confidence_intervals,
+        backtest=backtest,
+        pre_aggregated=pre_aggregated,
+        model_set=model_set,
+        max_staleness_seconds=max_staleness_seconds,
+    )
+    return serve_forecast(request, history)
+
+@app.get("/api/forecast/revenue/{tenant_id}", response_model=ForecastResponse)
+async def stored_forecast(tenant_id: str, max_staleness_seconds: Optional[int] = None):
+    """Serve a registered tenant's precomputed forecast, recomputing it if it is missing or too old"""
+    registration = forecast_store.registration(tenant_id)
+    if registration is None:
+        raise HTTPException(status_code=404, detail=f"Tenant {tenant_id} is not registered for precomputed forecasts")
+    if max_staleness_seconds is None:
+        max_staleness_seconds = FORECAST_MAX_STALENESS_SECONDS
+
+    stored = forecast_store.get_forecast(tenant_id, registration.options)
+    if (stored is not None and stored.fingerprint == registration.fingerprint
+            and stored.age <= max_staleness_seconds):
+        return stored_response(stored)
+    response = refresh_tenant(registration)
+    forecast_store.schedule(tenant_id, time.time() + registration.refresh_interval)
+    return response
+
+@app.post("/api/forecast/revenue/{tenant_id}/refresh", response_model=ForecastResponse)
+async def refresh_forecast(tenant_id: str):
+    """Recompute a registered tenant's forecast now"""
+    registration = forecast_store.registration(tenant_id)
+    if registration is None:
+        raise HTTPException(status_code=404, detail=f"Tenant {tenant_id} is not registered for precomputed forecasts")
+    response = refresh_tenant(registration)
+    forecast_store.schedule(tenant_id, time.time() + registration.refresh_interval)
+    return response
+
+@app.post("/api/forecast/tenants")
+async def register_tenant(request: RegisterTenantRequest):
+    """Register a tenant's history and forecast options for scheduled precomputation"""
+    try:
+        history = prepare_data(request)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid historical data: {e}")
+    if request.refresh_interval_seconds <= 0:
+        raise HTTPException(status_code=400, detail="refresh_interval_seconds must be positive")
+
+    registration = forecast_store.register(
+        request.tenant_id, forecast_options(request), history, request.refresh_interval_seconds
+    )
+    refresh_scheduler.wake()
+    return {
+        "tenant_id": registration.tenant_id,
+        "fingerprint": registration.fingerprint,
+        "days": len(history),
+        "refresh_interval_seconds": registration.refresh_interval,
+    }
+
+@app.delete("/api/forecast/tenants/{tenant_id}")
+async def unregister_tenant(tenant_id: str):
+    if not forecast_store.unregister(tenant_id):
+        raise HTTPException(status_code=404, detail=f"Tenant {tenant_id} is not registered")
+    return {"tenant_id": tenant_id, "unregistered": True}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "models_available": MODELS_AVAILABLE,
+        "heavy_models_loaded": "models" in sys.modules,
+        "registered_tenants": forecast_store.tenant_count(),
+        "stored_forecasts": forecast_store.forecast_count(),
+        "scheduler_running": refresh_scheduler.running,
         "service": "revenue-forecasting"
     }
 
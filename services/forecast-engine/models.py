@@ -0,0 +1,184 @@
+"""
+Statsmodels / scikit-learn forecasting models
+SARIMA, Holt-Winters and Linear Regression. Imported lazily by main.py the first
+time a request needs the full model set, so the heavy imports stay off the startup path.
+"""
+
+from datetime import timedelta
+import logging
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from sklearn.linear_model import LinearRegression
+
+from backtest import BacktestModel
+
+SARIMA_ORDER = (1, 1, 1)
+SARIMA_SEASONAL_ORDER = (1, 1, 1, 7)  # Weekly seasonality
+
+def fit_sarima(data: pd.Series):
+    """Estimate SARIMA parameters on a daily series"""
+    # Auto-select best SARIMA parameters (simplified - in production, use auto_arima)
+    # Using (1,1,1)(1,1,1,7) - weekly seasonality
+    model = SARIMAX(
+        data,
+        order=SARIMA_ORDER,
+        seasonal_order=SARIMA_SEASONAL_ORDER,
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    )
+    return model.fit(disp=False)
+
+def refilter_sarima(fitted_model, data: pd.Series):
+    """Run the Kalman filter over a longer series with already-estimated parameters"""
+    return fitted_model.apply(data, refit=False)
+
+def sarima_forecast(data: pd.Series, horizon: int) -> tuple:
+    """SARIMA (Seasonal AutoRegressive Integrated Moving Average) forecast"""
+    try:
+        fitted_model = fit_sarima(data)
+        forecast = fitted_model.forecast(steps=horizon)
+        confidence = min(0.95, max(0.7, 1 - (fitted_model.aic / 10000)))  # Rough confidence estimate
+        return forecast.values, confidence
+    except Exception as e:
+        logging.error(f"SARIMA forecast error: {e}")
+        return None, 0.0
+
+def fit_exponential_smoothing(data: pd.Series):
+    """Fit Holt-Winters, falling back from additive to multiplicative to no seasonality"""
+    # Try additive seasonality first
+    try:
+        model = ExponentialSmoothing(
+            data,
+            seasonal_periods=7,  # Weekly seasonality
+            trend='add',
+            seasonal='add'
+        )
+        return model.fit(optimized=True)
+    except Exception:
+        pass
+    # Fallback to multiplicative or no seasonality
+    try:
+        model = ExponentialSmoothing(
+            data,
+            seasonal_periods=7,
+            trend='add',
+            seasonal='mul'
+        )
+        return model.fit(optimized=True)
+    except Exception:
+        # No seasonality
+        model = ExponentialSmoothing(data, trend='add')
+        return model.fit(optimized=True)
+
+def refilter_exponential_smoothing(fitted_model, data: pd.Series):
+    """Re-run Holt-Winters over a longer series that starts at the same date, keeping the fitted parameters"""
+    params = fitted_model.params
+    fitted_spec = fitted_model.model
+    model = ExponentialSmoothing(
+        data,
+        seasonal_periods=fitted_spec.seasonal_periods,
+        trend=fitted_spec.trend,
+        seasonal=fitted_spec.seasonal,
+        initialization_method='known',
+        initial_level=params['initial_level'],
+        initial_trend=params['initial_trend'] if fitted_spec.trend else None,
+        initial_seasonal=params['initial_seasons'] if fitted_spec.seasonal else None,
+    )
+    return model.fit(
+        smoothing_level=params['smoothing_level'],
+        smoothing_trend=params['smoothing_trend'],
+        smoothing_seasonal=params['smoothing_seasonal'] if fitted_spec.seasonal else None,
+        optimized=False,
+    )
+
+def exponential_smoothing_forecast(data: pd.Series, horizon: int) -> tuple:
+    """Exponential Smoothing (Holt-Winters) forecast"""
+    try:
+        fitted_model = fit_exponential_smoothing(data)
+        forecast = fitted_model.forecast(steps=horizon)
+        confidence = 0.85  # Exponential smoothing typically has good confidence
+        return forecast.values, confidence
+    except Exception as e:
+        logging.error(f"Exponential Smoothing forecast error: {e}")
+        return None, 0.0
+
+def regression_features(dates: pd.DatetimeIndex, trend_start: int) -> np.ndarray:
+    """Features: day of month, linear trend and one-hot day of week"""
+    day_of_week = np.asarray(dates.dayofweek)
+    return np.column_stack([
+        np.asarray(dates.day),
+        np.arange(trend_start, trend_start + len(dates)),
+        (day_of_week[:, None] == np.arange(7)).astype(float),
+    ])
+
+def fit_linear_regression(data: pd.Series):
+    """Closed-form least squares fit on calendar features"""
+    model = LinearRegression()
+    model.fit(regression_features(data.index, 0), data.values)
+    return model
+
+def predict_linear_regression(model, data: pd.Series, horizon: int) -> np.ndarray:
+    """Predict the `horizon` days after the end of `data`"""
+    future_dates = pd.date_range(start=data.index[-1] + timedelta(days=1), periods=horizon, freq='D')
+    forecast = model.predict(regression_features(future_dates, len(data)))
+    return np.maximum(forecast, 0)  # Ensure non-negative
+
+def linear_regression_forecast(data: pd.Series, horizon: int) -> tuple:
+    """Linear Regression with seasonality forecast"""
+    try:
+        model = fit_linear_regression(data)
+        forecast = predict_linear_regression(model, data, horizon)
+        
+        # Calculate confidence based on R²
+        r2 = model.score(regression_features(data.index, 0), data.values)
+        confidence = max(0.7, min(0.9, r2))
+        
+        return forecast, confidence
+    except Exception as e:
+        logging.error(f"Linear Regression forecast error: {e}")
+        return None, 0.0
+
+# How each model is refit across backtest origins: parameters are estimated once
+# at the earliest origin, later origins only re-run the filter (or the closed-form solve)
+BACKTEST_MODELS = {
+    'sarima': BacktestModel(
+        fit=lambda history: fit_sarima(history.to_pandas()),
+        refilter=lambda fitted, history: refilter_sarima(fitted, history.to_pandas()),
+        predict=lambda fitted, history, horizon: fitted.forecast(steps=horizon).values,
+    ),
+    'exponential_smoothing': BacktestModel(
+        fit=lambda history: fit_exponential_smoothing(history.to_pandas()),
+        refilter=lambda fitted, history: refilter_exponential_smoothing(fitted, history.to_pandas()),
+        predict=lambda fitted, history, horizon: fitted.forecast(steps=horizon).values,
+    ),
+    'linear_regression': BacktestModel(
+        fit=lambda history: fit_linear_regression(history.to_pandas()),
+        refilter=lambda fitted, history: fit_linear_regression(history.to_pandas()),
+        predict=lambda fitted, history, horizon: predict_linear_regression(fitted, history.to_pandas(), horizon),
+    ),
+}
+
+MODEL_LABELS = {
+    'sarima': 'SARIMA',
+    'exponential_smoothing': 'ExponentialSmoothing',
+    'linear_regression': 'LinearRegression',
+}
+
+def run_models(data: pd.Series, horizon: int) -> tuple:
+    """Run every statsmodels/scikit-learn model; returns (forecasts, confidences, models_used)"""
+    forecasts = {}
+    confidences = {}
+    models_used = []
+    for name, model in (
+        ('sarima', sarima_forecast),
+        ('exponential_smoothing', exponential_smoothing_forecast),
+        ('linear_regression', linear_regression_forecast),
+    ):
+        forecast, confidence = model(data, horizon)
+        if forecast is not None:
+            forecasts[name] = forecast
+            confidences[name] = confidence
+            models_used.append(MODEL_LABELS[name])
+    return forecasts, confidences, models_used
@@ -0,0 +1,275 @@
+"""
+Precomputed forecast store and background refresh scheduler
+Forecasts are kept in SQLite keyed by tenant and forecast options; registered
+tenants are refreshed on a cadence or as soon as their history changes. Ad-hoc
+forecasts (anything but a registered tenant's own options) expire after a TTL.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from ingest import DailySeries
+
+PRUNE_INTERVAL_SECONDS = 300.0  # Expired ad-hoc forecasts are deleted at most this often
+
+class StoredForecast(NamedTuple):
+    fingerprint: str
+    generated_at: float
+    response: dict
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.generated_at)
+
+class Registration(NamedTuple):
+    tenant_id: str
+    options: dict
+    history: DailySeries
+    fingerprint: str
+    refresh_interval: int
+    next_refresh_at: float
+
+def fingerprint(history: DailySeries) -> str:
+    """Content hash of a daily series; changes whenever any day's value or the start date changes"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(history.start).encode())
+    digest.update(np.ascontiguousarray(history.values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def options_key(options: dict) -> str:
+    return json.dumps(options, sort_keys=True, separators=(",", ":"))
+
+class ForecastStore:
+    """SQLite-backed store; a single connection guarded by a lock is plenty for this write rate"""
+
+    def __init__(self, path: str, ttl_seconds: float = 0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds  # 0 keeps ad-hoc forecasts forever
+        self._pruned_at = 0.0
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS forecasts (
+                    tenant_id TEXT NOT NULL,
+                    options_key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    generated_at REAL NOT NULL,
+                    response TEXT NOT NULL,
+                    PRIMARY KEY (tenant_id, options_key)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS forecasts_generated_at ON forecasts (generated_at)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS tenants (
+                    tenant_id TEXT PRIMARY KEY,
+                    options TEXT NOT NULL,
+                    start_day INTEGER NOT NULL,
+                    history BLOB NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    refresh_interval INTEGER NOT NULL,
+                    next_refresh_at REAL NOT NULL
+                )"""
+            )
+
+    def get_forecast(self, tenant_id: str, options: dict) -> Optional[StoredForecast]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, generated_at, response FROM forecasts WHERE tenant_id = ? AND options_key = ?",
+                (tenant_id, options_key(options)),
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredForecast(fingerprint=row[0], generated_at=row[1], response=json.loads(row[2]))
+
+    def put_forecast(self, tenant_id: str, options: dict, fingerprint: str, response: dict,
+                     generated_at: Optional[float] = None) -> float:
+        generated_at = generated_at or time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO forecasts (tenant_id, options_key, fingerprint, generated_at, response) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (tenant_id, options_key(options), fingerprint, generated_at, json.dumps(response)),
+            )
+        now = time.time()
+        if self.ttl_seconds > 0 and now - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+            self._pruned_at = now
+            self.prune(now - self.ttl_seconds)
+        return generated_at
+
+    def prune(self, cutoff: float) -> int:
+        """Delete forecasts generated before cutoff, except each registered tenant's own (the scheduler keeps those)"""
+        with self._lock, self._conn:
+            kept = {
+                (tenant_id, options_key(json.loads(options)))
+                for tenant_id, options in self._conn.execute("SELECT tenant_id, options FROM tenants")
+            }
+            expired = [
+                row for row in self._conn.execute(
+                    "SELECT tenant_id, options_key FROM forecasts WHERE generated_at < ?", (cutoff,)
+                ) if row not in kept
+            ]
+            self._conn.executemany("DELETE FROM forecasts WHERE tenant_id = ? AND options_key = ?", expired)
+        if expired:
+            self.pruned += len(expired)
+            logging.info(f"Pruned {len(expired)} expired ad-hoc forecasts")
+        return len(expired)
+
+    def register(self, tenant_id: str, options: dict, history: DailySeries, refresh_interval: int) -> Registration:
+        """Register (or re-register) a tenant; it is due for refresh immediately"""
+        registration = Registration(
+            tenant_id=tenant_id,
+            options=options,
+            history=history,
+            fingerprint=fingerprint(history),
+            refresh_interval=refresh_interval,
+            next_refresh_at=time.time(),
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tenants "
+                "(tenant_id, options, start_day, history, fingerprint, refresh_interval, next_refresh_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    tenant_id,
+                    json.dumps(options),
+                    int(history.start.astype(np.int64)),
+                    np.ascontiguousarray(history.values, dtype="<f8").tobytes(),
+                    registration.fingerprint,
+                    refresh_interval,
+                    registration.next_refresh_at,
+                ),
+            )
+        return registration
+
+    def update_history(self, tenant_id: str, history: DailySeries, next_refresh_at: float) -> None:
+        """Replace a registered tenant's history (e.g. a request arrived with newer data)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tenants SET start_day = ?, history = ?, fingerprint = ?, next_refresh_at = ? WHERE tenant_id = ?",
+                (
+                    int(history.start.astype(np.int64)),
+                    np.ascontiguousarray(history.values, dtype="<f8").tobytes(),
+                    fingerprint(history),
+                    next_refresh_at,
+                    tenant_id,
+                ),
+            )
+
+    def unregister(self, tenant_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM tenants WHERE tenant_id = ?", (tenant_id,))
+            self._conn.execute("DELETE FROM forecasts WHERE tenant_id = ?", (tenant_id,))
+        return cursor.rowcount > 0
+
+    def registration(self, tenant_id: str) -> Optional[Registration]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tenant_id, options, start_day, history, fingerprint, refresh_interval, next_refresh_at "
+                "FROM tenants WHERE tenant_id = ?",
+                (tenant_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Registration(
+            tenant_id=row[0],
+            options=json.loads(row[1]),
+            history=DailySeries(start=np.datetime64(row[2], 'D'), values=np.frombuffer(row[3], dtype="<f8")),
+            fingerprint=row[4],
+            refresh_interval=row[5],
+            next_refresh_at=row[6],
+        )
+
+    def due(self, now: float) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tenant_id FROM tenants WHERE next_refresh_at <= ? ORDER BY next_refresh_at", (now,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def schedule(self, tenant_id: str, next_refresh_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tenants SET next_refresh_at = ? WHERE tenant_id = ?", (next_refresh_at, tenant_id)
+            )
+
+    def tenant_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tenants").fetchone()[0]
+
+    def forecast_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+
+class RefreshScheduler:
+    """Background thread that refreshes every registered tenant whose next_refresh_at has passed"""
+
+    def __init__(self, store: ForecastStore, refresh: Callable[[Registration], None],
+                 tick_seconds: float = 30.0, retry_seconds: float = 300.0):
+        self.store = store
+        self.refresh = refresh
+        self.tick_seconds = tick_seconds
+        self.retry_seconds = retry_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run_at: Optional[float] = None
+        self.refreshed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="forecast-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wake(self) -> None:
+        """Run a pass now instead of waiting for the next tick (e.g. after a registration)"""
+        self._wake.set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def run_once(self) -> int:
+        refreshed = 0
+        for tenant_id in self.store.due(time.time()):
+            registration = self.store.registration(tenant_id)
+            if registration is None:
+                continue
+            try:
+                self.refresh(registration)
+                self.store.schedule(tenant_id, time.time() + registration.refresh_interval)
+                self.refreshed += 1
+                refreshed += 1
+            except Exception as e:
+                logging.error(f"Scheduled forecast refresh failed for {tenant_id}: {e}")
+                self.store.schedule(tenant_id, time.time() + min(self.retry_seconds, registration.refresh_interval))
+                self.failed += 1
+        self.last_run_at = time.time()
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Forecast refresh pass failed: {e}")
+            self._wake.wait(self.tick_seconds)
+            self._wake.clear()
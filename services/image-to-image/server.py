@@ -3,101 +3,155 @@ Image to Image Service using Stable Diffusion XL (img2img mode)
 """
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from diffusers import StableDiffusionXLImg2ImgPipeline
 import torch
 from PIL import Image
+from typing import Optional
 import os
+import sys
 import logging
 import time
-import httpx
-from io import BytesIO
-import base64
+import asyncio
+import secrets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # services/, for shared/ outside Docker
+from shared.inference import InferenceExecutor
+from shared.lifecycle import ManagedModel
+from shared.startup import ModelStartup
+from shared.image_source import fetch_image, source_cache
+from shared.output_cache import OutputCache, cache_key
+from shared.diffusion_backend import inference_context, load_pipeline
+from shared.image_output import (
+    OutputOptions,
+    encode_image_async,
+    image_response,
+    reencode_png_async,
+    validate_output_options,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Image to Image Service")
 
-# Initialize SDXL img2img pipeline
-img2img_pipeline = None
+# SDXL img2img pipeline, loaded on demand and evicted when idle
+backend = None
 MODEL_NAME = os.getenv("MODEL_NAME", "stabilityai/stable-diffusion-xl-base-1.0")
 
-try:
+def load_model():
+    global backend
     logger.info(f"Loading SDXL img2img model: {MODEL_NAME}")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    logger.info(f"Using device: {device}")
-    
-    img2img_pipeline = StableDiffusionXLImg2ImgPipeline.from_pretrained(
-        MODEL_NAME,
-        torch_dtype=torch.float16 if device == "cuda" else torch.float32,
-        use_safetensors=True,
-    )
-    img2img_pipeline = img2img_pipeline.to(device)
-    
-    if device == "cpu":
-        img2img_pipeline.enable_attention_slicing()
-    
-    logger.info("✅ SDXL img2img model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load img2img model: {e}")
-    img2img_pipeline = None
+    with img2img_model.step("import"):
+        from diffusers import StableDiffusionXLImg2ImgPipeline
+    with img2img_model.step("pipeline"):
+        # Uses CUDA when available; CPU optimizations depend on the configured backend
+        pipeline, backend = load_pipeline(StableDiffusionXLImg2ImgPipeline, MODEL_NAME, task="img2img")
+    logger.info(f"Using backend: {backend.describe()}")
+    return pipeline
+
+def warm_up(pipeline) -> None:
+    """One short pass at the served size, so the first request does not pay for allocator and kernel setup"""
+    with inference_context(backend):
+        pipeline(prompt="warm-up", image=Image.new("RGB", (1024, 1024)), strength=0.5, num_inference_steps=2)
 
-class I2IRequest(BaseModel):
+img2img_model = ManagedModel("img2img", load_model)
+inference = InferenceExecutor("img2img")
+
+# Loads in the background once the server is listening; /health/ready turns 200 after the warm-up
+startup = ModelStartup(img2img_model, inference, warm_up)
+startup.install(app)
+
+def transform(**arguments) -> Image.Image:
+    with img2img_model.use() as pipeline, inference_context(backend):
+        return pipeline(**arguments).images[0]
+
+output_cache = OutputCache()
+
+class I2IRequest(OutputOptions):
     image_url: str
     prompt: str
     strength: float = 0.8
     num_inference_steps: int = 30
+    seed: Optional[int] = None  # Same seed, source image and parameters give the same image; seeded results are cached
 
 @app.get("/health")
 async def health():
     return {
-        "status": "healthy" if img2img_pipeline else "unhealthy",
+        "status": "unhealthy" if img2img_model.state == "failed" else "healthy",
         "model": MODEL_NAME,
         "device": "cuda" if torch.cuda.is_available() else "cpu",
         "mode": "img2img",
+        "backend": backend.describe() if backend else None,
+        "lifecycle": img2img_model.stats(),
+        "startup": startup.stats(),
+        "inference": inference.stats(),
+        "output_cache": output_cache.stats(),
+        "source_cache": source_cache.stats(),
     }
 
 @app.post("/img2img")
 async def img2img(request: I2IRequest):
-    if not img2img_pipeline:
-        raise HTTPException(status_code=503, detail="img2img model not loaded")
+    validate_output_options(request)
     
     try:
-        # Download source image
-        async with httpx.AsyncClient() as client:
-            image_response = await client.get(request.image_url)
-            image_response.raise_for_status()
-            
-            # Load image
-            source_image = Image.open(BytesIO(image_response.content)).convert("RGB")
-            source_image = source_image.resize((1024, 1024))  # SDXL standard size
+        # Fetch (or revalidate a cached) source, fitted to the nearest SDXL aspect bucket
+        source = await fetch_image(request.image_url)
+        width, height = source.image.size
         
-        logger.info(f"Transforming image with prompt: {request.prompt[:50]}...")
         start_time = time.time()
+        seed = request.seed if request.seed is not None else secrets.randbits(32)
+        key = None
+        if request.seed is not None:
+            # Keyed by source content, not URL, so a changed image at the same URL is a miss
+            key = cache_key(
+                mode="img2img",
+                model=MODEL_NAME,
+                prompt=request.prompt,
+                seed=seed,
+                strength=request.strength,
+                steps=request.num_inference_steps,
+                size=(width, height),
+                source_sha256=source.sha256,
+            )
+            cached = await asyncio.to_thread(output_cache.get, key)
+            if cached is not None:
+                logger.info(f"Output cache hit for seed {seed}: {request.prompt[:50]}...")
+                encoded = await reencode_png_async(cached, request)
+                return image_response(encoded, request, {
+                    "generation_time": time.time() - start_time,
+                    "seed": seed,
+                    "size": f"{width}x{height}",
+                    "cached": True,
+                })
+        
+        img2img_model.check()  # Only after a cache miss, so a cached image is still served while the model loads
+        logger.info(f"Transforming {width}x{height} image with prompt: {request.prompt[:50]}...")
         
-        # Generate transformed image
-        result_image = img2img_pipeline(
+        # Generate transformed image on the inference worker
+        result_image = await inference.run(
+            transform,
             prompt=request.prompt,
-            image=source_image,
+            image=source.image,
             strength=request.strength,
             num_inference_steps=request.num_inference_steps,
-        ).images[0]
+            generator=torch.Generator(device="cpu").manual_seed(seed),
+        )
         
         generation_time = time.time() - start_time
         logger.info(f"Image transformed in {generation_time:.2f}s")
         
-        # Convert to base64
-        buffer = BytesIO()
-        result_image.save(buffer, format="PNG")
-        image_bytes = buffer.getvalue()
-        image_base64 = base64.b64encode(image_bytes).decode()
-        image_url = f"data:image/png;base64,{image_base64}"
+        # Encode off the event loop, with a lossless copy for the cache when seeded
+        encoded = await encode_image_async(result_image, request, master_png=key is not None)
+        if key is not None:
+            await asyncio.to_thread(output_cache.put, key, encoded.master_png)
         
-        return {
-            "image_url": image_url,
+        return image_response(encoded, request, {
             "generation_time": generation_time,
-        }
+            "seed": seed,
+            "size": f"{width}x{height}",
+            "cached": False,
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image transformation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,31 +4,58 @@ Image to Text Service using BLIP-2 and OCR
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from transformers import BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
 import pytesseract
 import httpx
 import os
-import time
+import sys
+import uuid
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # services/, for shared/ outside Docker
+from shared.inference import InferenceExecutor
+from shared.lifecycle import ManagedModel
+from shared.startup import ModelStartup
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Image to Text Service")
 
-# Initialize models
-blip_processor = None
-blip_model = None
+# BLIP is loaded on demand and evicted when idle; OCR needs no model
 BLIP_MODEL = os.getenv("BLIP_MODEL", "Salesforce/blip-2-opt-2.7b")
 
-try:
+def load_blip():
     logger.info(f"Loading BLIP model: {BLIP_MODEL}")
-    blip_processor = BlipProcessor.from_pretrained(BLIP_MODEL)
-    blip_model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
-    logger.info("✅ BLIP model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load BLIP model: {e}")
+    with blip.step("import"):
+        from transformers import BlipProcessor, BlipForConditionalGeneration
+    with blip.step("processor"):
+        processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    with blip.step("model"):
+        # safetensors weights are memory-mapped, so a reload after eviction reads from the page cache
+        model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL, low_cpu_mem_usage=True)
+    return processor, model
+
+def warm_up(loaded) -> None:
+    processor, model = loaded
+    inputs = processor(Image.new("RGB", (64, 64)), return_tensors="pt")
+    model.generate(**inputs, max_length=5)
+
+blip = ManagedModel("blip", load_blip)
+
+# Captioning and OCR have separate workers, so an OCR request never waits behind BLIP
+caption_inference = InferenceExecutor("blip")
+ocr_inference = InferenceExecutor("ocr")
+
+# Loads in the background once the server is listening; /health/ready turns 200 after the warm-up
+startup = ModelStartup(blip, caption_inference, warm_up)
+startup.install(app)
+
+def caption_image(image: Image.Image) -> str:
+    with blip.use() as (blip_processor, blip_model):
+        inputs = blip_processor(image, return_tensors="pt")
+        out = blip_model.generate(**inputs, max_length=50)
+        return blip_processor.decode(out[0], skip_special_tokens=True)
 
 class ITTRequest(BaseModel):
     image_url: str
@@ -37,9 +64,15 @@ class ITTRequest(BaseModel):
 @app.get("/health")
 async def health():
     return {
-        "status": "healthy" if blip_model else "unhealthy",
+        "status": "unhealthy" if blip.state == "failed" else "healthy",
         "blip_model": BLIP_MODEL,
+        "lifecycle": blip.stats(),
+        "startup": startup.stats(),
         "ocr_available": True,
+        "inference": {
+            "caption": caption_inference.stats(),
+            "ocr": ocr_inference.stats(),
+        },
     }
 
 @app.post("/analyze")
@@ -51,7 +84,7 @@ async def analyze(request: ITTRequest):
             image_response.raise_for_status()
             
             # Save temporarily
-            image_path = f"/tmp/image_{int(time.time())}.jpg"
+            image_path = f"/tmp/image_{uuid.uuid4().hex}.jpg"
             with open(image_path, "wb") as f:
                 f.write(image_response.content)
             
@@ -61,23 +94,20 @@ async def analyze(request: ITTRequest):
             
             # Generate caption if requested
             if request.task in ["caption", "both"]:
-                if not blip_model:
-                    raise HTTPException(status_code=503, detail="BLIP model not loaded")
-                
-                inputs = blip_processor(image, return_tensors="pt")
-                out = blip_model.generate(**inputs, max_length=50)
-                caption = blip_processor.decode(out[0], skip_special_tokens=True)
-                result["caption"] = caption
+                blip.check()
+                result["caption"] = await caption_inference.run(caption_image, image)
             
             # Extract OCR text if requested
             if request.task in ["ocr", "both"]:
-                ocr_text = pytesseract.image_to_string(image)
+                ocr_text = await ocr_inference.run(pytesseract.image_to_string, image)
                 result["ocr_text"] = ocr_text.strip()
             
             # Clean up
             os.remove(image_path)
             
             return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,3 @@
+"""
+Helpers shared by the Python model servers
+"""
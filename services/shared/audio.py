@@ -0,0 +1,69 @@
+"""
+In-memory audio decoding for the speech servers
+Audio bytes become 16 kHz mono float32 samples without touching disk: 16-bit PCM
+WAV is parsed in-process, and everything else is piped through ffmpeg. Only
+containers that need a seekable input (e.g. MP4/M4A with the index at the end)
+fall back to a uniquely named temporary file.
+"""
+
+import io
+import os
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+from fastapi import HTTPException
+
+SAMPLE_RATE = 16000
+AUDIO_MAX_BYTES = int(float(os.getenv("AUDIO_MAX_MB", "100")) * 1024 * 1024)
+# Content types accepted for downloaded audio; application/octet-stream is always accepted
+AUDIO_CONTENT_TYPES = ("audio/", "video/", "application/ogg")
+
+def _decode_wav(data: bytes):
+    """Samples for 16-bit PCM WAV at the target rate, or None when ffmpeg is needed"""
+    if not (data[:4] == b"RIFF" and data[8:12] == b"WAVE"):
+        return None
+    try:
+        with wave.open(io.BytesIO(data)) as f:
+            if f.getsampwidth() != 2 or f.getframerate() != SAMPLE_RATE:
+                return None
+            channels = f.getnchannels()
+            frames = f.readframes(f.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+def _ffmpeg(source: str, data: bytes = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error", "-i", source,
+         "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+        input=data,
+        capture_output=True,
+    )
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Any audio ffmpeg understands -> 16 kHz mono float32. Blocking; call from a worker thread"""
+    if not data:
+        raise HTTPException(status_code=400, detail="Audio is empty")
+    samples = _decode_wav(data)
+    if samples is not None:
+        return samples
+
+    completed = _ffmpeg("pipe:0", data)
+    if completed.returncode != 0 or not completed.stdout:
+        # Some containers cannot be demuxed from a pipe; give ffmpeg a seekable file instead
+        with tempfile.NamedTemporaryFile(suffix=".audio") as f:
+            f.write(data)
+            f.flush()
+            completed = _ffmpeg(f.name)
+    if completed.returncode != 0 or not completed.stdout:
+        error = completed.stderr.decode(errors="replace").strip().splitlines()[-1:] or ["no audio stream"]
+        raise HTTPException(status_code=400, detail=f"Could not decode audio: {error[0]}")
+    return np.frombuffer(completed.stdout, dtype=np.float32).copy()  # Writable, for torch.from_numpy
+
+def duration(samples: np.ndarray) -> float:
+    return len(samples) / SAMPLE_RATE
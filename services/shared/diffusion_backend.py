@@ -0,0 +1,144 @@
+"""
+Inference backends for the SDXL servers
+"torch" is the diffusers pipeline, optionally with bf16 autocast (on CPUs with
+native bf16), channels-last memory format and torch.compile. "openvino" and
+"onnx" run an exported UNet/VAE/text encoders through optimum; exports are
+written once and reused on later starts.
+"""
+
+import contextlib
+import logging
+import os
+from typing import NamedTuple, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+DIFFUSION_BACKEND = os.getenv("DIFFUSION_BACKEND", "torch")  # torch, openvino or onnx
+CPU_BF16 = os.getenv("CPU_BF16", "auto").lower()  # auto (when the CPU has native bf16), true or false
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() == "true"
+CHANNELS_LAST = os.getenv("CHANNELS_LAST", "true").lower() == "true"
+EXPORT_DIR = os.getenv("DIFFUSION_EXPORT_DIR", "/models/exported")
+
+BACKENDS = ("torch", "openvino", "onnx")
+
+# optimum auto-classes per task, for the exported backends
+OPTIMUM_CLASSES = {
+    "openvino": ("optimum.intel", {
+        "txt2img": "OVPipelineForText2Image",
+        "img2img": "OVPipelineForImage2Image",
+        "inpaint": "OVPipelineForInpainting",
+    }),
+    "onnx": ("optimum.onnxruntime", {
+        "txt2img": "ORTPipelineForText2Image",
+        "img2img": "ORTPipelineForImage2Image",
+        "inpaint": "ORTPipelineForInpainting",
+    }),
+}
+
+class Backend(NamedTuple):
+    name: str
+    device: str
+    dtype: torch.dtype
+    bf16_autocast: bool
+    channels_last: bool
+    compiled: bool
+
+    @property
+    def is_torch(self) -> bool:
+        """Torch modules in the pipeline: LoRA adapters, latent previews and embedding reuse are available"""
+        return self.name == "torch"
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "device": self.device,
+            "dtype": str(self.dtype).replace("torch.", ""),
+            "bf16_autocast": self.bf16_autocast,
+            "channels_last": self.channels_last,
+            "torch_compile": self.compiled,
+        }
+
+def cpu_has_bf16() -> bool:
+    """AVX512-BF16 or AMX; without either, bf16 matmuls are emulated and slower than fp32"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def _use_bf16(device: str) -> bool:
+    if device != "cpu" or CPU_BF16 == "false":
+        return False
+    if CPU_BF16 == "true":
+        return True
+    return cpu_has_bf16()
+
+def _export_path(model_name: str, backend: str, task: str) -> str:
+    return os.path.join(EXPORT_DIR, backend, task, model_name.replace("/", "--"))
+
+def _load_optimum(model_name: str, backend: str, task: str):
+    module_name, classes = OPTIMUM_CLASSES[backend]
+    module = __import__(module_name, fromlist=[classes[task]])
+    pipeline_class = getattr(module, classes[task])
+    path = _export_path(model_name, backend, task)
+    if os.path.isdir(path):
+        logger.info(f"Loading {backend} export from {path}")
+        return pipeline_class.from_pretrained(path)
+    logger.info(f"Exporting {model_name} to {backend} (first start only)")
+    pipeline = pipeline_class.from_pretrained(model_name, export=True)
+    try:
+        pipeline.save_pretrained(path)
+    except Exception as e:
+        logger.warning(f"Could not save {backend} export to {path}, it will be redone next start: {e}")
+    return pipeline
+
+def load_pipeline(pipeline_class, model_name: str, task: str = "txt2img", backend: str = DIFFUSION_BACKEND):
+    """(pipeline, Backend); pipeline_class is the diffusers class used by the torch backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"DIFFUSION_BACKEND must be one of {', '.join(BACKENDS)}")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    if backend != "torch":
+        pipeline = _load_optimum(model_name, backend, task)
+        return pipeline, Backend(backend, "cpu", torch.float32, False, False, False)
+
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    pipeline = pipeline_class.from_pretrained(model_name, torch_dtype=dtype, use_safetensors=True)
+    pipeline = pipeline.to(device)
+    channels_last = False
+    compiled = False
+    if device == "cpu":
+        # Enable CPU optimizations
+        pipeline.enable_attention_slicing()
+        if CHANNELS_LAST:
+            pipeline.unet.to(memory_format=torch.channels_last)
+            pipeline.vae.to(memory_format=torch.channels_last)
+            channels_last = True
+    if TORCH_COMPILE:
+        # The first call per shape compiles (minutes on CPU), so warm up before taking traffic
+        pipeline.unet = torch.compile(pipeline.unet)
+        compiled = True
+    return pipeline, Backend("torch", device, dtype, _use_bf16(device), channels_last, compiled)
+
+def derive_pipeline(pipeline, pipeline_class, backend: Backend, task: str):
+    """A pipeline for another task over the same loaded components, or None if the backend cannot share them"""
+    if backend.is_torch:
+        return pipeline_class.from_pipe(pipeline)
+    module_name, classes = OPTIMUM_CLASSES[backend.name]
+    module = __import__(module_name, fromlist=[classes[task]])
+    try:
+        return getattr(module, classes[task]).from_pipe(pipeline)
+    except Exception as e:
+        logger.warning(f"{task} is not available on the {backend.name} backend: {e}")
+        return None
+
+def inference_context(backend: Optional[Backend]):
+    """Wraps a pipeline call: no autograd, plus bf16 autocast when enabled"""
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if backend is not None and backend.bf16_autocast:
+        stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+    return stack
@@ -0,0 +1,84 @@
+"""
+Bounded downloads and uploads for the model servers
+One pooled httpx client per process with connect/read timeouts and an overall
+deadline. Bodies are streamed and abandoned as soon as they pass the size cap,
+and the content type is checked before any of the body is read. Uploaded
+request bodies get the same cap.
+"""
+
+import asyncio
+import os
+from typing import Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, Request
+
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "15"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+def client() -> httpx.AsyncClient:
+    """One pooled client per process, so repeated hosts reuse connections and TLS sessions"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(FETCH_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            follow_redirects=True,
+        )
+    return _client
+
+def validate_url(url: str, label: str) -> None:
+    if not url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail=f"{label} URL must be http or https")
+
+def check_length(length: Optional[str], max_bytes: int, label: str) -> None:
+    """Rejects a declared Content-Length over the cap before anything is read"""
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{label} is larger than {max_bytes} bytes")
+
+async def _download(url: str, headers: dict, max_bytes: int, content_types: tuple, label: str):
+    async with client().stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return response, b""
+        if response.is_error:
+            raise HTTPException(status_code=400, detail=f"{label} request failed with HTTP {response.status_code}")
+        content_type = response.headers.get("content-type", "")
+        if content_type and not content_type.startswith(content_types + ("application/octet-stream",)):
+            raise HTTPException(status_code=415, detail=f"{label} has content type {content_type}")
+        check_length(response.headers.get("content-length"), max_bytes, label)
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"{label} is larger than {max_bytes} bytes")
+            chunks.append(chunk)
+        return response, b"".join(chunks)
+
+async def download(url: str, max_bytes: int, content_types: tuple, label: str,
+                   headers: Optional[dict] = None) -> Tuple[httpx.Response, bytes]:
+    """(response, body); body is empty for a 304 answer to conditional headers"""
+    validate_url(url, label)
+    try:
+        return await asyncio.wait_for(
+            _download(url, headers or {}, max_bytes, content_types, label),
+            # Overall deadline: the client timeout is per read, so a slow drip could otherwise run on
+            timeout=FETCH_TIMEOUT_SECONDS * 2,
+        )
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail=f"Timed out fetching {label.lower()}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=f"Could not fetch {label.lower()}: {e}")
+
+async def read_body(request: Request, max_bytes: int, label: str) -> bytes:
+    """A request body streamed with the same cap, for clients that upload instead of passing a URL"""
+    check_length(request.headers.get("content-length"), max_bytes, label)
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{label} is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
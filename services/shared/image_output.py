@@ -0,0 +1,129 @@
+"""
+Output encoding for the image servers
+Generated images are encoded as PNG, WebP or JPEG (with an optional thumbnail
+from the same pass) in a worker thread, then returned either as JSON with data
+URLs or as raw bytes with the metadata in headers.
+"""
+
+import asyncio
+import base64
+import time
+from io import BytesIO
+from typing import NamedTuple, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from PIL import Image
+from pydantic import BaseModel
+
+# Request value -> (Pillow format, media type)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+RESPONSE_FORMATS = ("json", "binary")
+MASTER_PNG_COMPRESS_LEVEL = 1  # Cache copies favour encode speed over size
+
+class OutputOptions(BaseModel):
+    output_format: str = "png"  # png, webp or jpeg
+    output_quality: int = 90  # 1-100; WebP and JPEG only
+    thumbnail_size: Optional[int] = None  # Longest edge in pixels; adds thumbnail_url to JSON responses
+    response_format: str = "json"  # json (data URLs) or binary (raw image bytes, metadata in X- headers)
+
+class EncodedImage(NamedTuple):
+    data: bytes
+    media_type: str
+    thumbnail: Optional[bytes]
+    encode_seconds: float
+    master_png: Optional[bytes]  # Lossless copy for the output cache, when asked for
+
+def validate_output_options(options: OutputOptions) -> None:
+    if options.output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+    if options.response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"response_format must be one of {', '.join(RESPONSE_FORMATS)}")
+    if not 1 <= options.output_quality <= 100:
+        raise HTTPException(status_code=400, detail="output_quality must be between 1 and 100")
+    if options.thumbnail_size is not None and options.thumbnail_size < 16:
+        raise HTTPException(status_code=400, detail="thumbnail_size must be at least 16")
+
+def _save(image: Image.Image, options: OutputOptions) -> bytes:
+    pil_format, _ = OUTPUT_FORMATS[options.output_format]
+    buffer = BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format="PNG")
+    else:
+        image.save(buffer, format=pil_format, quality=options.output_quality)
+    return buffer.getvalue()
+
+def encode_image(image: Image.Image, options: OutputOptions, master_png: bool = False) -> EncodedImage:
+    """Blocking; call through encode_image_async from handlers"""
+    start = time.perf_counter()
+    data = _save(image, options)
+    thumbnail = None
+    if options.thumbnail_size and options.response_format == "json":
+        small = image.copy()
+        small.thumbnail((options.thumbnail_size, options.thumbnail_size))
+        thumbnail = _save(small, options)
+    master = None
+    if master_png:
+        if options.output_format == "png":
+            master = data
+        else:
+            buffer = BytesIO()
+            image.save(buffer, format="PNG", compress_level=MASTER_PNG_COMPRESS_LEVEL)
+            master = buffer.getvalue()
+    return EncodedImage(
+        data=data,
+        media_type=OUTPUT_FORMATS[options.output_format][1],
+        thumbnail=thumbnail,
+        encode_seconds=time.perf_counter() - start,
+        master_png=master,
+    )
+
+def reencode_png(png: bytes, options: OutputOptions) -> EncodedImage:
+    """Encode a cached PNG for a request; passed through untouched when PNG without thumbnail is asked for"""
+    if options.output_format == "png" and not (options.thumbnail_size and options.response_format == "json"):
+        return EncodedImage(data=png, media_type="image/png", thumbnail=None, encode_seconds=0.0, master_png=png)
+    start = time.perf_counter()
+    with Image.open(BytesIO(png)) as image:
+        encoded = encode_image(image.convert("RGB"), options)
+    return encoded._replace(encode_seconds=time.perf_counter() - start)
+
+async def encode_image_async(image: Image.Image, options: OutputOptions, master_png: bool = False) -> EncodedImage:
+    return await asyncio.to_thread(encode_image, image, options, master_png)
+
+async def reencode_png_async(png: bytes, options: OutputOptions) -> EncodedImage:
+    return await asyncio.to_thread(reencode_png, png, options)
+
+def data_url(data: bytes, media_type: str) -> str:
+    return f"data:{media_type};base64,{base64.b64encode(data).decode()}"
+
+def _header_name(field: str) -> str:
+    return "X-" + "-".join(part.capitalize() for part in field.split("_"))
+
+def image_response(encoded: EncodedImage, options: OutputOptions, fields: dict) -> Union[dict, Response]:
+    """JSON body with data URLs, or the raw image with scalar fields as X- headers"""
+    if options.response_format == "binary":
+        headers = {
+            "X-Payload-Bytes": str(len(encoded.data)),
+            "X-Encode-Time": f"{encoded.encode_seconds:.4f}",
+        }
+        for field, value in fields.items():
+            header_safe = isinstance(value, str) and value.isascii() and value.isprintable() and len(value) < 256
+            if isinstance(value, (bool, int, float)) or header_safe:
+                headers[_header_name(field)] = str(value)
+        return Response(content=encoded.data, media_type=encoded.media_type, headers=headers)
+
+    body = {
+        "image_url": data_url(encoded.data, encoded.media_type),
+        "format": options.output_format,
+        "bytes": len(encoded.data),
+        "encode_time": encoded.encode_seconds,
+        **fields,
+    }
+    if encoded.thumbnail is not None:
+        body["thumbnail_url"] = data_url(encoded.thumbnail, encoded.media_type)
+        body["thumbnail_bytes"] = len(encoded.thumbnail)
+    return body
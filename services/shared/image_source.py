@@ -0,0 +1,155 @@
+"""
+Source images for the img2img and inpainting endpoints
+Downloads go through shared.fetch (pooled client, timeouts, size cap), and
+decoding runs in a worker thread. Decoded, resized images are cached by URL and
+revalidated with ETag/Last-Modified, so a repeated source costs one 304 round
+trip instead of a download and decode. Images are fitted to the nearest SDXL
+aspect bucket instead of being squashed to a square.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import NamedTuple, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+from shared.fetch import download
+
+SOURCE_MAX_BYTES = int(float(os.getenv("SOURCE_MAX_MB", "20")) * 1024 * 1024)
+SOURCE_MAX_PIXELS = int(float(os.getenv("SOURCE_MAX_MEGAPIXELS", "40")) * 1_000_000)
+SOURCE_CACHE_MB = float(os.getenv("SOURCE_CACHE_MB", "256"))
+
+# (width, height) buckets SDXL was trained on, all close to one megapixel
+SDXL_BUCKETS = (
+    (1024, 1024),
+    (1152, 896), (896, 1152),
+    (1216, 832), (832, 1216),
+    (1344, 768), (768, 1344),
+    (1536, 640), (640, 1536),
+)
+
+class SourceImage(NamedTuple):
+    image: Image.Image
+    sha256: str  # Of the downloaded bytes; output cache keys use it so a changed source is a miss
+    cached: bool
+
+def aspect_bucket(width: int, height: int) -> Tuple[int, int]:
+    """The SDXL bucket closest to the image's aspect ratio (compared on a log scale, so 2:1 and 1:2 are symmetric)"""
+    ratio = math.log(width / height)
+    return min(SDXL_BUCKETS, key=lambda bucket: abs(math.log(bucket[0] / bucket[1]) - ratio))
+
+def decode(data: bytes, mode: str, size: Optional[Tuple[int, int]]) -> Image.Image:
+    """Bytes -> image of the given mode, scaled to cover size (or its own bucket) and center-cropped"""
+    try:
+        image = Image.open(BytesIO(data))
+        width, height = image.size
+        if width * height > SOURCE_MAX_PIXELS:
+            raise HTTPException(status_code=400, detail=f"Source image is {width}x{height}, above the pixel limit")
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, which is much cheaper for large photos.
+        # Square bound, since EXIF rotation is only applied afterwards
+        edge = max(size or aspect_bucket(width, height))
+        image.draft(mode, (edge, edge))
+        image = ImageOps.exif_transpose(image).convert(mode)
+        return ImageOps.fit(image, size or aspect_bucket(*image.size), method=Image.LANCZOS)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Source is not a readable image: {e}")
+
+class _Entry(NamedTuple):
+    validators: dict  # Conditional request headers (If-None-Match / If-Modified-Since)
+    image: Image.Image
+    sha256: str
+    bytes: int
+
+class SourceImageCache:
+    """LRU of decoded images keyed by (url, mode, size), bounded by pixel bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[_Entry]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: _Entry) -> None:
+        if not entry.validators or entry.bytes > self.max_bytes:
+            return  # Nothing to revalidate against, so it could never be served safely
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.bytes
+            self.entries[key] = entry
+            self.bytes += entry.bytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.bytes
+
+    def record(self, hit: bool) -> None:
+        """Count a lookup once revalidation has decided it: a 304 is a hit, anything else a miss"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, entries, size = self.hits, self.misses, len(self.entries), self.bytes
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+source_cache = SourceImageCache(int(SOURCE_CACHE_MB * 1024 * 1024))
+
+def _validators(response: httpx.Response) -> dict:
+    validators = {}
+    if "etag" in response.headers:
+        validators["If-None-Match"] = response.headers["etag"]
+    if "last-modified" in response.headers:
+        validators["If-Modified-Since"] = response.headers["last-modified"]
+    return validators
+
+async def fetch_image(url: str, mode: str = "RGB", size: Optional[Tuple[int, int]] = None) -> SourceImage:
+    """Download (or revalidate) and decode a source image; size None picks the image's own aspect bucket"""
+    key = (url, mode, size)
+    entry = source_cache.get(key)
+    response, data = await download(
+        url, SOURCE_MAX_BYTES, ("image/",), "Source image", headers=entry.validators if entry else None,
+    )
+
+    hit = response.status_code == 304 and entry is not None
+    source_cache.record(hit)
+    if hit:
+        return SourceImage(entry.image, entry.sha256, cached=True)
+
+    image = await asyncio.to_thread(decode, data, mode, size)
+    sha256 = hashlib.sha256(data).hexdigest()
+    source_cache.put(key, _Entry(
+        validators=_validators(response),
+        image=image,
+        sha256=sha256,
+        bytes=image.width * image.height * len(image.getbands()),
+    ))
+    return SourceImage(image, sha256, cached=False)
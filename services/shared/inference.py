@@ -0,0 +1,162 @@
+"""
+Bounded inference executor shared by the model servers
+Blocking model calls run on a dedicated worker thread per model, behind a
+bounded queue, so the event loop (and /health) stays responsive while a
+model is busy. Full queues are rejected immediately with 503, and work whose
+deadline passed while it was queued is dropped before it starts.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "300"))
+
+class QueueFullError(HTTPException):
+    def __init__(self, name: str, retry_after: int = 5):
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is busy, try again shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+class DeadlineExceededError(HTTPException):
+    def __init__(self, name: str, timeout: float):
+        super().__init__(status_code=504, detail=f"{name} did not finish within {timeout:.0f}s")
+
+class WaitTimes:
+    """Rolling window of queue wait times, in seconds"""
+
+    def __init__(self, window: int = 256):
+        self.samples = collections.deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"avg": None, "p95": None, "max": None}
+        ordered = sorted(self.samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 4),
+            "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+            "max": round(ordered[-1], 4),
+        }
+
+class _Job:
+    __slots__ = ("function", "args", "kwargs", "future", "loop", "enqueued_at", "deadline", "abandoned")
+
+    def __init__(self, function, args, kwargs, future, loop, deadline):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.loop = loop
+        self.enqueued_at = time.monotonic()
+        self.deadline = deadline
+        self.abandoned = False
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+class InferenceExecutor:
+    """One worker thread running blocking calls for a single model, fed by a bounded queue"""
+
+    def __init__(self, name: str, max_queue: int = INFERENCE_QUEUE_SIZE,
+                 timeout: Optional[float] = INFERENCE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._depth = 0
+        self._depth_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_times = WaitTimes()
+        self._thread = threading.Thread(target=self._work, name=f"inference-{name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    async def run(self, function: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run function(*args, **kwargs) on the worker; raises QueueFullError or DeadlineExceededError"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._depth_lock:
+            if self._depth >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(self.name)
+            self._depth += 1
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout if timeout else None
+        job = _Job(function, args, kwargs, loop.create_future(), loop, deadline)
+        self._queue.put(job)
+        try:
+            # shield: a timeout marks the job abandoned instead of cancelling the future under the worker
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout or None)
+        except asyncio.TimeoutError:
+            job.abandoned = True
+            raise DeadlineExceededError(self.name, timeout)
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect); a job still in the queue is dropped unrun
+            job.abandoned = True
+            job.future.cancel()  # Nobody awaits it any more, so the worker's result is discarded quietly
+            raise
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._depth_lock:
+                self._depth -= 1
+            started = time.monotonic()
+            if job.abandoned or (job.deadline is not None and started > job.deadline):
+                self.expired += 1
+                logger.warning(f"{self.name}: dropped request that expired or was cancelled after {started - job.enqueued_at:.1f}s in queue")
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, DeadlineExceededError(self.name, self.timeout or 0))
+                continue
+
+            self.wait_times.add(started - job.enqueued_at)
+            self.in_flight = 1
+            try:
+                result = job.function(*job.args, **job.kwargs)
+            except BaseException as e:
+                self.failed += 1
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, e)
+            else:
+                self.completed += 1
+                job.loop.call_soon_threadsafe(_resolve, job.future, result)
+            finally:
+                self.in_flight = 0
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._depth,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "timeout_seconds": self.timeout,
+            "wait_seconds": self.wait_times.summary(),
+        }
@@ -0,0 +1,190 @@
+"""
+Model lifecycle for the model servers
+A ManagedModel loads on first use, unloads after a configurable idle period and
+loads again on the next request, so several models can share one node's memory.
+Weights are read with safetensors/mmap wherever the loaders support it, and an
+evicted model's files usually stay in the page cache, so reloads are much faster
+than the first load.
+"""
+
+import contextlib
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+MODEL_IDLE_SECONDS = float(os.getenv("MODEL_IDLE_SECONDS", "0"))  # 0 keeps models loaded forever
+MODEL_IDLE_CHECK_SECONDS = float(os.getenv("MODEL_IDLE_CHECK_SECONDS", "30"))
+MODEL_RETRY_SECONDS = float(os.getenv("MODEL_RETRY_SECONDS", "60"))
+
+class ModelUnavailableError(HTTPException):
+    def __init__(self, name: str, error: str):
+        super().__init__(status_code=503, detail=f"{name} model not loaded: {error}")
+
+def free_accelerator_memory() -> None:
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+class ManagedModel:
+    """Loads a model on demand and evicts it once nobody has used it for idle_seconds.
+
+    load() returns the model (raising on failure); unload(model), if given, releases
+    anything load() set up outside the returned object. Use the model through
+    `with managed.use() as model:` on the thread that runs inference, so an eviction
+    never happens mid-request.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Any], unload: Optional[Callable[[Any], None]] = None,
+                 idle_seconds: float = MODEL_IDLE_SECONDS):
+        self.name = name
+        self._load = load
+        self._unload = unload
+        self.idle_seconds = idle_seconds
+        self.model = None
+        self.state = "unloaded"  # unloaded, loading, loaded or failed
+        self.error: Optional[str] = None
+        self.loads = 0
+        self.unloads = 0
+        self.load_seconds: Optional[float] = None
+        self.first_load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.phase: Optional[str] = None  # Step of the load in progress, as reported by load() through step()
+        self.phases: dict = {}  # Step name -> seconds, for the most recent load
+        self._failed_at: Optional[float] = None
+        self._active = 0
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def retry_pending(self) -> bool:
+        """True while the last load failed and no new attempt is allowed yet"""
+        return self.state == "failed" and time.monotonic() - self._failed_at < MODEL_RETRY_SECONDS
+
+    def check(self) -> None:
+        """Fail fast before the first load finishes, or while the last failed load is inside its retry window"""
+        if self.state in ("unloaded", "loading") and not self.loads:
+            raise ModelUnavailableError(self.name, "still loading")
+        if self.retry_pending():
+            raise ModelUnavailableError(self.name, self.error)
+
+    def ensure_loaded(self) -> Any:
+        """The model, loading it first if needed; raises ModelUnavailableError if loading fails"""
+        with self._lock:
+            if self.model is not None:
+                return self.model
+            if self.retry_pending():
+                raise ModelUnavailableError(self.name, self.error)
+
+            self.state = "loading"
+            self.phases = {}
+            logger.info(f"Loading {self.name} model")
+            started = time.monotonic()
+            try:
+                model = self._load()
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                self._failed_at = time.monotonic()
+                logger.error(f"❌ Failed to load {self.name} model: {e}")
+                free_accelerator_memory()
+                raise ModelUnavailableError(self.name, self.error)
+
+            self.model = model
+            self.state = "loaded"
+            self.error = None
+            self.loads += 1
+            self.load_seconds = time.monotonic() - started
+            if self.first_load_seconds is None:
+                self.first_load_seconds = self.load_seconds
+            self.loaded_at = time.time()
+            self.last_used = time.monotonic()
+            logger.info(f"✅ {self.name} model loaded in {self.load_seconds:.1f}s")
+            self._start_reaper()
+            return model
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        """Marks one step of load(), so progress and per-step timings show up in stats()"""
+        self.phase = name
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - started, 2)
+            self.phase = None
+
+    @contextlib.contextmanager
+    def use(self):
+        with self._lock:
+            self._active += 1
+        try:
+            yield self.ensure_loaded()
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.last_used = time.monotonic()
+
+    def unload(self, reason: str = "requested") -> bool:
+        with self._lock:
+            if self.model is None or self._active:
+                return False
+            model, self.model = self.model, None
+            if self._unload is not None:
+                try:
+                    self._unload(model)
+                except Exception as e:
+                    logger.warning(f"{self.name} unload hook failed: {e}")
+            del model
+            self.state = "unloaded"
+            self.unloads += 1
+            self.loaded_at = None
+        free_accelerator_memory()
+        logger.info(f"Unloaded {self.name} model ({reason})")
+        return True
+
+    def idle_for(self) -> Optional[float]:
+        return None if self.last_used is None else time.monotonic() - self.last_used
+
+    def _start_reaper(self) -> None:
+        if self.idle_seconds <= 0 or (self._reaper and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(target=self._reap, name=f"evict-{self.name}", daemon=True)
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(min(MODEL_IDLE_CHECK_SECONDS, self.idle_seconds))
+            idle = self.idle_for()
+            if self.model is not None and not self._active and idle is not None and idle >= self.idle_seconds:
+                self.unload(f"idle for {idle:.0f}s")
+
+    def stats(self) -> dict:
+        idle = self.idle_for()
+        return {
+            "state": self.state,
+            "error": self.error,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            "first_load_seconds": round(self.first_load_seconds, 2) if self.first_load_seconds is not None else None,
+            "phase": self.phase,
+            "phases": self.phases,
+            "idle_seconds": round(idle, 1) if idle is not None else None,
+            "evict_after_seconds": self.idle_seconds or None,
+            "active": self._active,
+        }
@@ -0,0 +1,127 @@
+"""
+Content-addressed on-disk cache for generated outputs
+Files are named by a hash of every parameter that determines the output, so a
+repeated seeded request is a file read. Total size is bounded; the least
+recently used files are evicted first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_CACHE_DIR = os.getenv("OUTPUT_CACHE_DIR", "/tmp/payaid-output-cache")
+OUTPUT_CACHE_MB = float(os.getenv("OUTPUT_CACHE_MB", "1024"))
+
+def cache_key(**fields) -> str:
+    """Stable hash of the fields that determine an output"""
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class OutputCache:
+    """Directory of <key[:2]>/<key><suffix> files with an in-memory LRU index of their sizes"""
+
+    def __init__(self, directory: str = OUTPUT_CACHE_DIR, max_bytes: int = int(OUTPUT_CACHE_MB * 1024 * 1024),
+                 suffix: str = ".png"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.index = OrderedDict()  # key -> size, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _load_index(self) -> None:
+        """Rebuild the index from the files left by previous runs, oldest access first"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                found.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self.index[key] = size
+            self.bytes += size
+        self._evict()
+        if found:
+            logger.info(f"Output cache: {len(self.index)} files, {self.bytes / 1024 / 1024:.1f} MB in {self.directory}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key not in self.index:
+                self.misses += 1
+                return None
+            self.index.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mtime doubles as last use, so the LRU order survives restarts
+        except OSError:
+            with self._lock:
+                self.bytes -= self.index.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.{time.monotonic_ns()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)  # Readers never see a partial file
+        except OSError as e:
+            logger.warning(f"Output cache write failed: {e}")
+            return
+        with self._lock:
+            self.bytes -= self.index.pop(key, 0)
+            self.index[key] = len(data)
+            self.bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self.index:
+            key, size = self.index.popitem(last=False)
+            self.bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.index),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,175 @@
+"""
+Speech recognition backends for the speech-to-text server
+"faster-whisper" runs Whisper on CTranslate2 with int8 weights on CPU (float16 on
+CUDA). "whisper" is the reference openai-whisper model in float32. Both return
+openai-whisper's result shape: text, language and segments with start, end,
+text, avg_logprob, compression_ratio and no_speech_prob.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "faster-whisper")  # faster-whisper or whisper
+# auto = int8 on CPU, float16 on CUDA; also int8_float32, int8_float16, float32 (faster-whisper only)
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 = one per physical core
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))  # 1 = greedy, like openai-whisper's transcribe()
+WHISPER_DOWNLOAD_ROOT = os.getenv("WHISPER_DOWNLOAD_ROOT") or None
+# Chunks of one long recording transcribed at once (faster-whisper only); 0 = one per 4 CPUs, 1 on CUDA
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "0"))
+
+SAMPLE_RATE = 16000
+
+BACKENDS = ("faster-whisper", "whisper")
+
+SEGMENT_FIELDS = (
+    "id", "seek", "start", "end", "text", "tokens", "temperature",
+    "avg_logprob", "compression_ratio", "no_speech_prob",
+)
+
+class SpeechBackend(NamedTuple):
+    name: str
+    model_size: str
+    device: str
+    compute_type: str
+    workers: int = 1
+
+    def describe(self) -> dict:
+        return self._asdict()
+
+def model_size(model_name: str) -> str:
+    """Whisper size for a model name: openai/whisper-large-v3 -> large-v3. Sizes, local paths and
+    CTranslate2 repos (e.g. Systran/faster-distil-whisper-large-v3) pass through unchanged"""
+    prefix = "openai/whisper-"
+    return model_name[len(prefix):] if model_name.startswith(prefix) else model_name
+
+def _cuda_available(backend: str) -> bool:
+    try:
+        if backend == "faster-whisper":
+            import ctranslate2
+            return ctranslate2.get_cuda_device_count() > 0
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+class SpeechModel:
+    """A loaded Whisper model behind one transcribe() for either backend"""
+
+    def __init__(self, model, backend: SpeechBackend):
+        self.model = model
+        self.backend = backend
+
+    def transcribe(self, audio: Union[str, np.ndarray], language: Optional[str] = None,
+                   task: str = "transcribe", **options) -> dict:
+        """audio is a file path or 16 kHz mono float32 samples; options are shared decoding options
+        (initial_prompt, condition_on_previous_text, temperature, word_timestamps)"""
+        if self.backend.name == "whisper":
+            return self.model.transcribe(
+                audio,
+                language=language,
+                task=task,
+                beam_size=WHISPER_BEAM_SIZE if WHISPER_BEAM_SIZE > 1 else None,
+                fp16=self.backend.compute_type == "float16",
+                **options,
+            )
+
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            beam_size=WHISPER_BEAM_SIZE,
+            **options,
+        )
+        # segments is a generator: decoding happens while it is consumed
+        segments = [
+            {
+                **{field: getattr(segment, field) for field in SEGMENT_FIELDS},
+                **({"words": [word._asdict() for word in segment.words]} if segment.words else {}),
+            }
+            for segment in segments
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "duration": info.duration,
+            "segments": segments,
+        }
+
+    def transcribe_chunks(self, audio: np.ndarray, chunks: List[Tuple[int, int]], language: Optional[str] = None,
+                          task: str = "transcribe", **options) -> dict:
+        """A long recording as independent (start, end) sample ranges, backend.workers of them at a time.
+        Segments come back in recording order with recording-relative timestamps"""
+        def run(chunk, language):
+            start, end = chunk
+            return self.transcribe(audio[start:end], language=language, task=task, **options)
+
+        results = []
+        if language is None and chunks:
+            # Detect once, so every chunk is decoded in the same language
+            results.append(run(chunks[0], None))
+            language = results[0]["language"]
+        with ThreadPoolExecutor(self.backend.workers) as pool:
+            results += pool.map(lambda chunk: run(chunk, language), chunks[len(results):])
+
+        segments = []
+        for (start, _), result in zip(chunks, results):
+            offset = start / SAMPLE_RATE
+            for segment in result["segments"]:
+                segment = {**_shift(segment, offset), "id": len(segments)}
+                if segment.get("words"):
+                    segment["words"] = [_shift(word, offset) for word in segment["words"]]
+                segments.append(segment)
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": language,
+            **({"language_probability": results[0]["language_probability"]}
+               if results and "language_probability" in results[0] else {}),
+            "duration": len(audio) / SAMPLE_RATE,
+            "segments": segments,
+            "chunks": len(chunks),
+        }
+
+def _shift(entry: dict, offset: float) -> dict:
+    return {**entry, "start": entry["start"] + offset, "end": entry["end"] + offset}
+
+def _workers(device: str) -> int:
+    if WHISPER_WORKERS > 0:
+        return WHISPER_WORKERS
+    return 1 if device == "cuda" else max(1, (os.cpu_count() or 1) // 4)
+
+def load_speech_model(model_name: str, backend: str = WHISPER_BACKEND) -> SpeechModel:
+    if backend not in BACKENDS:
+        raise ValueError(f"WHISPER_BACKEND must be one of {', '.join(BACKENDS)}")
+    size = model_size(model_name)
+    device = "cuda" if _cuda_available(backend) else "cpu"
+
+    if backend == "whisper":
+        import whisper
+        model = whisper.load_model(size, device=device, download_root=WHISPER_DOWNLOAD_ROOT)
+        compute_type = "float16" if device == "cuda" else "float32"
+        # One at a time: openai-whisper installs its key/value cache hooks on the shared model per call
+        return SpeechModel(model, SpeechBackend(backend, size, device, compute_type, 1))
+
+    from faster_whisper import WhisperModel
+    compute_type = WHISPER_COMPUTE_TYPE
+    if compute_type == "auto":
+        compute_type = "float16" if device == "cuda" else "int8"
+    workers = _workers(device)
+    cpu_threads = WHISPER_CPU_THREADS
+    if not cpu_threads and workers > 1:
+        cpu_threads = max(1, (os.cpu_count() or 1) // workers)  # Split the cores instead of oversubscribing them
+    # CTranslate2 workers share one copy of the weights, unlike a process per worker
+    model = WhisperModel(
+        size,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=workers,
+        download_root=WHISPER_DOWNLOAD_ROOT,
+    )
+    return SpeechModel(model, SpeechBackend(backend, size, device, compute_type, workers))
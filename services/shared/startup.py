@@ -0,0 +1,114 @@
+"""
+Startup for the model servers
+The server binds and answers /health/live straight away. The model loads in the
+background, then one warm-up inference runs on the model's own worker before
+/health/ready returns 200. Every phase is timed, from process start to ready.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+
+from shared.inference import InferenceExecutor
+from shared.lifecycle import MODEL_RETRY_SECONDS, ManagedModel
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux), so interpreter and import time count towards startup"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 2)
+
+class ModelStartup:
+    """Loads a ManagedModel once the server is listening, warms it up and reports liveness and readiness.
+
+    warmup(model) is one small inference. It runs through the model's executor, so it
+    never overlaps a request; a failed warm-up is logged and the server still becomes ready.
+    """
+
+    def __init__(self, model: ManagedModel, executor: InferenceExecutor,
+                 warmup: Optional[Callable[[Any], Any]] = None):
+        self.model = model
+        self.executor = executor
+        self.warmup = warmup if MODEL_WARMUP else None
+        self.state = "starting"  # starting, loading, warming_up, ready or failed
+        self.phases = {}  # boot (process start to listening), load, warmup -> seconds
+        self.ready_after: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def install(self, app: FastAPI) -> None:
+        app.router.add_event_handler("startup", self._start)
+        app.add_api_route("/health/live", self.live, methods=["GET"])
+        app.add_api_route("/health/ready", self.ready, methods=["GET"])
+
+    @property
+    def is_ready(self) -> bool:
+        # An evicted model still counts as ready: the next request reloads it
+        return self.state == "ready" and not self.model.retry_pending()
+
+    async def _start(self) -> None:
+        self.phases["boot"] = process_age()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            self.state = "loading"
+            try:
+                await asyncio.to_thread(self.model.ensure_loaded)
+                break
+            except HTTPException:
+                # Logged by the lifecycle; keep retrying so the server can still become ready
+                self.state = "failed"
+                await asyncio.sleep(MODEL_RETRY_SECONDS)
+        self.phases["load"] = round(self.model.load_seconds, 2)
+
+        if self.warmup is not None:
+            self.state = "warming_up"
+            started = time.monotonic()
+            try:
+                await self.executor.run(self._warm_up, timeout=0)
+            except Exception as e:
+                logger.warning(f"{self.model.name} warm-up failed, serving without it: {e}")
+            self.phases["warmup"] = round(time.monotonic() - started, 2)
+
+        self.state = "ready"
+        self.ready_after = process_age()
+        logger.info(f"✅ {self.model.name} ready {self.ready_after}s after process start: {self.phases}")
+
+    def _warm_up(self) -> None:
+        with self.model.use() as model:
+            self.warmup(model)
+
+    async def live(self):
+        """The process is up and serving; never depends on the model"""
+        return {"status": "alive", "uptime_seconds": process_age()}
+
+    async def ready(self):
+        body = self.stats()
+        if not self.is_ready:
+            return JSONResponse(status_code=503, content=body)
+        return body
+
+    def stats(self) -> dict:
+        return {
+            "status": self.state,
+            "ready": self.is_ready,
+            "loading_step": self.model.phase,
+            "phases": self.phases,
+            "load_steps": self.model.phases,
+            "ready_after_seconds": self.ready_after,
+            "error": self.model.error,
+        }
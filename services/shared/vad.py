@@ -0,0 +1,85 @@
+"""
+Voice activity detection for the speech servers
+Energy-based on 30 ms frames, against a noise floor that follows the input, so
+quiet phone audio and loud studio audio both segment sensibly. No model and no
+extra dependency; it only has to find pauses, Whisper does the rest.
+"""
+
+import collections
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480  # 30 ms at 16 kHz
+FRAME_SECONDS = FRAME_SAMPLES / SAMPLE_RATE
+
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "10"))  # Above the noise floor counts as speech
+VAD_MIN_SPEECH_DB = float(os.getenv("VAD_MIN_SPEECH_DB", "-50"))  # Quieter than this (dBFS) is never speech
+
+def frame_db(frames: np.ndarray) -> np.ndarray:
+    """RMS level in dBFS of each row of a (frames, FRAME_SAMPLES) array"""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=-1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+class VoiceActivity:
+    """Per-frame speech/non-speech decisions against an adaptive noise floor.
+
+    The floor is a low percentile of the last few seconds of frame levels: the pauses
+    between words keep it at the background level even through long stretches of speech.
+    """
+
+    def __init__(self, window_seconds: float = 5.0):
+        self.levels = collections.deque(maxlen=int(window_seconds / FRAME_SECONDS))
+
+    @property
+    def noise_db(self) -> Optional[float]:
+        return float(np.percentile(self.levels, 10)) if self.levels else None
+
+    def is_speech(self, level_db: float) -> bool:
+        self.levels.append(level_db)
+        return level_db > max(self.noise_db + VAD_THRESHOLD_DB, VAD_MIN_SPEECH_DB)
+
+    def frames(self, samples: np.ndarray) -> np.ndarray:
+        """Speech flag per whole frame of samples (a trailing partial frame is ignored)"""
+        return np.array([self.is_speech(level) for level in _levels(samples)], dtype=bool)
+
+def _levels(samples: np.ndarray) -> np.ndarray:
+    count = len(samples) // FRAME_SAMPLES
+    return frame_db(samples[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES))
+
+def speech_frames(levels: np.ndarray, window_seconds: float = 5.0) -> np.ndarray:
+    """Speech flags for the frame levels of a complete recording. Same decision as VoiceActivity, but
+    the floor is taken once per window rather than per frame, so an hour of audio takes milliseconds"""
+    if not len(levels):
+        return np.zeros(0, dtype=bool)
+    blocks = np.array_split(levels, -(-len(levels) // int(window_seconds / FRAME_SECONDS)))
+    floors = np.concatenate([np.full(len(block), np.percentile(block, 10)) for block in blocks])
+    return levels > np.maximum(floors + VAD_THRESHOLD_DB, VAD_MIN_SPEECH_DB)
+
+def split_at_silences(samples: np.ndarray, max_seconds: float) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of at most max_seconds covering the recording. Each cut is at the
+    quietest 0.3 s in the second half of its chunk, which is a pause between words or sentences
+    whenever there is one. Chunks without speech are left out"""
+    levels = _levels(samples)
+    speech = speech_frames(levels)
+    if not speech.any():
+        return []
+    # Quietest stretch rather than a single quiet frame, so cuts land in pauses and not between syllables
+    quiet = np.convolve(levels, np.ones(10) / 10, mode="same")
+    max_frames = max(2, int(max_seconds / FRAME_SECONDS))
+    chunks = []
+    start = 0
+    while start < len(levels):
+        end = start + max_frames
+        if end >= len(levels):
+            end = len(levels)
+        else:
+            end = start + max_frames // 2 + int(np.argmin(quiet[start + max_frames // 2:end]))
+        if speech[start:end].any():
+            chunks.append((start * FRAME_SAMPLES, end * FRAME_SAMPLES))
+        start = end
+    if chunks and chunks[-1][1] == len(levels) * FRAME_SAMPLES:
+        chunks[-1] = (chunks[-1][0], len(samples))  # Keep the trailing partial frame
+    return chunks
@@ -0,0 +1,167 @@
+"""
+Registry of named XTTS voices for the text-to-speech server
+A voice's speaker conditioning (GPT conditioning latents and speaker embedding)
+is computed once from its reference clip, kept in an LRU memory tier and saved
+to disk next to the clip, so synthesis by voice id skips the conditioning pass
+entirely. Latents saved by a different model are recomputed from the clip.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+VOICE_DIR = os.getenv("VOICE_DIR", "/tmp/payaid-voices")
+VOICE_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE", "64"))  # Voices whose latents stay in memory
+VOICE_MAX_BYTES = int(float(os.getenv("VOICE_MAX_MB", "10")) * 1024 * 1024)
+
+VOICE_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+def validate_voice_id(voice_id: str) -> None:
+    if not VOICE_ID.match(voice_id):
+        raise HTTPException(status_code=400, detail="voice_id must be 1-64 lowercase letters, digits, - or _")
+
+def _device(xtts):
+    return next(xtts.parameters()).device
+
+class VoiceRegistry:
+    """<voice_id>.wav (reference clip), .pt (latents) and .json (metadata) files in one directory,
+    with the most recently used voices' latents kept in memory on the model's device"""
+
+    def __init__(self, directory: str = VOICE_DIR, capacity: int = VOICE_CACHE_SIZE):
+        self.directory = directory
+        self.capacity = capacity
+        self.memory = OrderedDict()  # voice_id -> (gpt_cond_latent, speaker_embedding), least recently used first
+        self.hits = 0
+        self.disk_loads = 0
+        self.computed = 0
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, voice_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, voice_id + suffix)
+
+    def exists(self, voice_id: str) -> bool:
+        return VOICE_ID.match(voice_id) is not None and os.path.exists(self._path(voice_id, ".json"))
+
+    def metadata(self, voice_id: str) -> dict:
+        with open(self._path(voice_id, ".json")) as f:
+            return json.load(f)
+
+    def list(self) -> list:
+        voices = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                try:
+                    voices.append({**self.metadata(name[:-5]), "in_memory": name[:-5] in self.memory})
+                except (OSError, ValueError):
+                    continue
+        return voices
+
+    def register(self, voice_id: str, reference: bytes, xtts, model_name: str, name: Optional[str] = None) -> dict:
+        """Store the reference clip and compute its latents; blocking, call on the inference worker"""
+        validate_voice_id(voice_id)
+        if not reference:
+            raise HTTPException(status_code=400, detail="Reference audio is empty")
+        with self._lock:
+            clip = self._path(voice_id, ".wav")
+            temporary = self._path(f"{voice_id}.{threading.get_ident()}.tmp", ".wav")  # Loaders go by extension
+            with open(temporary, "wb") as f:
+                f.write(reference)
+            started = time.monotonic()
+            try:
+                latents = self._compute(temporary, xtts)
+            except Exception as e:
+                os.remove(temporary)
+                raise HTTPException(status_code=400, detail=f"Could not use reference audio: {e}")
+            os.replace(temporary, clip)
+            metadata = {
+                "voice_id": voice_id,
+                "name": name or voice_id,
+                "model": model_name,
+                "reference_bytes": len(reference),
+                "conditioning_seconds": round(time.monotonic() - started, 3),
+                "created": time.time(),
+            }
+            self._save(voice_id, latents, metadata)
+            self._remember(voice_id, latents)
+        logger.info(f"✅ Registered voice {voice_id} in {metadata['conditioning_seconds']}s")
+        return metadata
+
+    def latents(self, voice_id: str, xtts, model_name: str) -> Tuple:
+        """(gpt_cond_latent, speaker_embedding) from memory, disk, or (for another model's latents) the clip"""
+        with self._lock:
+            if voice_id in self.memory:
+                self.memory.move_to_end(voice_id)
+                self.hits += 1
+                return self.memory[voice_id]
+            if not self.exists(voice_id):
+                raise HTTPException(status_code=404, detail=f"Unknown voice_id {voice_id}")
+
+            import torch
+            metadata = self.metadata(voice_id)
+            latents = None
+            if metadata.get("model") == model_name:
+                try:
+                    saved = torch.load(self._path(voice_id, ".pt"), map_location=_device(xtts))
+                    latents = (saved["gpt_cond_latent"], saved["speaker_embedding"])
+                    self.disk_loads += 1
+                except (OSError, KeyError, RuntimeError) as e:
+                    logger.warning(f"Voice {voice_id}: saved latents unreadable, recomputing: {e}")
+            if latents is None:
+                latents = self._compute(self._path(voice_id, ".wav"), xtts)
+                self._save(voice_id, latents, {**metadata, "model": model_name})
+            self._remember(voice_id, latents)
+            return latents
+
+    def delete(self, voice_id: str) -> bool:
+        with self._lock:
+            if not self.exists(voice_id):
+                return False
+            self.memory.pop(voice_id, None)
+            for suffix in (".json", ".pt", ".wav"):
+                try:
+                    os.remove(self._path(voice_id, suffix))
+                except OSError:
+                    pass
+        return True
+
+    def _compute(self, clip: str, xtts) -> Tuple:
+        gpt_cond_latent, speaker_embedding = xtts.get_conditioning_latents(audio_path=[clip])
+        self.computed += 1
+        return gpt_cond_latent, speaker_embedding
+
+    def _save(self, voice_id: str, latents: Tuple, metadata: dict) -> None:
+        import torch
+        path = self._path(voice_id, ".pt")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        torch.save({"gpt_cond_latent": latents[0].cpu(), "speaker_embedding": latents[1].cpu()}, temporary)
+        os.replace(temporary, path)
+        with open(self._path(voice_id, ".json"), "w") as f:
+            json.dump(metadata, f)
+
+    def _remember(self, voice_id: str, latents: Tuple) -> None:
+        if self.capacity <= 0:
+            return
+        self.memory[voice_id] = latents
+        self.memory.move_to_end(voice_id)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "voices": sum(1 for name in os.listdir(self.directory) if name.endswith(".json")),
+            "in_memory": len(self.memory),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "disk_loads": self.disk_loads,
+            "computed": self.computed,
+        }
@@ -0,0 +1,205 @@
+"""
+Whisper backend benchmark for the speech-to-text server
+Transcribes every audio file in a sample directory under each configuration
+(backend, model size, compute type), each in its own subprocess so peak RSS is
+per configuration, and reports the real-time factor (processing seconds per
+second of audio; below 1 is faster than real time) and, for files with a
+same-named .txt reference transcript, the word error rate. With --chunk-seconds,
+recordings are split at pauses and transcribed WHISPER_WORKERS chunks at a time, as
+the server does for long audio; give configs a workers field to measure scaling.
+
+Usage (from services/speech-to-text):
+    python benchmarks/backends.py --samples ./samples
+        [--configs whisper:large-v3,faster-whisper:large-v3:int8,faster-whisper:small:int8]
+        [--language en] [--chunk-seconds 30] [--output results.json]
+
+    Scaling of chunked transcription with workers:
+    python benchmarks/backends.py --samples ./meetings --chunk-seconds 30 \
+        --configs faster-whisper:small:int8:1,faster-whisper:small:int8:2,faster-whisper:small:int8:4
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, SERVICES_DIR)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".opus", ".webm")
+DEFAULT_CONFIGS = "whisper:large-v3,faster-whisper:large-v3:int8,faster-whisper:large-v3:int8_float32,faster-whisper:small:int8"
+
+def parse_config(config: str) -> dict:
+    """backend:size[:compute_type[:workers]] -> environment for the child"""
+    parts = config.split(":")
+    if len(parts) not in (2, 3, 4):
+        raise ValueError(f"Config {config!r} must look like backend:size[:compute_type[:workers]]")
+    env = {"WHISPER_BACKEND": parts[0], "MODEL_NAME": parts[1]}
+    if len(parts) >= 3 and parts[2]:
+        env["WHISPER_COMPUTE_TYPE"] = parts[2]
+    if len(parts) == 4:
+        env["WHISPER_WORKERS"] = parts[3]
+    return env
+
+def load_audio(path: str):
+    """16 kHz mono float32 samples through ffmpeg, so decode time is the same for every backend and not timed"""
+    import numpy as np
+    completed = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path, "-f", "f32le", "-ac", "1", "-ar", "16000", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(completed.stdout, dtype=np.float32)
+
+def run_child(args) -> int:
+    """Load one configuration and transcribe every sample; prints one JSON line"""
+    import numpy as np
+    from shared.speech_backend import load_speech_model
+    from shared.vad import split_at_silences
+
+    started = time.perf_counter()
+    model = load_speech_model(os.environ["MODEL_NAME"])
+    load_seconds = time.perf_counter() - started
+    model.transcribe(np.zeros(16000, dtype=np.float32), language=args.language or "en")  # Warm-up
+
+    files = []
+    for path in sample_files(args.samples):
+        audio = load_audio(path)
+        started = time.perf_counter()
+        if args.chunk_seconds:
+            result = model.transcribe_chunks(audio, split_at_silences(audio, args.chunk_seconds), language=args.language)
+        else:
+            result = model.transcribe(audio, language=args.language)
+        files.append({
+            "file": os.path.basename(path),
+            "audio_seconds": len(audio) / 16000,
+            "seconds": time.perf_counter() - started,
+            "language": result["language"],
+            "text": result["text"].strip(),
+        })
+
+    print(json.dumps({
+        "backend": model.backend.describe(),
+        "load_seconds": load_seconds,
+        "files": files,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+    return 0
+
+def sample_files(directory: str) -> list:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+def normalize(text: str) -> list:
+    """Lowercase words without punctuation, so WER counts recognition errors rather than formatting"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Word-level Levenshtein distance (substitutions + deletions + insertions)"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1]
+
+def score(result: dict, samples: str) -> None:
+    """Adds real-time factor and, where references exist, word error rate to a child's result"""
+    errors = words = 0
+    for entry in result["files"]:
+        entry["rtf"] = entry["seconds"] / entry["audio_seconds"] if entry["audio_seconds"] else None
+        reference_path = os.path.join(samples, os.path.splitext(entry["file"])[0] + ".txt")
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = normalize(f.read())
+            entry["errors"] = word_errors(reference, normalize(entry["text"]))
+            entry["wer"] = entry["errors"] / len(reference) if reference else None
+            errors += entry["errors"]
+            words += len(reference)
+    audio = sum(entry["audio_seconds"] for entry in result["files"])
+    result["audio_seconds"] = audio
+    result["rtf"] = sum(entry["seconds"] for entry in result["files"]) / audio if audio else None
+    result["wer"] = errors / words if words else None
+
+def run(args) -> int:
+    try:
+        configs = {config: parse_config(config) for config in args.configs.split(",")}
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not sample_files(args.samples):
+        print(f"No audio files ({', '.join(AUDIO_EXTENSIONS)}) in {args.samples}", file=sys.stderr)
+        return 2
+
+    results = {}
+    for name, env in configs.items():
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--samples", args.samples]
+        if args.language:
+            command += ["--language", args.language]
+        if args.chunk_seconds:
+            command += ["--chunk-seconds", str(args.chunk_seconds)]
+        print(f"{name}: running", file=sys.stderr)
+        completed = subprocess.run(command, env={**os.environ, **env}, capture_output=True, text=True)
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1:] or ["failed"]
+            results[name] = {"error": error[0]}
+            print(f"{name}: {error[0]}", file=sys.stderr)
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        score(result, args.samples)
+        results[name] = result
+        print(f"{name}: RTF {result['rtf']:.3f}, peak RSS {result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "samples": sample_files(args.samples),
+            "language": args.language,
+            "chunk_seconds": args.chunk_seconds,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    print(f"\n{'config':<38} {'RTF':>7} {'x real time':>12} {'WER':>7} {'peak MB':>9}", file=sys.stderr)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<38} {'error':>7}", file=sys.stderr)
+            continue
+        speed = f"{1 / result['rtf']:.1f}x" if result["rtf"] else "-"
+        wer = f"{result['wer']:.1%}" if result["wer"] is not None else "-"
+        print(f"{name:<38} {result['rtf']:>7.3f} {speed:>12} {wer:>7} {result['peak_rss_mb']:>9.0f}", file=sys.stderr)
+    return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", required=True, help="Directory of audio files, with optional <name>.txt references")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="Comma-separated backend:size[:compute_type[:workers]]")
+    parser.add_argument("--language", help="Skip language detection, e.g. en")
+    parser.add_argument("--chunk-seconds", type=float, help="Split at pauses into chunks of at most this length, transcribed in parallel")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    sys.exit(run_child(arguments) if arguments.child else run(arguments))
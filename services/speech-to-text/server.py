@@ -1,79 +1,634 @@
 """
 Speech to Text Service using Whisper
+Runs on faster-whisper (CTranslate2, int8 on CPU) by default, or on the reference
+openai-whisper model with WHISPER_BACKEND=whisper.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import whisper
+from starlette.datastructures import UploadFile
+from typing import Optional
 import os
+import sys
+import json
 import time
+import asyncio
 import logging
-import httpx
+import collections
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # services/, for shared/ outside Docker
+from shared.inference import InferenceExecutor, WaitTimes
+from shared.lifecycle import ManagedModel
+from shared.startup import ModelStartup
+from shared.speech_backend import WHISPER_BACKEND, load_speech_model, model_size
+from shared.audio import AUDIO_CONTENT_TYPES, AUDIO_MAX_BYTES, decode_audio, duration
+from shared.fetch import check_length, download, read_body
+from shared.vad import FRAME_SAMPLES, FRAME_SECONDS, SAMPLE_RATE, VoiceActivity, split_at_silences
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Speech to Text Service")
 
-# Initialize Whisper model
-whisper_model = None
-MODEL_NAME = os.getenv("MODEL_NAME", "openai/whisper-large-v3")
+# Whisper is loaded on demand and evicted when idle
+MODEL_NAME = os.getenv("MODEL_NAME", "openai/whisper-large-v3")  # Whisper size, or a CTranslate2 model for faster-whisper
+# Model tiers, smallest first, loaded and evicted together. Short clips go to the first,
+# long or difficult audio to the last. Opt-in (e.g. "small,large-v3"): every tier stays in memory
+WHISPER_TIERS = list(dict.fromkeys(
+    name.strip() for name in os.getenv("WHISPER_TIERS", MODEL_NAME).split(",") if name.strip()
+))
+STT_SHORT_SECONDS = float(os.getenv("STT_SHORT_SECONDS", "30"))  # Up to this long goes to the smallest tier
+# Languages the smaller tiers handle well; other languages go to (or escalate to) the largest tier
+STT_FAST_LANGUAGES = {code.strip() for code in os.getenv("STT_FAST_LANGUAGES", "en").split(",") if code.strip()}
+STT_ESCALATE = os.getenv("STT_ESCALATE", "true").lower() == "true"  # Retry low-confidence results on the next tier
+STT_ESCALATE_LOGPROB = float(os.getenv("STT_ESCALATE_LOGPROB", "-0.8"))  # Mean avg_logprob below this escalates
+STT_ESCALATE_NO_SPEECH = float(os.getenv("STT_ESCALATE_NO_SPEECH", "0.5"))  # Mean no_speech_prob above this escalates
+# Long recordings are cut at pauses into chunks transcribed in parallel (WHISPER_WORKERS at a time)
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "30"))
+WINDOW_SECONDS = 30  # Whisper encodes audio in 30 s windows, so cost grows per window rather than per second
+backend = None
+
+class Tier:
+    """One model size, with a running estimate of its cost per 30 s window for latency budgets"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.model = None
+        self.window_seconds: Optional[float] = None
+        self.requests = 0
+        self.escalated = 0  # Results from this tier retried on a larger one
+
+    def windows(self, audio_seconds: float) -> float:
+        windows = max(1, -(-audio_seconds // WINDOW_SECONDS))
+        if self.chunked(audio_seconds):
+            windows /= min(self.model.backend.workers, windows)
+        return windows
+
+    def chunked(self, audio_seconds: float) -> bool:
+        return self.model.backend.workers > 1 and audio_seconds > 2 * STT_CHUNK_SECONDS
+
+    def estimate(self, audio_seconds: float) -> Optional[float]:
+        return None if self.window_seconds is None else self.window_seconds * self.windows(audio_seconds)
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        audio_seconds = duration(audio)
+        started = time.perf_counter()
+        if self.chunked(audio_seconds):
+            result = self.model.transcribe_chunks(audio, split_at_silences(audio, STT_CHUNK_SECONDS), **options)
+        else:
+            result = self.model.transcribe(audio, **options)
+        self.record(time.perf_counter() - started, self.windows(audio_seconds))
+        return result
+
+    def record(self, seconds: float, windows: float) -> None:
+        cost = seconds / windows
+        self.window_seconds = cost if self.window_seconds is None else 0.8 * self.window_seconds + 0.2 * cost
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "backend": self.model.backend.describe() if self.model else None,
+            "window_seconds": round(self.window_seconds, 3) if self.window_seconds is not None else None,
+            "requests": self.requests,
+            "escalated": self.escalated,
+        }
 
-try:
-    logger.info(f"Loading Whisper model: {MODEL_NAME}")
-    whisper_model = whisper.load_model("large-v3")
-    logger.info("✅ Whisper model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load Whisper model: {e}")
-    whisper_model = None
+tiers = [Tier(name) for name in WHISPER_TIERS]
+
+def tier_named(model: str) -> Optional[Tier]:
+    """The tier for a model name as configured, or its bare size (large-v3 for openai/whisper-large-v3)"""
+    return next((tier for tier in tiers if model in (tier.name, model_size(tier.name))), None)
+
+def load_whisper():
+    global backend
+    try:
+        for tier in tiers:
+            logger.info(f"Loading Whisper model: {tier.name} ({WHISPER_BACKEND})")
+            with whisper_model.step(tier.name):
+                tier.model = load_speech_model(tier.name)
+    except Exception:
+        unload_whisper(tiers)  # Do not keep the tiers that did load
+        raise
+    backend = tiers[-1].model.backend
+    logger.info(f"Using backend: {backend.describe()}, tiers: {', '.join(WHISPER_TIERS)}")
+    return tiers
+
+def unload_whisper(loaded) -> None:
+    for tier in loaded:
+        tier.model = None
+
+def warm_up(loaded) -> None:
+    """One second of silence per tier: runs the encoder and a decoding pass, and gives each tier a
+    first cost estimate"""
+    for tier in loaded:
+        tier.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+
+whisper_model = ManagedModel("whisper", load_whisper, unload_whisper)
+inference = InferenceExecutor("whisper")
+
+# Loads in the background once the server is listening; /health/ready turns 200 after the warm-up
+startup = ModelStartup(whisper_model, inference, warm_up)
+startup.install(app)
+
+def route(audio_seconds: float, language: Optional[str], latency_budget: Optional[float],
+          model: Optional[str]) -> tuple:
+    """(tier, reason) for a request, before any escalation"""
+    if model is not None:
+        return tier_named(model), "requested"
+    if latency_budget is not None:
+        # A tier without an estimate yet (no warm-up, never used) does not count as fitting
+        fitting = [tier for tier in tiers
+                   if tier.estimate(audio_seconds) is not None and tier.estimate(audio_seconds) <= latency_budget]
+        return (fitting[-1], "latency budget") if fitting else (tiers[0], "latency budget (no tier fits)")
+    if language is not None and STT_FAST_LANGUAGES and language not in STT_FAST_LANGUAGES:
+        return tiers[-1], f"language {language}"
+    if audio_seconds <= STT_SHORT_SECONDS:
+        return tiers[0], "short audio"
+    return tiers[-1], "long audio"
+
+def confidence(result: dict) -> Optional[dict]:
+    """Duration-weighted mean avg_logprob and no_speech_prob over the segments"""
+    segments = result.get("segments") or []
+    if not segments:
+        return None
+    weights = [max(segment["end"] - segment["start"], 0.01) for segment in segments]
+    total = sum(weights)
+    return {
+        field: round(sum(w * segment[field] for w, segment in zip(weights, segments)) / total, 4)
+        for field in ("avg_logprob", "no_speech_prob")
+    }
+
+def escalation(tier: Tier, result: dict, language: Optional[str], scores: Optional[dict]) -> Optional[str]:
+    """Why the result should be retried on a larger tier, or None"""
+    if not STT_ESCALATE or tier is tiers[-1]:
+        return None
+    if not result.get("segments") or result.get("language") is None:
+        return None  # Silence: a larger model would not find speech in it either
+    if language is None and STT_FAST_LANGUAGES and result["language"] not in STT_FAST_LANGUAGES:
+        return f"detected language {result['language']}"
+    if scores is not None and scores["avg_logprob"] < STT_ESCALATE_LOGPROB:
+        return "low avg_logprob"
+    if scores is not None and scores["no_speech_prob"] > STT_ESCALATE_NO_SPEECH and result["text"].strip():
+        return "high no_speech_prob"
+    return None
+
+def transcribe_audio(audio: np.ndarray, latency_budget: Optional[float] = None, model: Optional[str] = None,
+                     **options) -> dict:
+    """Route to a tier, then escalate tier by tier while the result looks unreliable and the latency
+    budget allows. The result carries "model" and "routing" (why that tier)"""
+    with whisper_model.use():
+        started = time.perf_counter()
+        audio_seconds = duration(audio)
+        tier, reason = route(audio_seconds, options.get("language"), latency_budget, model)
+        routing = {"reason": reason, "latency_budget": latency_budget, "estimated_seconds": tier.estimate(audio_seconds),
+                   "escalations": []}
+        while True:
+            tier.requests += 1
+            result = tier.transcribe(audio, **options)
+            scores = confidence(result)
+            routing["confidence"] = scores
+            why = escalation(tier, result, options.get("language"), scores) if model is None else None
+            if why is None:
+                break
+            larger = tiers[tiers.index(tier) + 1]
+            estimate = larger.estimate(audio_seconds)
+            if (latency_budget is not None and estimate is not None
+                    and time.perf_counter() - started + estimate > latency_budget):
+                routing["escalation_skipped"] = f"{why}; {larger.name} would exceed the latency budget"
+                break
+            routing["escalations"].append({"from": tier.name, "to": larger.name, "reason": why, "confidence": scores})
+            tier.escalated += 1
+            tier = larger
+        if routing["estimated_seconds"] is not None:
+            routing["estimated_seconds"] = round(routing["estimated_seconds"], 3)
+        routing["seconds"] = round(time.perf_counter() - started, 3)
+        return {**result, "model": tier.name, "routing": routing}
+
+TASKS = ("transcribe", "translate")
 
 class STTRequest(BaseModel):
     audio_url: str
     language: str = None
     task: str = "transcribe"  # transcribe or translate
+    model: str = None  # One of WHISPER_TIERS, bypassing routing
+    latency_budget: float = None  # Seconds; picks the largest tier expected to finish in time
 
 @app.get("/health")
 async def health():
     return {
-        "status": "healthy" if whisper_model else "unhealthy",
+        "status": "unhealthy" if whisper_model.state == "failed" else "healthy",
         "model": MODEL_NAME,
+        "backend": backend.describe() if backend else None,
+        "tiers": [tier.stats() for tier in tiers],
+        "lifecycle": whisper_model.stats(),
+        "startup": startup.stats(),
+        "inference": inference.stats(),
+        "streaming": {
+            "active_sessions": streams.active,
+            "sessions": streams.sessions,
+            "first_partial_seconds": streams.first_partial.summary(),
+        },
+    }
+
+def validate_options(task: str, model: Optional[str], latency_budget: Optional[float]) -> None:
+    if task not in TASKS:
+        raise HTTPException(status_code=400, detail=f"task must be one of {', '.join(TASKS)}")
+    if model is not None and tier_named(model) is None:
+        raise HTTPException(status_code=400, detail=f"model must be one of {', '.join(WHISPER_TIERS)}")
+    if latency_budget is not None and latency_budget <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget must be positive")
+
+async def run_transcription(data: bytes, language: Optional[str], task: str, model: Optional[str] = None,
+                            latency_budget: Optional[float] = None) -> dict:
+    """Decode in memory off the event loop, then transcribe on the inference worker"""
+    validate_options(task, model, latency_budget)
+    start = time.perf_counter()
+    audio = await asyncio.to_thread(decode_audio, data)
+    decode_time = time.perf_counter() - start
+    result = await inference.run(transcribe_audio, audio, language=language, task=task, model=model,
+                                 latency_budget=latency_budget)
+    return {
+        "text": result["text"],
+        "language": result["language"],
+        "segments": result.get("segments", []),
+        "duration": duration(audio),
+        "chunks": result.get("chunks", 1),
+        "model": result["model"],
+        "routing": result["routing"],
+        "decode_time": decode_time,
     }
 
 @app.post("/transcribe")
 async def transcribe(request: STTRequest):
-    if not whisper_model:
-        raise HTTPException(status_code=503, detail="Whisper model not loaded")
+    whisper_model.check()
     
     try:
-        # Download audio file
-        async with httpx.AsyncClient() as client:
-            audio_response = await client.get(request.audio_url)
-            audio_response.raise_for_status()
-            
-            # Save temporarily
-            audio_path = f"/tmp/audio_{int(time.time())}.wav"
-            with open(audio_path, "wb") as f:
-                f.write(audio_response.content)
-            
-            # Transcribe
-            result = whisper_model.transcribe(
-                audio_path,
-                language=request.language,
-                task=request.task,
-            )
-            
-            # Clean up
-            os.remove(audio_path)
-            
-            return {
-                "text": result["text"],
-                "language": result["language"],
-                "segments": result.get("segments", []),
-            }
+        # Stream the download with a size cap; nothing is written to disk
+        _, data = await download(request.audio_url, AUDIO_MAX_BYTES, AUDIO_CONTENT_TYPES, "Audio")
+        return await run_transcription(data, request.language, request.task, request.model, request.latency_budget)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Transcription error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/transcribe/upload")
+async def transcribe_upload(request: Request, language: Optional[str] = None, task: str = "transcribe",
+                            model: Optional[str] = None, latency_budget: Optional[float] = None):
+    """Audio in the request itself: multipart/form-data with a "file" part (the options may be form
+    fields), or the raw bytes as the body with the options as query parameters"""
+    whisper_model.check()
+    
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            check_length(request.headers.get("content-length"), AUDIO_MAX_BYTES, "Audio")
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=400, detail='Multipart uploads need a "file" part')
+            data = await upload.read()
+            if len(data) > AUDIO_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Audio is larger than {AUDIO_MAX_BYTES} bytes")
+            language = form.get("language") or language
+            task = form.get("task") or task
+            model = form.get("model") or model
+            if form.get("latency_budget"):
+                try:
+                    latency_budget = float(form.get("latency_budget"))
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="latency_budget must be a number")
+        else:
+            data = await read_body(request, AUDIO_MAX_BYTES, "Audio")
+        return await run_transcription(data, language, task, model, latency_budget)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Transcription error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming transcription for voice agents: audio frames arrive over a WebSocket, and transcripts go
+# back while the caller is still talking
+STREAM_PARTIAL_SECONDS = float(os.getenv("STREAM_PARTIAL_SECONDS", "1.0"))  # New audio between partial transcripts
+STREAM_END_SILENCE_SECONDS = float(os.getenv("STREAM_END_SILENCE_SECONDS", "0.6"))  # Pause that ends an utterance
+STREAM_MAX_UTTERANCE_SECONDS = float(os.getenv("STREAM_MAX_UTTERANCE_SECONDS", "20"))  # Finalized even without a pause
+STREAM_CONTEXT_CHARS = int(os.getenv("STREAM_CONTEXT_CHARS", "200"))  # Finalized text used as the prompt for the next utterance
+STREAM_PREROLL_SECONDS = 0.3  # Audio kept from before speech starts, so first syllables are not clipped
+STREAM_MIN_SPEECH_SECONDS = 0.25  # Shorter bursts (clicks, breaths) are not transcribed
+# Containers ffmpeg demuxes from a pipe; Opus from browsers (MediaRecorder) and telephony comes in one of these
+STREAM_CONTAINERS = {"ogg": ["-f", "ogg"], "webm": ["-f", "matroska"]}
+STREAM_FORMATS = ("pcm_s16le",) + tuple(STREAM_CONTAINERS)
+
+def _frames(seconds: float) -> int:
+    return max(1, round(seconds / FRAME_SECONDS))
+
+class StreamStats:
+    def __init__(self):
+        self.active = 0
+        self.sessions = 0
+        self.first_partial = WaitTimes()  # From the first speech frame of an utterance to its first partial
+
+streams = StreamStats()
+
+class PCMDecoder:
+    """16-bit little-endian mono PCM at 16 kHz, converted in-process with no added latency"""
+
+    def __init__(self, on_samples):
+        self.on_samples = on_samples
+        self.remainder = b""
+
+    async def write(self, data: bytes) -> None:
+        data = self.remainder + data
+        usable = len(data) - len(data) % 2  # A frame may end mid-sample
+        self.remainder = data[usable:]
+        self.on_samples(np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0)
+
+    async def close(self) -> None:
+        pass
+
+    def kill(self) -> None:
+        pass
+
+class FFmpegDecoder:
+    """Ogg/WebM Opus, or PCM at another rate, through one ffmpeg process per session so codec state
+    carries over from frame to frame"""
+
+    def __init__(self, on_samples, input_args: list):
+        self.on_samples = on_samples
+        self.input_args = input_args
+        self.process = None
+        self.reader = None
+
+    async def start(self) -> None:
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-fflags", "nobuffer", *self.input_args, "-i", "pipe:0",
+                "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise HTTPException(status_code=501, detail="ffmpeg is not installed; stream pcm_s16le at 16 kHz")
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        remainder = b""
+        while chunk := await self.process.stdout.read(65536):
+            data = remainder + chunk
+            usable = len(data) - len(data) % 4
+            remainder = data[usable:]
+            self.on_samples(np.frombuffer(data[:usable], dtype=np.float32))
+
+    async def write(self, data: bytes) -> None:
+        try:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            await self.close()  # ffmpeg gave up on the input; close() reports why
+
+    async def close(self) -> None:
+        """Flush: decode whatever ffmpeg still holds, then fail if it could not decode the stream"""
+        if self.process.stdin.can_write_eof():
+            self.process.stdin.close()
+        await self.reader
+        stderr = await self.process.stderr.read()
+        if await self.process.wait() != 0:
+            error = stderr.decode(errors="replace").strip().splitlines()[-1:] or ["no audio stream"]
+            raise HTTPException(status_code=400, detail=f"Could not decode audio: {error[0]}")
+
+    def kill(self) -> None:
+        if self.reader:
+            self.reader.cancel()
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+
+async def open_decoder(format: str, sample_rate: int, on_samples):
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+    if format == "pcm_s16le" and sample_rate == SAMPLE_RATE:
+        return PCMDecoder(on_samples)
+    if format == "pcm_s16le":
+        decoder = FFmpegDecoder(on_samples, ["-f", "s16le", "-ar", str(sample_rate), "-ac", "1"])
+    else:
+        decoder = FFmpegDecoder(on_samples, STREAM_CONTAINERS[format])
+    await decoder.start()
+    return decoder
+
+class StreamingSession:
+    """Voice activity segmentation and incremental transcription for one WebSocket.
+
+    An utterance starts at the first speech frame (plus a short pre-roll) and ends after
+    STREAM_END_SILENCE_SECONDS of silence. While it grows, the audio so far is transcribed every
+    STREAM_PARTIAL_SECONDS for a partial; when it ends, it is transcribed once more for the final.
+    Finals run in order, each prompted with the text finalized before it, and the language detected
+    on the first one is kept for the rest of the session.
+    """
+
+    def __init__(self, websocket: WebSocket, language: Optional[str], task: str):
+        self.websocket = websocket
+        self.language = language
+        self.task = task
+        self.vad = VoiceActivity()
+        self.send_lock = asyncio.Lock()  # Partials and finals are sent from separate tasks
+        self.pending = np.empty(0, dtype=np.float32)  # Samples short of a whole frame
+        self.preroll = collections.deque(maxlen=_frames(STREAM_PREROLL_SECONDS))
+        self.frames = 0  # Frames seen, for session-relative timestamps
+        self.utterance = []  # Frames of the utterance in progress
+        self.utterance_start = 0
+        self.speech_frames = 0
+        self.silent_frames = 0
+        self.partial_frames = 0  # Utterance length when the last partial was started
+        self.spoke_at = None  # When the utterance's first speech frame arrived
+        self.generation = 0  # Bumped when an utterance ends, so its late partials are dropped
+        self.partial_sent = -1  # Generation of the last partial sent
+        self.partial_task = None
+        self.final_task = None
+        self.context = ""
+        self.stats = {"utterances": 0, "partials": 0, "partials_dropped": 0, "first_partial_seconds": None}
+
+    async def send(self, message: dict) -> None:
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    def options(self, partial: bool = False) -> dict:
+        options = {"language": self.language, "task": self.task, "initial_prompt": self.context or None}
+        if partial:
+            # Partials are replaced soon anyway: one greedy pass on the smallest tier, no temperature fallback
+            options.update(model=WHISPER_TIERS[0], temperature=0.0, condition_on_previous_text=False)
+        return options
+
+    def feed(self, samples: np.ndarray) -> None:
+        samples = np.concatenate([self.pending, samples])
+        count = len(samples) // FRAME_SAMPLES
+        frames = samples[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES)
+        self.pending = samples[count * FRAME_SAMPLES:]
+
+        for frame, speech in zip(frames, self.vad.frames(frames.ravel())):
+            self.frames += 1
+            if not self.utterance:
+                if not speech:
+                    self.preroll.append(frame)
+                    continue
+                self.utterance = list(self.preroll)
+                self.preroll.clear()
+                self.utterance_start = self.frames - 1 - len(self.utterance)
+                self.speech_frames = self.silent_frames = self.partial_frames = 0
+                self.spoke_at = time.perf_counter()
+            self.utterance.append(frame)
+            if speech:
+                self.speech_frames += 1
+                self.silent_frames = 0
+            else:
+                self.silent_frames += 1
+            if (self.silent_frames >= _frames(STREAM_END_SILENCE_SECONDS)
+                    or len(self.utterance) >= _frames(STREAM_MAX_UTTERANCE_SECONDS)):
+                self.finalize()
+
+        # One partial at a time: while one is running, new audio just makes the next one longer
+        if (self.utterance and self.speech_frames >= _frames(STREAM_MIN_SPEECH_SECONDS)
+                and len(self.utterance) - self.partial_frames >= _frames(STREAM_PARTIAL_SECONDS)
+                and (self.partial_task is None or self.partial_task.done())):
+            self.partial_frames = len(self.utterance)
+            self.partial_task = asyncio.create_task(self._partial(
+                np.concatenate(self.utterance), self.utterance_start * FRAME_SECONDS, self.generation,
+            ))
+
+    def finalize(self) -> None:
+        utterance, self.utterance = self.utterance, []
+        self.generation += 1
+        if self.partial_task is not None and not self.partial_task.done():
+            self.partial_task.cancel()  # Its audio is about to be transcribed in full
+            self.stats["partials_dropped"] += 1
+        if self.speech_frames < _frames(STREAM_MIN_SPEECH_SECONDS):
+            return
+        self.stats["utterances"] += 1
+        self.final_task = asyncio.create_task(self._final(
+            np.concatenate(utterance), self.utterance_start * FRAME_SECONDS, self.final_task,
+        ))
+
+    async def _partial(self, audio: np.ndarray, start: float, generation: int) -> None:
+        try:
+            result = await inference.run(transcribe_audio, audio, **self.options(partial=True))
+        except HTTPException:
+            return  # Partials are best-effort; a busy server still produces the final
+        except Exception as e:
+            logger.error(f"Streaming partial error: {e}")
+            return
+        if generation != self.generation:
+            self.stats["partials_dropped"] += 1
+            return
+        if self.partial_sent != generation:
+            self.partial_sent = generation
+            latency = time.perf_counter() - self.spoke_at
+            streams.first_partial.add(latency)
+            if self.stats["first_partial_seconds"] is None:
+                self.stats["first_partial_seconds"] = round(latency, 3)
+        self.stats["partials"] += 1
+        await self.send({
+            "type": "partial",
+            "text": result["text"].strip(),
+            "start": round(start, 3),
+            "end": round(start + duration(audio), 3),
+        })
+
+    async def _final(self, audio: np.ndarray, start: float, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await previous  # In order, and prompted with the previous utterance's text
+        try:
+            result = await inference.run(transcribe_audio, audio, **self.options())
+        except HTTPException as e:
+            await self.send({"type": "error", "status": e.status_code, "detail": e.detail, "start": round(start, 3)})
+            return
+        except Exception as e:
+            logger.error(f"Streaming transcription error: {e}")
+            await self.send({"type": "error", "status": 500, "detail": str(e), "start": round(start, 3)})
+            return
+        if self.language is None:
+            self.language = result["language"]  # Skip detection for the rest of the session
+        text = result["text"].strip()
+        if text:
+            self.context = f"{self.context} {text}".strip()[-STREAM_CONTEXT_CHARS:]
+        await self.send({
+            "type": "final",
+            "text": text,
+            "language": result["language"],
+            "start": round(start, 3),
+            "end": round(start + duration(audio), 3),
+            "model": result["model"],
+            "routing": result["routing"],
+            "segments": [
+                {**segment, "start": segment["start"] + start, "end": segment["end"] + start}
+                for segment in result.get("segments", [])
+            ],
+        })
+
+    async def finish(self) -> None:
+        """End of audio: finalize what is left, wait for every final, then report"""
+        if self.utterance:
+            self.finalize()
+        if self.final_task is not None:
+            await self.final_task
+        await self.send({"type": "done", "audio_seconds": round(self.frames * FRAME_SECONDS, 3), **self.stats})
+
+    def cancel(self) -> None:
+        for task in (self.partial_task, self.final_task):
+            if task is not None:
+                task.cancel()  # A final awaits the one before it, so this cancels the whole chain
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket, language: Optional[str] = None, task: str = "transcribe",
+                            format: str = "pcm_s16le", sample_rate: int = SAMPLE_RATE):
+    """Binary messages are audio; the text message {"event": "end"} flushes the last utterance and
+    closes the session after the "done" message"""
+    await websocket.accept()
+    session = StreamingSession(websocket, language, task)
+    try:
+        whisper_model.check()
+        if task not in TASKS:
+            raise HTTPException(status_code=400, detail=f"task must be one of {', '.join(TASKS)}")
+        decoder = await open_decoder(format, sample_rate, session.feed)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        await websocket.close(code=1013 if e.status_code == 503 else 1008)  # 1013: try again later
+        return
+
+    streams.active += 1
+    streams.sessions += 1
+    try:
+        await session.send({"type": "ready", "format": format, "sample_rate": sample_rate})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return  # Gone without "end": nothing left to send to
+            if message.get("bytes"):
+                await decoder.write(message["bytes"])
+                continue
+            try:
+                event = json.loads(message.get("text") or "{}").get("event")
+            except (ValueError, AttributeError):
+                event = None
+            if event == "end":
+                break
+        await decoder.close()
+        await session.finish()
+        logger.info(f"✅ Stream finished: {session.stats['utterances']} utterances, "
+                    f"{session.frames * FRAME_SECONDS:.1f}s of audio")
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        await websocket.close(code=1008)
+    except Exception as e:
+        logger.error(f"Streaming error: {e}")
+        await websocket.send_json({"type": "error", "status": 500, "detail": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        session.cancel()
+        decoder.kill()
+        streams.active -= 1
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=7860)
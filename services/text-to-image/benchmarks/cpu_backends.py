@@ -0,0 +1,176 @@
+"""
+CPU backend benchmark for the SDXL servers
+Runs one txt2img workload (prompt, size, steps, guidance, seed) under each
+backend configuration, each in its own subprocess so peak RSS is per
+configuration, and reports load time, warm-up time, seconds per image, peak RSS
+and how far each configuration's image is from the baseline fp32 torch output.
+
+Usage (from services/text-to-image):
+    python benchmarks/cpu_backends.py [--configs baseline,channels_last,bf16,compile,openvino,onnx]
+                                      [--size 512] [--steps 20] [--images 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, SERVICES_DIR)
+
+PROMPT = "product photo of a ceramic coffee mug on a wooden table, soft window light"
+
+# Environment per configuration; everything else comes from the shared backend defaults
+CONFIGS = {
+    "baseline": {"DIFFUSION_BACKEND": "torch", "CPU_BF16": "false", "CHANNELS_LAST": "false", "TORCH_COMPILE": "false"},
+    "channels_last": {"DIFFUSION_BACKEND": "torch", "CPU_BF16": "false", "CHANNELS_LAST": "true", "TORCH_COMPILE": "false"},
+    "bf16": {"DIFFUSION_BACKEND": "torch", "CPU_BF16": "true", "CHANNELS_LAST": "true", "TORCH_COMPILE": "false"},
+    "compile": {"DIFFUSION_BACKEND": "torch", "CPU_BF16": "auto", "CHANNELS_LAST": "true", "TORCH_COMPILE": "true"},
+    "openvino": {"DIFFUSION_BACKEND": "openvino"},
+    "onnx": {"DIFFUSION_BACKEND": "onnx"},
+}
+
+def run_child(args) -> int:
+    """Load and time one configuration; prints one JSON line"""
+    import torch
+    from diffusers import StableDiffusionXLPipeline
+    from shared.diffusion_backend import inference_context, load_pipeline
+
+    started = time.perf_counter()
+    pipeline, backend = load_pipeline(StableDiffusionXLPipeline, args.model)
+    load_seconds = time.perf_counter() - started
+
+    def generate():
+        with inference_context(backend):
+            return pipeline(
+                prompt=PROMPT,
+                width=args.size,
+                height=args.size,
+                num_inference_steps=args.steps,
+                guidance_scale=args.guidance_scale,
+                generator=torch.Generator(device="cpu").manual_seed(args.seed),
+            ).images[0]
+
+    # Warm-up pays for one-off costs (torch.compile, OpenVINO graph compilation, allocator growth)
+    started = time.perf_counter()
+    image = generate()
+    warmup_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(args.images):
+        started = time.perf_counter()
+        image = generate()
+        timings.append(time.perf_counter() - started)
+    image.save(args.image_path)
+
+    print(json.dumps({
+        "backend": backend.describe(),
+        "load_seconds": load_seconds,
+        "warmup_seconds": warmup_seconds,
+        "seconds_per_image": sum(timings) / len(timings),
+        "samples": timings,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+    return 0
+
+def image_difference(path: str, reference: str) -> dict:
+    import numpy as np
+    from PIL import Image
+    a = np.asarray(Image.open(path).convert("RGB"), dtype=np.float64)
+    b = np.asarray(Image.open(reference).convert("RGB"), dtype=np.float64)
+    mse = float(np.mean((a - b) ** 2))
+    return {
+        "mean_abs_diff": float(np.mean(np.abs(a - b))),
+        "psnr_db": float("inf") if mse == 0 else float(10 * np.log10(255 ** 2 / mse)),
+    }
+
+def run(args) -> int:
+    names = args.configs.split(",")
+    unknown = [name for name in names if name not in CONFIGS]
+    if unknown:
+        print(f"Unknown configs: {', '.join(unknown)}. Known: {', '.join(CONFIGS)}", file=sys.stderr)
+        return 2
+
+    workdir = tempfile.mkdtemp(prefix="sdxl-backends-")
+    results = {}
+    for name in names:
+        image_path = os.path.join(workdir, f"{name}.png")
+        command = [
+            sys.executable, os.path.abspath(__file__), "--child",
+            "--model", args.model, "--size", str(args.size), "--steps", str(args.steps),
+            "--guidance-scale", str(args.guidance_scale), "--seed", str(args.seed),
+            "--images", str(args.images), "--image-path", image_path,
+        ]
+        print(f"{name}: running", file=sys.stderr)
+        completed = subprocess.run(command, env={**os.environ, **CONFIGS[name]}, capture_output=True, text=True)
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1:] or ["failed"]
+            results[name] = {"error": error[0]}
+            print(f"{name}: {error[0]}", file=sys.stderr)
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result["image_path"] = image_path
+        results[name] = result
+        print(f"{name}: {result['seconds_per_image']:.2f} s/image, peak RSS {result['peak_rss_mb']:.0f} MB",
+              file=sys.stderr)
+
+    reference = results.get("baseline", {}).get("image_path")
+    for name, result in results.items():
+        if reference and "image_path" in result:
+            result["vs_baseline"] = image_difference(result["image_path"], reference)
+
+    report = {
+        "meta": {
+            "model": args.model,
+            "size": args.size,
+            "steps": args.steps,
+            "guidance_scale": args.guidance_scale,
+            "seed": args.seed,
+            "images": args.images,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    print(f"\n{'config':<14} {'s/image':>9} {'speedup':>8} {'peak MB':>9} {'PSNR dB':>8}", file=sys.stderr)
+    base = results.get("baseline", {}).get("seconds_per_image")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<14} {'error':>9}", file=sys.stderr)
+            continue
+        speedup = f"{base / result['seconds_per_image']:.2f}x" if base else "-"
+        psnr = result.get("vs_baseline", {}).get("psnr_db")
+        print(f"{name:<14} {result['seconds_per_image']:>9.2f} {speedup:>8} {result['peak_rss_mb']:>9.0f} "
+              f"{psnr if psnr is not None else '-':>8}", file=sys.stderr)
+    return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--configs", default="baseline,channels_last,bf16,compile,openvino,onnx")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "stabilityai/stable-diffusion-xl-base-1.0"))
+    parser.add_argument("--size", type=int, default=512, help="Width and height; 512 keeps CPU runs short")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--guidance-scale", type=float, default=7.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", type=int, default=3, help="Timed images after one warm-up image")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--image-path", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    sys.exit(run_child(arguments) if arguments.child else run(arguments))
@@ -1,146 +1,834 @@
 """
 Text to Image Service using Stable Diffusion XL
+Also serves img2img and inpainting from the same loaded components (UNet, VAE,
+text encoders), so a node needs one copy of the weights for all three.
 """
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from diffusers import StableDiffusionXLPipeline
+from fastapi.responses import StreamingResponse
+from diffusers import (
+    AutoencoderTiny,
+    DPMSolverMultistepScheduler,
+    EulerAncestralDiscreteScheduler,
+    LCMScheduler,
+    StableDiffusionXLImg2ImgPipeline,
+    StableDiffusionXLInpaintPipeline,
+    StableDiffusionXLPipeline,
+)
+from PIL import Image, ImageOps
+from typing import Optional
 import torch
 import os
+import sys
+import json
 import logging
+import secrets
 import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from io import BytesIO
 import base64
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # services/, for shared/ outside Docker
+from shared.inference import DeadlineExceededError, InferenceExecutor, QueueFullError, WaitTimes
+from shared.lifecycle import ManagedModel
+from shared.startup import ModelStartup
+from shared.image_source import fetch_image, source_cache
+from shared.output_cache import OutputCache, cache_key
+from shared.diffusion_backend import DIFFUSION_BACKEND, Backend, derive_pipeline, inference_context, load_pipeline
+from shared.image_output import (
+    OutputOptions,
+    encode_image_async,
+    image_response,
+    reencode_png_async,
+    validate_output_options,
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Text to Image Service")
 
-# Initialize SDXL model
+# Initialize SDXL model; the img2img and inpaint pipelines are views over its components
+# Set while the model is loaded through sdxl_model; cleared when it is evicted after MODEL_IDLE_SECONDS
 sdxl_pipeline = None
-model_loading = True
-model_load_error = None
+img2img_pipeline = None
+inpaint_pipeline = None
 MODEL_NAME = os.getenv("MODEL_NAME", "stabilityai/stable-diffusion-xl-base-1.0")
 
+# Micro-batching: compatible requests arriving within the window share one denoising pass
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "4"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "25"))
+
+# Few-step sampling: LCM-LoRA adapter for the "draft" tier (empty = draft uses Euler-A instead)
+LCM_LORA = os.getenv("LCM_LORA", "")
+# Progressive previews: "latent" = linear latent-to-RGB approximation, or an AutoencoderTiny id (e.g. madebyollin/taesdxl)
+PREVIEW_DECODER = os.getenv("PREVIEW_DECODER", "latent")
+PREVIEW_EVERY_STEPS = int(os.getenv("PREVIEW_EVERY_STEPS", "2"))
+
+# Text-encoder outputs for recently seen prompts; 0 disables the cache
+PROMPT_CACHE_MB = float(os.getenv("PROMPT_CACHE_MB", "256"))
+
+# Scheduler name -> scheduler instance, built from the model's own scheduler config once it has loaded.
+# These and the backend outlive an eviction, so requests are still validated while the model is unloaded.
+schedulers = {}
+lcm_loaded = False
+preview_decoder = None
+backend: Optional[Backend] = None
+
+SCHEDULER_NAMES = ("default", "dpmpp", "euler_a", "lcm")  # What build_schedulers builds; lcm needs LCM-LoRA on torch
+
+def scheduler_names() -> tuple:
+    """Usable scheduler names: the loaded ones, or before the first load the ones the configuration will give,
+    so requests (and their output-cache keys) resolve the same way before and after loading"""
+    if schedulers:
+        return tuple(schedulers)
+    if LCM_LORA and DIFFUSION_BACKEND == "torch":
+        return SCHEDULER_NAMES
+    return tuple(name for name in SCHEDULER_NAMES if name != "lcm")
+
+def build_schedulers(pipeline) -> dict:
+    config = pipeline.scheduler.config
+    return {
+        "default": pipeline.scheduler,
+        "dpmpp": DPMSolverMultistepScheduler.from_config(config, algorithm_type="dpmsolver++", use_karras_sigmas=True),
+        "euler_a": EulerAncestralDiscreteScheduler.from_config(config),
+        "lcm": LCMScheduler.from_config(config),
+    }
+
 def load_model():
-    global sdxl_pipeline, model_loading, model_load_error
-    try:
-        logger.info(f"Loading SDXL model: {MODEL_NAME}")
-        # Use CPU if no GPU available
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {device}")
-        
-        sdxl_pipeline = StableDiffusionXLPipeline.from_pretrained(
-            MODEL_NAME,
-            torch_dtype=torch.float16 if device == "cuda" else torch.float32,
-            use_safetensors=True,
-        )
-        sdxl_pipeline = sdxl_pipeline.to(device)
-        
-        if device == "cpu":
-            # Enable CPU optimizations
-            sdxl_pipeline.enable_attention_slicing()
-        
-        logger.info("✅ SDXL model loaded successfully")
-        model_loading = False
-        model_load_error = None
-    except Exception as e:
-        logger.error(f"❌ Failed to load SDXL model: {e}")
-        sdxl_pipeline = None
-        model_loading = False
-        model_load_error = str(e)
+    """Loads SDXL and everything built on it; runs through sdxl_model, which times it and records failures"""
+    global sdxl_pipeline, img2img_pipeline, inpaint_pipeline, schedulers, lcm_loaded, preview_decoder, backend
+    logger.info(f"Loading SDXL model: {MODEL_NAME}")
+    with sdxl_model.step("pipeline"):
+        # Uses CUDA when available; CPU optimizations depend on the configured backend
+        pipeline, backend = load_pipeline(StableDiffusionXLPipeline, MODEL_NAME)
+    logger.info(f"Using backend: {backend.describe()}")
+    
+    loaded_schedulers = build_schedulers(pipeline)
+    lora = False
+    if LCM_LORA and backend.is_torch:
+        with sdxl_model.step("lcm_lora"):
+            try:
+                pipeline.load_lora_weights(LCM_LORA, adapter_name="lcm")
+                pipeline.disable_lora()  # Only enabled for batches sampled with the LCM scheduler
+                lora = True
+                logger.info(f"Loaded LCM-LoRA: {LCM_LORA}")
+            except Exception as e:
+                logger.warning(f"LCM-LoRA unavailable, draft quality falls back to Euler-A: {e}")
+    if not lora:
+        loaded_schedulers.pop("lcm")
+    
+    if PREVIEW_DECODER != "latent" and backend.is_torch:
+        with sdxl_model.step("preview_decoder"):
+            try:
+                preview_decoder = AutoencoderTiny.from_pretrained(
+                    PREVIEW_DECODER, torch_dtype=backend.dtype
+                ).to(backend.device)
+            except Exception as e:
+                logger.warning(f"Preview decoder unavailable, using latent approximation: {e}")
+    
+    with sdxl_model.step("derived_pipelines"):
+        # from_pipe shares every component module; nothing is copied or loaded again
+        img2img_pipeline = derive_pipeline(pipeline, StableDiffusionXLImg2ImgPipeline, backend, "img2img")
+        inpaint_pipeline = derive_pipeline(pipeline, StableDiffusionXLInpaintPipeline, backend, "inpaint")
+    
+    schedulers, lcm_loaded = loaded_schedulers, lora
+    sdxl_pipeline = pipeline
+    return pipeline
 
-# Load model in background thread to avoid blocking
-import threading
-loading_thread = threading.Thread(target=load_model, daemon=True)
-loading_thread.start()
+def unload_model(pipeline) -> None:
+    """Drops every other reference to the model's tensors, including cached prompt embeddings"""
+    global sdxl_pipeline, img2img_pipeline, inpaint_pipeline, preview_decoder
+    sdxl_pipeline = img2img_pipeline = inpaint_pipeline = preview_decoder = None
+    prompt_cache.clear()
 
-class T2IRequest(BaseModel):
+sdxl_model = ManagedModel("sdxl", load_model, unload_model)
+
+def component_memory() -> dict:
+    """Parameter and buffer bytes of each loaded model component, counted once however many pipelines use it"""
+    components = dict(getattr(sdxl_pipeline, "components", {}))
+    if preview_decoder is not None:
+        components["preview_decoder"] = preview_decoder
+    report = {}
+    for name, module in components.items():
+        if not isinstance(module, torch.nn.Module):
+            continue
+        tensors = list(module.parameters()) + list(module.buffers())
+        size = sum(t.nelement() * t.element_size() for t in tensors)
+        report[name] = {
+            "class": type(module).__name__,
+            "mb": round(size / 1024 / 1024, 1),
+            "dtype": str(tensors[0].dtype).replace("torch.", "") if tensors else None,
+            "device": str(tensors[0].device) if tensors else None,
+        }
+    return report
+
+# Quality tier -> (scheduler, steps, guidance scale); None means the request's own value
+QUALITY_TIERS = {
+    "draft": ("lcm", 4, 1.0),
+    "fast": ("dpmpp", 20, None),
+    "standard": ("default", None, None),
+}
+DRAFT_FALLBACK = ("euler_a", 12, None)  # Without LCM weights, few-step sampling gives noise
+DEFAULT_STEPS = 30
+DEFAULT_GUIDANCE_SCALE = 7.5
+
+class T2IRequest(OutputOptions):
     prompt: str
+    negative_prompt: Optional[str] = None
+    seed: Optional[int] = None  # Same seed and parameters give the same image; seeded results are cached
     style: str = "realistic"
     size: str = "1024x1024"
-    num_inference_steps: int = 30
-    guidance_scale: float = 7.5
+    quality: str = "standard"  # draft, fast or standard
+    scheduler: Optional[str] = None  # Overrides the tier's scheduler: default, dpmpp, euler_a, lcm
+    num_inference_steps: Optional[int] = None  # Tier default; 30 for standard
+    guidance_scale: Optional[float] = None  # Tier default; 7.5 except LCM
+
+def resolve_sampling(request: T2IRequest) -> tuple:
+    """(scheduler, steps, guidance_scale) for a request, from its quality tier and overrides"""
+    if request.quality not in QUALITY_TIERS:
+        raise HTTPException(status_code=400, detail=f"quality must be one of {', '.join(QUALITY_TIERS)}")
+    scheduler, steps, guidance_scale = QUALITY_TIERS[request.quality]
+    available = scheduler_names()
+    if scheduler not in available:
+        scheduler, steps, guidance_scale = DRAFT_FALLBACK
+    if request.scheduler:
+        if request.scheduler not in available:
+            raise HTTPException(status_code=400, detail=f"scheduler must be one of {', '.join(available)}")
+        scheduler = request.scheduler
+    steps = request.num_inference_steps or steps or DEFAULT_STEPS
+    if request.guidance_scale is not None:
+        guidance_scale = request.guidance_scale
+    elif guidance_scale is None:
+        guidance_scale = 1.0 if scheduler == "lcm" else DEFAULT_GUIDANCE_SCALE
+    return scheduler, steps, guidance_scale
+
+# SDXL latent channels -> RGB, a linear fit of the VAE decoder that is good enough for previews
+LATENT_RGB_FACTORS = torch.tensor([
+    [0.3651, 0.4232, 0.4341],
+    [-0.2533, -0.0042, 0.1068],
+    [0.1076, 0.1111, -0.0362],
+    [-0.3165, -0.2492, -0.2188],
+])
+LATENT_RGB_BIAS = torch.tensor([0.1084, -0.0175, -0.0011])
+
+def preview_image(latents: torch.Tensor) -> Image.Image:
+    """Cheap decode of one image's intermediate latents (4, h, w); 1/8 of the final size with the linear fit"""
+    with torch.no_grad():
+        if preview_decoder is not None:
+            rgb = preview_decoder.decode(latents[None].to(preview_decoder.dtype)).sample[0].permute(1, 2, 0)
+        else:
+            rgb = latents.float().permute(1, 2, 0).cpu() @ LATENT_RGB_FACTORS + LATENT_RGB_BIAS
+        pixels = ((rgb.float().clamp(-1, 1) + 1) * 127.5).to(torch.uint8).cpu().numpy()
+    return Image.fromarray(pixels)
+
+def image_data_url(image: Image.Image, format: str = "PNG", **options) -> str:
+    buffer = BytesIO()
+    image.save(buffer, format=format, **options)
+    return f"data:image/{format.lower()};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+class PromptEmbeddingCache:
+    """LRU cache of SDXL text-encoder outputs, bounded by tensor bytes.
+
+    Entries are the four encode_prompt outputs (prompt, negative, pooled prompt,
+    pooled negative), keyed by model, prompt, negative prompt and whether
+    classifier-free guidance is on (without it, no negative embeddings are computed).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(embeddings: tuple) -> int:
+        return sum(t.element_size() * t.nelement() for t in embeddings if t is not None)
+
+    def get(self, pipeline, prompt: str, negative_prompt: Optional[str], guided: bool) -> tuple:
+        key = (MODEL_NAME, prompt, negative_prompt or "", guided)
+        with self._lock:
+            embeddings = self.entries.get(key)
+            if embeddings is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return embeddings
+            self.misses += 1
+
+        with torch.no_grad():
+            embeddings = pipeline.encode_prompt(
+                prompt=prompt,
+                device=pipeline._execution_device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=guided,
+                negative_prompt=negative_prompt,
+            )
+        size = self._size(embeddings)
+        if size <= self.max_bytes:
+            with self._lock:
+                if key not in self.entries:
+                    self.entries[key] = embeddings
+                    self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.bytes -= self._size(evicted)
+        return embeddings
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+prompt_cache = PromptEmbeddingCache(int(PROMPT_CACHE_MB * 1024 * 1024))
+
+PROMPT_EMBEDDING_ARGUMENTS = (
+    "prompt_embeds",
+    "negative_prompt_embeds",
+    "pooled_prompt_embeds",
+    "negative_pooled_prompt_embeds",
+)
+
+def prompt_arguments(prompts: list, guidance_scale: float) -> dict:
+    """Pipeline prompt arguments for a batch of (prompt, negative_prompt) pairs.
+
+    On the torch backend these are cached embeddings concatenated along the batch;
+    exported backends get the text, since their encoders are not torch modules.
+    """
+    if not backend.is_torch:
+        negatives = [negative for _, negative in prompts]
+        return {
+            "prompt": [prompt for prompt, _ in prompts],
+            "negative_prompt": None if all(n is None for n in negatives) else [n or "" for n in negatives],
+        }
+    guided = guidance_scale > 1 and getattr(sdxl_pipeline.unet.config, "time_cond_proj_dim", None) is None
+    embeddings = [prompt_cache.get(sdxl_pipeline, prompt, negative, guided) for prompt, negative in prompts]
+    return {
+        name: torch.cat([e[i] for e in embeddings]) if embeddings[0][i] is not None else None
+        for i, name in enumerate(PROMPT_EMBEDDING_ARGUMENTS)
+    }
+
+output_cache = OutputCache()
+
+@dataclass
+class GenerationParams:
+    prompt: str  # With the style suffix
+    negative_prompt: Optional[str]
+    width: int
+    height: int
+    steps: int
+    guidance_scale: float
+    scheduler: str
+    seed: int
+    seeded: bool  # Seed came from the request; unseeded output is random, so it is never cached
+
+    @property
+    def batch_key(self) -> tuple:
+        """Only requests with equal keys share a batch; prompts and seeds vary per image"""
+        return (self.width, self.height, self.steps, self.guidance_scale, self.scheduler)
+
+    @property
+    def cache_key(self) -> Optional[str]:
+        if not self.seeded:
+            return None
+        return cache_key(
+            mode="txt2img",
+            model=MODEL_NAME,
+            lora=LCM_LORA if self.scheduler == "lcm" else None,
+            prompt=self.prompt,
+            negative_prompt=self.negative_prompt,
+            seed=self.seed,
+            width=self.width,
+            height=self.height,
+            steps=self.steps,
+            guidance_scale=self.guidance_scale,
+            scheduler=self.scheduler,
+        )
+
+    def sampling(self) -> dict:
+        return {
+            "scheduler": self.scheduler,
+            "num_inference_steps": self.steps,
+            "guidance_scale": self.guidance_scale,
+            "seed": self.seed,
+        }
+
+@dataclass
+class PendingGeneration:
+    params: GenerationParams
+    future: asyncio.Future
+    previews: Optional[asyncio.Queue] = None  # Set for streaming requests
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+class GenerationBatcher:
+    """Collects compatible generate requests and runs them as one batched pipeline call.
+
+    While the pipeline is busy, new requests queue up and go out together in the next
+    batch; an idle batcher waits at most BATCH_WINDOW_MS for company before dispatching.
+    Queue bound and deadlines apply per request, so batches run on the executor without one.
+    """
+
+    def __init__(self, executor: InferenceExecutor, max_batch_size: int, window_seconds: float):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = max(0.0, window_seconds)
+        self.pending = []
+        self.batches_run = 0
+        self.images_generated = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_times = WaitTimes()
+        self._wakeup = None
+        self._worker = None
+        self._loop = None
+
+    def enqueue(self, params: GenerationParams, previews: Optional[asyncio.Queue] = None) -> PendingGeneration:
+        """Queue a request, or raise QueueFullError straight away"""
+        if len(self.pending) >= self.executor.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.executor.name)
+        self._loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = self._loop.create_task(self._run())
+        pending = PendingGeneration(params=params, future=self._loop.create_future(), previews=previews)
+        self.pending.append(pending)
+        self._wakeup.set()
+        return pending
+
+    async def result(self, pending: PendingGeneration):
+        """(image, batch_size) for a queued request"""
+        timeout = self.executor.timeout
+        try:
+            # On timeout the future is cancelled, which drops the request if its batch has not started
+            return await asyncio.wait_for(pending.future, timeout or None)
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise DeadlineExceededError(self.executor.name, timeout)
+
+    def _take_batch(self) -> list:
+        """Oldest request plus every queued request with the same key, up to the batch size"""
+        key = self.pending[0].params.batch_key
+        batch = [p for p in self.pending if p.params.batch_key == key][:self.max_batch_size]
+        taken = set(map(id, batch))
+        self.pending = [p for p in self.pending if id(p) not in taken]
+        return batch
+
+    def _compatible_waiting(self) -> int:
+        key = self.pending[0].params.batch_key
+        return sum(1 for p in self.pending if p.params.batch_key == key)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.pending:
+                if self.window_seconds and self._compatible_waiting() < self.max_batch_size:
+                    await asyncio.sleep(self.window_seconds)
+                batch = [p for p in self._take_batch() if not p.future.done()]
+                if not batch:
+                    continue
+                started = time.monotonic()
+                for p in batch:
+                    self.wait_times.add(started - p.enqueued_at)
+                try:
+                    images = await self.executor.run(self._generate, batch, timeout=0)
+                except Exception as e:
+                    for p in batch:
+                        if not p.future.done():
+                            p.future.set_exception(e)
+                    continue
+                self.batches_run += 1
+                self.images_generated += len(images)
+                for p, image in zip(batch, images):
+                    if not p.future.done():
+                        p.future.set_result((image, len(batch)))
+
+    def _preview_callback(self, batch: list, steps: int):
+        """callback_on_step_end that pushes decoded previews to the batch members that asked for them"""
+        def callback(pipeline, step, timestep, callback_kwargs):
+            step += 1
+            if step % PREVIEW_EVERY_STEPS == 0 and step < steps:
+                latents = callback_kwargs["latents"]
+                for i, p in enumerate(batch):
+                    if p.previews is None or p.future.done():
+                        continue
+                    event = {
+                        "step": step,
+                        "total_steps": steps,
+                        "image_url": image_data_url(preview_image(latents[i]), "JPEG", quality=70),
+                    }
+                    self._loop.call_soon_threadsafe(p.previews.put_nowait, event)
+            return callback_kwargs
+        return callback
+
+    def _generate(self, batch: list) -> list:
+        """Runs on the inference worker, so switching the shared scheduler and adapters here is safe"""
+        width, height, steps, guidance_scale, scheduler = batch[0].params.batch_key
+        logger.info(f"Generating batch of {len(batch)} at {width}x{height}, {steps} steps ({scheduler})")
+        with sdxl_model.use() as pipeline:
+            pipeline.scheduler = schedulers[scheduler]
+            if lcm_loaded:
+                if scheduler == "lcm":
+                    pipeline.enable_lora()
+                else:
+                    pipeline.disable_lora()
+            wants_previews = backend.is_torch and any(p.previews is not None for p in batch)
+            with inference_context(backend):
+                return pipeline(
+                    **prompt_arguments([(p.params.prompt, p.params.negative_prompt) for p in batch], guidance_scale),
+                    width=width,
+                    height=height,
+                    num_inference_steps=steps,
+                    guidance_scale=guidance_scale,
+                    # One CPU generator per image: its output depends only on its own seed, not on the batch or device
+                    generator=[torch.Generator(device="cpu").manual_seed(p.params.seed) for p in batch],
+                    callback_on_step_end=self._preview_callback(batch, steps) if wants_previews else None,
+                ).images
+
+    def stats(self) -> dict:
+        return {
+            **self.executor.stats(),
+            "queue_depth": len(self.pending),
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "wait_seconds": self.wait_times.summary(),
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window_seconds * 1000,
+            "batches_run": self.batches_run,
+            "images_generated": self.images_generated,
+        }
+
+# The pipeline is not safe to call concurrently: one worker, one batch at a time
+batcher = GenerationBatcher(InferenceExecutor("sdxl"), MAX_BATCH_SIZE, BATCH_WINDOW_MS / 1000)
+
+def warm_up(pipeline) -> None:
+    """One short generation at the default size: pays for allocator growth, kernel selection and,
+    with TORCH_COMPILE, compilation before the server reports ready"""
+    pipeline.scheduler = schedulers["default"]
+    with inference_context(backend):
+        pipeline(
+            **prompt_arguments([("warm-up", None)], DEFAULT_GUIDANCE_SCALE),
+            width=1024,
+            height=1024,
+            num_inference_steps=2,
+            guidance_scale=DEFAULT_GUIDANCE_SCALE,
+        )
+
+# Loads in the background once the server is listening; /health/ready turns 200 after the warm-up
+startup = ModelStartup(sdxl_model, batcher.executor, warm_up)
+startup.install(app)
 
 @app.get("/health")
 async def health():
-    if model_loading:
+    if not sdxl_model.loads and sdxl_model.state != "failed":
         return {
             "status": "loading",
             "model": MODEL_NAME,
             "device": "cuda" if torch.cuda.is_available() else "cpu",
-            "message": "Model is still loading, please wait..."
+            "message": "Model is still loading, please wait...",
+            "lifecycle": sdxl_model.stats(),
+            "startup": startup.stats(),
         }
-    elif sdxl_pipeline:
-        return {
-            "status": "healthy",
-            "model": MODEL_NAME,
-            "device": "cuda" if torch.cuda.is_available() else "cpu",
-        }
-    else:
+    elif sdxl_model.state == "failed":
         return {
             "status": "unhealthy",
             "model": MODEL_NAME,
             "device": "cuda" if torch.cuda.is_available() else "cpu",
-            "error": model_load_error or "Model failed to load",
+            "error": sdxl_model.error or "Model failed to load",
+            "lifecycle": sdxl_model.stats(),
+            "startup": startup.stats(),
         }
+    # Loaded, or evicted while idle (reloaded by the next request)
+    memory = component_memory()
+    return {
+        "status": "healthy",
+        "model": MODEL_NAME,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "backend": backend.describe() if backend else None,
+        "lifecycle": sdxl_model.stats(),
+        "startup": startup.stats(),
+        "schedulers": list(schedulers),
+        "quality_tiers": list(QUALITY_TIERS),
+        "lcm_available": lcm_loaded,
+        "inference": batcher.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "output_cache": output_cache.stats(),
+        "source_cache": source_cache.stats(),
+        "pipelines": [name for name, pipeline in (
+            ("txt2img", sdxl_pipeline), ("img2img", img2img_pipeline), ("inpaint", inpaint_pipeline)
+        ) if pipeline is not None],
+        "components": memory,
+        "components_mb": round(sum(c["mb"] for c in memory.values()), 1),
+        **({"cuda_allocated_mb": round(torch.cuda.memory_allocated() / 1024 / 1024, 1)}
+           if torch.cuda.is_available() else {}),
+    }
+
+# Enhance prompt with style
+STYLE_MAP = {
+    "realistic": "photorealistic, professional photography style",
+    "artistic": "artistic, creative, visually striking",
+    "cartoon": "cartoon style, animated, colorful",
+    "minimalist": "minimalist, clean, simple design",
+    "vintage": "vintage style, retro aesthetic",
+    "modern": "modern, contemporary design",
+}
+
+def generation_params(request: T2IRequest) -> GenerationParams:
+    validate_output_options(request)
+    try:
+        width, height = map(int, request.size.split('x'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="size must look like 1024x1024")
+    scheduler, steps, guidance_scale = resolve_sampling(request)
+    return GenerationParams(
+        prompt=f"{request.prompt}, {STYLE_MAP.get(request.style, request.style)} style",
+        negative_prompt=request.negative_prompt,
+        width=width,
+        height=height,
+        steps=steps,
+        guidance_scale=guidance_scale,
+        scheduler=scheduler,
+        seed=request.seed if request.seed is not None else secrets.randbits(32),
+        seeded=request.seed is not None,
+    )
+
+def generation_fields(params: GenerationParams, generation_time: float, batch_size: int, cached: bool = False) -> dict:
+    return {
+        "revised_prompt": params.prompt,
+        "generation_time": generation_time,
+        "batch_size": batch_size,
+        "cached": cached,
+        **params.sampling(),
+    }
+
+async def cached_generation(params: GenerationParams, options: OutputOptions,
+                            start_time: float) -> Optional[tuple]:
+    """(encoded, fields) from the output cache, or None"""
+    key = params.cache_key
+    if key is None:
+        return None
+    png = await asyncio.to_thread(output_cache.get, key)
+    if png is None:
+        return None
+    logger.info(f"Output cache hit for seed {params.seed}: {params.prompt[:50]}...")
+    encoded = await reencode_png_async(png, options)
+    return encoded, generation_fields(params, time.time() - start_time, batch_size=0, cached=True)
+
+def queue_generation(params: GenerationParams, previews: Optional[asyncio.Queue] = None) -> PendingGeneration:
+    # Only cache misses need the model, so a cached image is still served while it loads
+    sdxl_model.check()
+    logger.info(f"Generating image: {params.prompt[:50]}...")
+    return batcher.enqueue(params, previews)
+
+async def finish_generation(pending: PendingGeneration, options: OutputOptions, start_time: float) -> tuple:
+    """(encoded, fields) once the request's batch has run"""
+    # Generate image (batched with concurrent compatible requests)
+    image, batch_size = await batcher.result(pending)
+    
+    generation_time = time.time() - start_time
+    logger.info(f"Image generated in {generation_time:.2f}s (batch of {batch_size})")
+    
+    # Encoded off the event loop; seeded results also get a lossless copy for the cache in the same pass
+    key = pending.params.cache_key
+    encoded = await encode_image_async(image, options, master_png=key is not None)
+    if key is not None:
+        await asyncio.to_thread(output_cache.put, key, encoded.master_png)
+    return encoded, generation_fields(pending.params, generation_time, batch_size)
 
 @app.post("/generate")
 async def generate(request: T2IRequest):
-    if not sdxl_pipeline:
-        raise HTTPException(status_code=503, detail="SDXL model not loaded")
-    
+    start_time = time.time()
+    params = generation_params(request)
+    cached = await cached_generation(params, request, start_time)
+    if cached:
+        encoded, fields = cached
+        return image_response(encoded, request, fields)
+    pending = queue_generation(params)
     try:
-        # Enhance prompt with style
-        style_map = {
-            "realistic": "photorealistic, professional photography style",
-            "artistic": "artistic, creative, visually striking",
-            "cartoon": "cartoon style, animated, colorful",
-            "minimalist": "minimalist, clean, simple design",
-            "vintage": "vintage style, retro aesthetic",
-            "modern": "modern, contemporary design",
-        }
-        
-        enhanced_prompt = f"{request.prompt}, {style_map.get(request.style, request.style)} style"
-        
-        # Parse size
-        width, height = map(int, request.size.split('x'))
-        
-        logger.info(f"Generating image: {enhanced_prompt[:50]}...")
+        # In production, upload to Cloudflare R2/S3 and return URL
+        # For now, return base64 data URL (or raw bytes with response_format=binary)
+        encoded, fields = await finish_generation(pending, request, start_time)
+        return image_response(encoded, request, fields)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Image generation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_stream(request: T2IRequest):
+    """Server-sent events: "preview" events with low-resolution intermediate images, then "result" (or "error")"""
+    start_time = time.time()
+    params = generation_params(request)
+    # Events carry JSON, so the result is always a data URL here
+    options = request.model_copy(update={"response_format": "json"})
+    cached = await cached_generation(params, options, start_time)
+    if cached:
+        encoded, fields = cached
+
+        async def cached_event():
+            yield sse("result", image_response(encoded, options, fields))
+        return StreamingResponse(cached_event(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    previews = asyncio.Queue()
+    # Queued before the response starts, so a full queue is still a plain 503
+    pending = queue_generation(params, previews)
+
+    async def events():
+        task = asyncio.create_task(finish_generation(pending, options, start_time))
+        try:
+            while not task.done():
+                next_preview = asyncio.create_task(previews.get())
+                await asyncio.wait({next_preview, task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_preview.done():
+                    yield sse("preview", next_preview.result())
+                else:
+                    next_preview.cancel()
+            try:
+                encoded, fields = task.result()
+                yield sse("result", image_response(encoded, options, fields))
+            except HTTPException as e:
+                yield sse("error", {"status": e.status_code, "detail": e.detail})
+            except Exception as e:
+                logger.error(f"Image generation error: {e}")
+                yield sse("error", {"status": 500, "detail": str(e)})
+        finally:
+            # Client went away: cancelling drops the request if its batch has not started
+            task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# img2img and inpainting run on the same worker as txt2img: the UNet and VAE are shared, so one job at a time.
+# Sources are fitted to the nearest SDXL aspect bucket; an inpainting mask follows its image's bucket.
+
+class I2IRequest(OutputOptions):
+    image_url: str
+    prompt: str
+    negative_prompt: Optional[str] = None
+    strength: float = 0.8
+    num_inference_steps: int = 30
+    guidance_scale: float = 5.0
+    seed: Optional[int] = None  # Same seed, source image and parameters give the same image; seeded results are cached
+
+class InpaintRequest(I2IRequest):
+    mask_url: str  # White pixels are repainted, black pixels are kept
+    strength: float = 0.99
+    guidance_scale: float = 7.5
+
+async def fetch_sources(sources: dict) -> dict:
+    """Fetch every source concurrently; returns pipeline argument -> SourceImage, all at the "image" size"""
+    fetched = await asyncio.gather(*(fetch_image(url, image_mode) for url, image_mode in sources.values()))
+    fetched = dict(zip(sources, fetched))
+    size = fetched["image"].image.size
+    for name, source in fetched.items():
+        if source.image.size != size:
+            fetched[name] = source._replace(image=ImageOps.fit(source.image, size, method=Image.LANCZOS))
+    return fetched
+
+def run_edit(mode: str, request: I2IRequest, seed: int, **images) -> Image.Image:
+    """Runs on the SDXL worker. The LCM adapter lives in the shared UNet, so it is switched off first"""
+    with sdxl_model.use() as txt2img:
+        pipeline = img2img_pipeline if mode == "img2img" else inpaint_pipeline
+        if pipeline is None:
+            raise HTTPException(status_code=501, detail=f"{mode} is not available on the {backend.name} backend")
+        if lcm_loaded:
+            txt2img.disable_lora()
+        with inference_context(backend):
+            return pipeline(
+                **prompt_arguments([(request.prompt, request.negative_prompt)], request.guidance_scale),
+                strength=request.strength,
+                num_inference_steps=request.num_inference_steps,
+                guidance_scale=request.guidance_scale,
+                generator=torch.Generator(device="cpu").manual_seed(seed),
+                **images,
+            ).images[0]
+
+async def edit_image(mode: str, request: I2IRequest, sources: dict):
+    """Shared body of /img2img and /inpaint; sources maps pipeline argument -> (url, PIL mode)"""
+    validate_output_options(request)
+    try:
+        fetched = await fetch_sources(sources)
+        size = fetched["image"].image.size
         start_time = time.time()
-        
-        # Generate image
-        image = sdxl_pipeline(
-            prompt=enhanced_prompt,
-            width=width,
-            height=height,
-            num_inference_steps=request.num_inference_steps,
-            guidance_scale=request.guidance_scale,
-        ).images[0]
-        
+        seed = request.seed if request.seed is not None else secrets.randbits(32)
+        key = None
+        if request.seed is not None:
+            # Keyed by source content, not URL, so a changed image at the same URL is a miss
+            key = cache_key(
+                mode=mode,
+                model=MODEL_NAME,
+                prompt=request.prompt,
+                negative_prompt=request.negative_prompt,
+                seed=seed,
+                strength=request.strength,
+                steps=request.num_inference_steps,
+                guidance_scale=request.guidance_scale,
+                size=size,
+                **{f"{name}_sha256": source.sha256 for name, source in fetched.items()},
+            )
+            cached = await asyncio.to_thread(output_cache.get, key)
+            if cached is not None:
+                logger.info(f"Output cache hit for seed {seed}: {request.prompt[:50]}...")
+                encoded = await reencode_png_async(cached, request)
+                return image_response(encoded, request, {
+                    "generation_time": time.time() - start_time,
+                    "seed": seed,
+                    "size": f"{size[0]}x{size[1]}",
+                    "cached": True,
+                })
+
+        sdxl_model.check()  # Only after a cache miss, as in queue_generation
+        images = {name: source.image for name, source in fetched.items()}
+        logger.info(f"{mode} at {size[0]}x{size[1]}: {request.prompt[:50]}...")
+        result_image = await batcher.executor.run(run_edit, mode, request, seed, **images)
         generation_time = time.time() - start_time
-        logger.info(f"Image generated in {generation_time:.2f}s")
-        
-        # Convert to base64 (in production, upload to storage)
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        image_bytes = buffer.getvalue()
-        image_base64 = base64.b64encode(image_bytes).decode()
-        
-        # In production, upload to Cloudflare R2/S3 and return URL
-        # For now, return base64 data URL
-        image_url = f"data:image/png;base64,{image_base64}"
-        
-        return {
-            "image_url": image_url,
-            "revised_prompt": enhanced_prompt,
+        logger.info(f"{mode} finished in {generation_time:.2f}s")
+
+        encoded = await encode_image_async(result_image, request, master_png=key is not None)
+        if key is not None:
+            await asyncio.to_thread(output_cache.put, key, encoded.master_png)
+        return image_response(encoded, request, {
             "generation_time": generation_time,
-        }
+            "seed": seed,
+            "size": f"{size[0]}x{size[1]}",
+            "cached": False,
+        })
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Image generation error: {e}")
+        logger.error(f"{mode} error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/img2img")
+async def img2img(request: I2IRequest):
+    return await edit_image("img2img", request, {"image": (request.image_url, "RGB")})
+
+@app.post("/inpaint")
+async def inpaint(request: InpaintRequest):
+    return await edit_image("inpaint", request, {
+        "image": (request.image_url, "RGB"),
+        "mask_image": (request.mask_url, "L"),
+    })
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=7860)
@@ -1,58 +1,151 @@
 """
 Text to Speech Service using Coqui TTS
+/synthesize returns a whole WAV; /synthesize/stream (chunked HTTP or WebSocket)
+sends audio sentence by sentence as it is generated, using XTTS streaming
+inference when the model supports it.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+import io
 import os
+import re
+import sys
 import time
+import uuid
+import struct
+import asyncio
 import logging
 import base64
+import wave
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # services/, for shared/ outside Docker
+from shared.inference import InferenceExecutor, WaitTimes
+from shared.lifecycle import ManagedModel
+from shared.startup import ModelStartup
+from shared.fetch import check_length, read_body
+from shared.voice_registry import VOICE_MAX_BYTES, VoiceRegistry, validate_voice_id
 
 # Accept Coqui/XTTS terms so model loads in Docker (no interactive prompt)
 os.environ["COQUI_TOS_AGREED"] = "1"
 
-from TTS.api import TTS
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Text to Speech Service")
 
-# Initialize TTS model
-tts_model = None
+# TTS model, loaded on demand and evicted when idle
 MODEL_NAME = os.getenv("MODEL_NAME", "tts_models/multilingual/multi-dataset/xtts_v2")
 
-try:
+def load_tts():
     logger.info(f"Loading TTS model: {MODEL_NAME}")
-    tts_model = TTS(model_name=MODEL_NAME, progress_bar=False)
-    logger.info("✅ TTS model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Failed to load TTS model: {e}")
-    tts_model = None
+    with tts_model.step("import"):
+        from TTS.api import TTS
+    with tts_model.step("model"):
+        return TTS(model_name=MODEL_NAME, progress_bar=False)
+
+def warm_up(model) -> None:
+    # XTTS needs a speaker; its built-in ones avoid shipping a reference clip just for this
+    speakers = getattr(model, "speakers", None)
+    model.tts(
+        text="Warm-up.",
+        language="en" if model.is_multi_lingual else None,
+        speaker=speakers[0] if speakers else None,
+    )
+
+tts_model = ManagedModel("tts", load_tts)
+inference = InferenceExecutor("tts")
+
+# Loads in the background once the server is listening; /health/ready turns 200 after the warm-up
+startup = ModelStartup(tts_model, inference, warm_up)
+startup.install(app)
+
+# Named voices: XTTS speaker conditioning computed once per voice, then reused from memory or disk
+voices = VoiceRegistry()
+
+def synthesize_file(**arguments) -> None:
+    with tts_model.use() as model:
+        model.tts_to_file(**arguments)
+
+def require_xtts(model):
+    xtts = xtts_of(model)
+    if xtts is None:
+        raise HTTPException(status_code=501, detail=f"Registered voices need an XTTS model, not {MODEL_NAME}")
+    return xtts
+
+def wav_bytes(pcm: bytes, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+    return buffer.getvalue()
+
+def synthesize_voice(text: str, language: str, voice_id: str, speed: float) -> tuple:
+    """(WAV bytes, seconds) in a registered voice: cached latents, no conditioning pass and no temp file"""
+    with tts_model.use() as model:
+        xtts = require_xtts(model)
+        gpt_cond_latent, speaker_embedding = voices.latents(voice_id, xtts, MODEL_NAME)
+        pcm = b"".join(
+            pcm16(xtts.inference(sentence, language, gpt_cond_latent, speaker_embedding, speed=speed)["wav"])
+            for sentence in split_sentences(text)
+        )
+        sample_rate = model.synthesizer.output_sample_rate
+        return wav_bytes(pcm, sample_rate), len(pcm) / 2 / sample_rate
+
+def register_voice_on_worker(voice_id: str, reference: bytes, name: str | None) -> dict:
+    with tts_model.use() as model:
+        return voices.register(voice_id, reference, require_xtts(model), MODEL_NAME, name)
 
 class TTSRequest(BaseModel):
     text: str
     language: str = "en"
     voice: str | None = None  # optional; None or "" = use default speaker
+    voice_id: str | None = None  # A voice registered with POST /voices/{voice_id}; takes precedence over voice
     speed: float = 1.0
 
+def check_voice(request: TTSRequest) -> None:
+    if request.voice_id and not voices.exists(request.voice_id):
+        raise HTTPException(status_code=404, detail=f"Unknown voice_id {request.voice_id}")
+
 @app.get("/health")
 async def health():
     return {
-        "status": "healthy" if tts_model else "unhealthy",
+        "status": "unhealthy" if tts_model.state == "failed" else "healthy",
         "model": MODEL_NAME,
+        "lifecycle": tts_model.stats(),
+        "startup": startup.stats(),
+        "inference": inference.stats(),
+        "voices": voices.stats(),
+        "streaming": {
+            "requests": first_audio.requests,
+            "first_audio_seconds": first_audio.times.summary(),
+        },
     }
 
 @app.post("/synthesize")
 async def synthesize(request: TTSRequest):
-    if not tts_model:
-        raise HTTPException(status_code=503, detail="TTS model not loaded")
+    tts_model.check()
+    check_voice(request)
     
     try:
+        if request.voice_id:
+            audio, seconds = await inference.run(
+                synthesize_voice, request.text, request.language, request.voice_id, request.speed,
+            )
+            return {
+                "audio_base64": base64.b64encode(audio).decode("utf-8"),
+                "duration": seconds,
+            }
+
         # Generate speech
-        output_path = f"/tmp/tts_{int(time.time())}.wav"
-        tts_model.tts_to_file(
+        output_path = f"/tmp/tts_{uuid.uuid4().hex}.wav"
+        await inference.run(
+            synthesize_file,
             text=request.text,
             file_path=output_path,
             language=request.language,
@@ -72,10 +165,289 @@ async def synthesize(request: TTSRequest):
             "audio_base64": audio_base64,
             "duration": len(request.text) * 0.1,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"TTS synthesis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming: text is split into sentences and each one is sent as soon as it is synthesized
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "5000"))
+TTS_SENTENCE_MAX_CHARS = int(os.getenv("TTS_SENTENCE_MAX_CHARS", "250"))  # XTTS quality drops on longer inputs
+TTS_STREAM_CHUNK_TOKENS = int(os.getenv("TTS_STREAM_CHUNK_TOKENS", "20"))  # XTTS tokens per streamed chunk; smaller = earlier first audio
+STREAM_FORMATS = ("wav", "pcm")
+
+# Sentence ends: Latin/Devanagari punctuation before whitespace, CJK punctuation anywhere, line breaks
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+|(?<=[。！？])|\n+")
+
+def split_sentences(text: str, max_chars: int = TTS_SENTENCE_MAX_CHARS) -> list:
+    """Sentences of at most max_chars; longer ones are cut at the last comma or space before the limit"""
+    sentences = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = max(sentence.rfind(separator, 0, max_chars) for separator in (", ", "; ", ": ", " "))
+            cut = cut + 1 if cut > 0 else max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+def pcm16(wav) -> bytes:
+    """Float samples (list, array or tensor) in [-1, 1] -> 16-bit little-endian PCM"""
+    if hasattr(wav, "cpu"):
+        wav = wav.detach().cpu().numpy()
+    samples = np.clip(np.asarray(wav, dtype=np.float32).reshape(-1), -1.0, 1.0)
+    return (samples * 32767).astype("<i2").tobytes()
+
+def wav_header(sample_rate: int) -> bytes:
+    """Header for a mono 16-bit WAV of unknown length; players read until the stream ends"""
+    unknown = 0xFFFFFFFF
+    return (b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", unknown))
+
+def xtts_of(model):
+    """The XTTS model behind a TTS.api.TTS, or None for models without streaming inference"""
+    inner = getattr(getattr(model, "synthesizer", None), "tts_model", None)
+    return inner if hasattr(inner, "inference_stream") else None
+
+def xtts_speaker(xtts, speaker_wav: str | None, voice_id: str | None = None) -> tuple:
+    """(gpt_cond_latent, speaker_embedding) for a registered voice, a reference clip, or the first
+    built-in speaker"""
+    if voice_id:
+        return voices.latents(voice_id, xtts, MODEL_NAME)
+    if speaker_wav:
+        return xtts.get_conditioning_latents(audio_path=[speaker_wav])
+    speakers = getattr(getattr(xtts, "speaker_manager", None), "speakers", None)
+    if not speakers:
+        raise HTTPException(status_code=400, detail="This model needs a voice (speaker_wav) to synthesize")
+    speaker = next(iter(speakers.values()))
+    return speaker["gpt_cond_latent"], speaker["speaker_embedding"]
+
+class AudioStream:
+    """PCM chunks produced on the inference worker and consumed on the event loop"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.sample_rate = None
+        self.cancelled = False  # Set when the client goes away; the worker stops at the next chunk
+        self.audio_bytes = 0
+
+    def put(self, chunk: bytes) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, chunk)
+
+def stream_speech(stream: AudioStream, sentences: list, language: str, speaker_wav: str | None,
+                  voice_id: str | None, speed: float) -> None:
+    """Runs on the inference worker: synthesizes sentence by sentence, pushing audio as it is produced"""
+    with tts_model.use() as model:
+        stream.sample_rate = model.synthesizer.output_sample_rate
+        language = language if model.is_multi_lingual else None
+        xtts = require_xtts(model) if voice_id else xtts_of(model)
+        if xtts is not None:
+            # Conditioning at most once per request, then token-by-token streaming for every sentence
+            gpt_cond_latent, speaker_embedding = xtts_speaker(xtts, speaker_wav, voice_id)
+            for sentence in sentences:
+                for chunk in xtts.inference_stream(
+                    sentence,
+                    language,
+                    gpt_cond_latent,
+                    speaker_embedding,
+                    stream_chunk_size=TTS_STREAM_CHUNK_TOKENS,
+                    speed=speed,
+                ):
+                    if stream.cancelled:
+                        return
+                    stream.put(pcm16(chunk))
+            return
+        for sentence in sentences:
+            if stream.cancelled:
+                return
+            stream.put(pcm16(model.tts(text=sentence, language=language, speaker_wav=speaker_wav, speed=speed)))
+
+class FirstAudio:
+    def __init__(self):
+        self.requests = 0
+        self.times = WaitTimes()  # Request received -> first audio chunk ready
+
+first_audio = FirstAudio()
+
+class SpeechStream:
+    """One streamed synthesis. start() waits for the first chunk, so errors (busy, no voice) can still
+    be reported as an HTTP status and time to first audio is known before anything is sent"""
+
+    def __init__(self, request: TTSRequest):
+        self.request = request
+        self.received = time.perf_counter()
+        self.first_audio_seconds = None
+        self.sentences = split_sentences(request.text)
+        self.stream = None
+        self.job = None
+        self.first = None
+
+    async def start(self) -> None:
+        if not self.sentences:
+            raise HTTPException(status_code=400, detail="text is empty")
+        if len(self.request.text) > TTS_MAX_CHARS:
+            raise HTTPException(status_code=400, detail=f"text is longer than {TTS_MAX_CHARS} characters")
+        check_voice(self.request)
+        self.stream = AudioStream()
+        voice = self.request.voice.strip() if self.request.voice and self.request.voice.strip() else None
+        self.job = asyncio.create_task(inference.run(
+            stream_speech, self.stream, self.sentences, self.request.language, voice, self.request.voice_id,
+            self.request.speed,
+        ))
+        # Chunks are queued before the job's result, so None marks the end of the audio
+        self.job.add_done_callback(lambda _: self.stream.queue.put_nowait(None))
+        self.first = await self.stream.queue.get()
+        if self.first is None:
+            await self.job  # Raises the job's error
+            raise HTTPException(status_code=500, detail="No audio was produced")
+        self.first_audio_seconds = time.perf_counter() - self.received
+        first_audio.requests += 1
+        first_audio.times.add(self.first_audio_seconds)
+
+    async def chunks(self):
+        try:
+            chunk = self.first
+            while chunk is not None:
+                self.stream.audio_bytes += len(chunk)
+                yield chunk
+                chunk = await self.stream.queue.get()
+            await self.job
+            logger.info(f"✅ Streamed {len(self.sentences)} sentences, first audio after {self.first_audio_seconds:.2f}s")
+        finally:
+            self.stream.cancelled = True
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.cancelled = True
+
+    def stats(self) -> dict:
+        return {
+            "sentences": len(self.sentences),
+            "first_audio_seconds": round(self.first_audio_seconds, 3) if self.first_audio_seconds is not None else None,
+            "audio_seconds": round(self.stream.audio_bytes / 2 / self.stream.sample_rate, 3) if self.stream else 0,
+            "seconds": round(time.perf_counter() - self.received, 3),
+        }
+
+class TTSStreamRequest(TTSRequest):
+    format: str = "wav"  # wav (header for an unknown length, then PCM) or pcm (raw 16-bit mono)
+
+@app.post("/synthesize/stream")
+async def synthesize_stream(request: TTSStreamRequest):
+    """Chunked audio as it is generated; the response starts once the first sentence's first chunk is ready"""
+    tts_model.check()
+    if request.format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+
+    speech = SpeechStream(request)
+    try:
+        await speech.start()
+    except HTTPException:
+        speech.close()
+        raise
+    except Exception as e:
+        speech.close()
+        logger.error(f"TTS streaming error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    sample_rate = speech.stream.sample_rate
+
+    async def body():
+        if request.format == "wav":
+            yield wav_header(sample_rate)
+        async for chunk in speech.chunks():
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="audio/wav" if request.format == "wav" else f"audio/L16;rate={sample_rate};channels=1",
+        headers={
+            "X-Sample-Rate": str(sample_rate),
+            "X-Sentences": str(len(speech.sentences)),
+            "X-First-Audio-Seconds": f"{speech.first_audio_seconds:.3f}",
+        },
+    )
+
+@app.websocket("/synthesize/stream")
+async def synthesize_stream_ws(websocket: WebSocket):
+    """One connection, many utterances: each JSON request ({text, language?, voice?, speed?}) is
+    answered with a "start" message, binary 16-bit mono PCM chunks, then an "end" message"""
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = TTSRequest(**await websocket.receive_json())
+                tts_model.check()
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+                continue
+            except (ValueError, TypeError, KeyError) as e:
+                await websocket.send_json({"type": "error", "status": 400, "detail": f"Expected a JSON request: {e}"})
+                continue
+
+            speech = SpeechStream(request)
+            try:
+                await speech.start()
+                await websocket.send_json({
+                    "type": "start",
+                    "sample_rate": speech.stream.sample_rate,
+                    "sentences": len(speech.sentences),
+                    "first_audio_seconds": round(speech.first_audio_seconds, 3),
+                })
+                async for chunk in speech.chunks():
+                    await websocket.send_bytes(chunk)
+                await websocket.send_json({"type": "end", **speech.stats()})
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+            finally:
+                speech.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"TTS streaming error: {e}")
+        await websocket.close(code=1011)
+
+@app.post("/voices/{voice_id}")
+async def register_voice(voice_id: str, request: Request, name: str | None = None):
+    """Register (or replace) a voice from a reference clip: 6-30 s of clean speech, as the raw body
+    or as the "file" part of a multipart upload"""
+    validate_voice_id(voice_id)
+    tts_model.check()
+
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            check_length(request.headers.get("content-length"), VOICE_MAX_BYTES, "Reference audio")
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=400, detail='Multipart uploads need a "file" part')
+            reference = await upload.read()
+            if len(reference) > VOICE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Reference audio is larger than {VOICE_MAX_BYTES} bytes")
+            name = form.get("name") or name
+        else:
+            reference = await read_body(request, VOICE_MAX_BYTES, "Reference audio")
+        return await inference.run(register_voice_on_worker, voice_id, reference, name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Voice registration error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/voices")
+async def list_voices():
+    return {"voices": voices.list()}
+
+@app.delete("/voices/{voice_id}")
+async def delete_voice(voice_id: str):
+    if not voices.delete(voice_id):
+        raise HTTPException(status_code=404, detail=f"Unknown voice_id {voice_id}")
+    return {"deleted": voice_id}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=7860)